@@ -3,35 +3,17 @@ automations/intake.py - new patient intake workflow
 collects info from new compound inquiries
 """
 
-from enum import Enum
 from typing import Dict, Optional
-from dataclasses import dataclass
 import uuid
 
 from integrations.ghl import ghl
 from integrations.airtable import airtable
 from brain.audit import log_action
+from automations.sessions import IntakeSession, IntakeStep, build_session_store
 
 
-class IntakeStep(Enum):
-    STARTED = "started"
-    NAME_COLLECTED = "name_collected"
-    DOB_COLLECTED = "dob_collected"
-    DOCTOR_ASKED = "doctor_asked"
-    DOCTOR_COLLECTED = "doctor_collected"
-    COMPLETED = "completed"
-
-
-@dataclass
-class IntakeSession:
-    session_id: str
-    contact_id: str
-    current_step: IntakeStep
-    data: Dict
-
-
-# store active intake sessions - in prod use redis or db
-active_sessions: Dict[str, IntakeSession] = {}
+# active intake sessions - sqlite by default so every worker shares them
+session_store = build_session_store()
 
 
 # prompts for each step
@@ -58,7 +40,7 @@ def start_intake(contact_id: str, initial_message: str) -> str:
         data={"initial_query": initial_message}
     )
     
-    active_sessions[contact_id] = session
+    session_store.put(session)
     
     log_action("intake_started", session_id, f"contact={contact_id}")
     
@@ -70,12 +52,21 @@ def process_intake_response(contact_id: str, response: str) -> str:
     process response in intake flow
     advances to next step
     """
-    session = active_sessions.get(contact_id)
+    session = session_store.get(contact_id)
     
     if not session:
         # no active session - maybe they're new
         return start_intake(contact_id, response)
     
+    reply = advance_intake(session, response)
+    # completed sessions are already gone from the store
+    if session.current_step != IntakeStep.COMPLETED:
+        session_store.put(session)
+    return reply
+
+
+def advance_intake(session: IntakeSession, response: str) -> str:
+    """move one step forward, returns the next prompt"""
     current = session.current_step
     
     # process based on current step
@@ -143,7 +134,7 @@ def complete_intake(session: IntakeSession) -> str:
     log_action("intake_completed", session.session_id, f"patient created")
     
     # clean up session
-    del active_sessions[session.contact_id]
+    session_store.delete(session.contact_id)
     
     first_name = session.data.get("name", "").split()[0] if session.data.get("name") else ""
     return STEP_PROMPTS[IntakeStep.DOCTOR_COLLECTED].format(name=first_name)
@@ -151,15 +142,15 @@ def complete_intake(session: IntakeSession) -> str:
 
 def is_intake_active(contact_id: str) -> bool:
     """check if contact has active intake session"""
-    return contact_id in active_sessions
+    return contact_id in session_store
 
 
 def cancel_intake(contact_id: str):
     """cancel an active intake"""
-    if contact_id in active_sessions:
-        session = active_sessions[contact_id]
+    session = session_store.get(contact_id)
+    if session:
         log_action("intake_cancelled", session.session_id)
-        del active_sessions[contact_id]
+        session_store.delete(contact_id)
 
 
 def lookup_provider(doctor_name: str, clinic: str = None) -> Optional[Dict]:
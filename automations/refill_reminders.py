@@ -3,13 +3,16 @@ automations/refill_reminders.py - automated refill sequences
 sends sms reminders for 30-day compound meds
 """
 
+import asyncio
 from datetime import datetime, timedelta
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 from dataclasses import dataclass
 
 from integrations.ghl import ghl
 from integrations.airtable import airtable
+from integrations.http import run_sync
 from brain.audit import log_action
+from automations.sms_queue import SMSDispatcher
 
 
 @dataclass
@@ -29,63 +32,100 @@ REMINDER_SCHEDULE = [
 ]
 
 
-def get_patients_needing_reminders() -> List[RefillReminder]:
+@dataclass
+class ReminderPlan:
+    reminders: List[RefillReminder]
+    prescriptions: int
+    patients: int
+    upstream_calls: int
+
+
+def reminder_windows(today: datetime) -> Dict[str, Tuple[int, str]]:
+    """fill date -> (days since fill, reminder type) for today's windows"""
+    return {
+        (today - timedelta(days=days)).strftime("%Y-%m-%d"): (days, reminder_type)
+        for days, reminder_type, _ in REMINDER_SCHEDULE
+    }
+
+
+def reminders_formula(fill_dates) -> str:
+    """one query covering every reminder window"""
+    dates = ", ".join(f"{{FillDate}} = '{d}'" for d in fill_dates)
+    return f"AND({{DaysSupply}} = 30, {{IsCompound}} = TRUE(), OR({dates}))"
+
+
+def plan_reminders(today: datetime = None) -> ReminderPlan:
     """
     find patients who need refill reminders
-    looks for 30-day compound prescriptions
+    
+    one prescriptions query for all windows, then the distinct patients
+    in bulk - upstream calls scale with pages, not prescriptions
     """
-    reminders = []
+    today = today or datetime.now()
+    windows = reminder_windows(today)
+    calls_before = airtable.requests_made
     
-    # get prescriptions that are 30-day compounds
-    # filter for fill dates in our reminder windows
-    today = datetime.now()
+    prescriptions = list(airtable.iter_records(
+        "Prescriptions", reminders_formula(windows),
+        fields=["PatientId", "MedicationName", "FillDate"]
+    ))
     
-    for days, reminder_type, _ in REMINDER_SCHEDULE:
-        target_date = today - timedelta(days=days)
-        # format for airtable filter
-        date_str = target_date.strftime("%Y-%m-%d")
-        
-        formula = f"AND({{DaysSupply}} = 30, {{FillDate}} = '{date_str}', {{IsCompound}} = TRUE())"
-        prescriptions = airtable.get_records("Prescriptions", formula)
+    patient_ids = [rx.get("fields", {}).get("PatientId") for rx in prescriptions]
+    patients = airtable.get_patients(patient_ids, fields=["GHLContactId"])
+    
+    reminders = []
+    for rx in prescriptions:
+        fields = rx.get("fields", {})
+        window = windows.get(str(fields.get("FillDate", ""))[:10])
+        patient = patients.get(fields.get("PatientId"))
+        if not window or not patient:
+            continue
         
-        for rx in prescriptions:
-            fields = rx.get("fields", {})
-            patient_id = fields.get("PatientId")
-            
-            if not patient_id:
-                continue
-            
-            # get patient contact id
-            patient = airtable.get_patient(patient_id)
-            contact_id = patient.get("fields", {}).get("GHLContactId")
-            
-            if contact_id:
-                reminders.append(RefillReminder(
-                    patient_id=patient_id,
-                    contact_id=contact_id,
-                    medication=fields.get("MedicationName", "medication"),
-                    days_since_fill=days,
-                    reminder_type=reminder_type
-                ))
+        contact_id = patient.get("fields", {}).get("GHLContactId")
+        if contact_id:
+            days, reminder_type = window
+            reminders.append(RefillReminder(
+                patient_id=fields["PatientId"],
+                contact_id=contact_id,
+                medication=fields.get("MedicationName", "medication"),
+                days_since_fill=days,
+                reminder_type=reminder_type
+            ))
+    
+    # keep the old schedule order (day21, day26, day35)
+    reminders.sort(key=lambda r: r.days_since_fill)
     
-    return reminders
+    return ReminderPlan(
+        reminders=reminders,
+        prescriptions=len(prescriptions),
+        patients=len(patients),
+        upstream_calls=airtable.requests_made - calls_before,
+    )
 
 
-def send_reminder(reminder: RefillReminder) -> bool:
-    """send a single refill reminder"""
-    # get the message template
-    template = None
+def get_patients_needing_reminders() -> List[RefillReminder]:
+    """
+    find patients who need refill reminders
+    looks for 30-day compound prescriptions
+    """
+    return plan_reminders().reminders
+
+
+def reminder_message(reminder: RefillReminder) -> Optional[str]:
+    """personalized text for a single reminder, None for unknown types"""
     for days, rtype, msg in REMINDER_SCHEDULE:
         if rtype == reminder.reminder_type:
-            template = msg
-            break
+            return msg.format(med=reminder.medication)
+    return None
+
+
+def send_reminder(reminder: RefillReminder) -> bool:
+    """send a single refill reminder"""
+    message = reminder_message(reminder)
     
-    if not template:
+    if not message:
         return False
     
-    # personalize message
-    message = template.format(med=reminder.medication)
-    
     # send via ghl
     result = ghl.send_sms(reminder.contact_id, message)
     
@@ -113,60 +153,120 @@ def consolidate_reminders(reminders: List[RefillReminder]) -> Dict[str, List[Ref
     return by_patient
 
 
-def send_consolidated_reminder(patient_id: str, reminders: List[RefillReminder]) -> bool:
-    """send one message for multiple meds"""
+def consolidated_message(reminders: List[RefillReminder]) -> Optional[Tuple[str, str, str]]:
+    """
+    build the text for one patient
+    returns (message, audit action, audit details) or None
+    """
     if not reminders:
-        return False
-    
-    contact_id = reminders[0].contact_id
-    meds = [r.medication for r in reminders]
+        return None
     
-    if len(meds) == 1:
-        # single med - use normal flow
-        return send_reminder(reminders[0])
+    if len(reminders) == 1:
+        message = reminder_message(reminders[0])
+        if not message:
+            return None
+        r = reminders[0]
+        return message, "refill_reminder_sent", f"{r.reminder_type}: {r.medication}"
     
     # multiple meds - consolidated message
+    meds = [r.medication for r in reminders]
     med_list = ", ".join(meds[:-1]) + f" and {meds[-1]}"
     message = f"Hey! Your {med_list} should be ready for refill. Reply YES to refill all, or call us to discuss."
+    return message, "refill_reminder_consolidated", f"{len(meds)} medications"
+
+
+def reminder_key(patient_id: str, reminders: List[RefillReminder], day: str) -> str:
+    """idempotency key - one text per patient per reminder set per day"""
+    types = "+".join(sorted({r.reminder_type for r in reminders}))
+    return f"refill:{patient_id}:{day}:{types}"
+
+
+def send_consolidated_reminder(patient_id: str, reminders: List[RefillReminder]) -> bool:
+    """send one message for multiple meds"""
+    built = consolidated_message(reminders)
+    if not built:
+        return False
     
-    result = ghl.send_sms(contact_id, message)
+    message, action, details = built
+    result = ghl.send_sms(reminders[0].contact_id, message)
     
     if "error" not in result:
-        log_action(
-            "refill_reminder_consolidated",
-            patient_id,
-            f"{len(meds)} medications"
-        )
+        log_action(action, patient_id, details)
         return True
     
     return False
 
 
-def run_daily_reminders():
+async def run_daily_reminders_async(dispatcher: SMSDispatcher = None) -> dict:
     """
-    main function to run daily
-    finds and sends all due reminders
+    find due reminders and push them through the sms queue
+    safe to rerun - already-sent keys are skipped
     """
-    reminders = get_patients_needing_reminders()
+    plan = await asyncio.to_thread(plan_reminders)
+    reminders = plan.reminders
     
     if not reminders:
-        return {"sent": 0, "patients": 0}
+        return {"sent": 0, "patients": 0, "upstream_calls": plan.upstream_calls}
     
-    # consolidate by patient
     by_patient = consolidate_reminders(reminders)
+    day = datetime.now().strftime("%Y-%m-%d")
     
-    sent_count = 0
-    for patient_id, patient_reminders in by_patient.items():
-        if send_consolidated_reminder(patient_id, patient_reminders):
-            sent_count += 1
+    own = dispatcher is None
+    if own:
+        dispatcher = SMSDispatcher()
+    
+    pending = []
+    skipped = 0
+    try:
+        for patient_id, patient_reminders in by_patient.items():
+            built = consolidated_message(patient_reminders)
+            if not built:
+                continue
+            message, action, details = built
+            
+            result = await dispatcher.enqueue(
+                patient_reminders[0].contact_id,
+                message,
+                reminder_key(patient_id, patient_reminders, day),
+                on_sent=lambda a=action, p=patient_id, d=details: log_action(a, p, d),
+            )
+            if result is None:
+                skipped += 1
+            else:
+                pending.append(result)
+        
+        outcomes = await asyncio.gather(*pending)
+    finally:
+        # don't leave our workers running if planning a message or enqueueing blew up
+        if own:
+            await dispatcher.stop()
     
     return {
-        "sent": sent_count,
+        "sent": sum(1 for ok in outcomes if ok),
+        "failed": sum(1 for ok in outcomes if not ok),
+        "skipped": skipped,
         "patients": len(by_patient),
-        "total_meds": len(reminders)
+        "total_meds": len(reminders),
+        "upstream_calls": plan.upstream_calls
     }
 
 
+def run_daily_reminders():
+    """
+    main function to run daily
+    finds and sends all due reminders
+    """
+    async def go():
+        # the sync ghl client lives on the background loop, so send through it
+        dispatcher = SMSDispatcher(client=ghl._async)
+        try:
+            return await run_daily_reminders_async(dispatcher)
+        finally:
+            await dispatcher.stop()
+    
+    return run_sync(go())
+
+
 def send_quarterly_checkin():
     """
     friendly quarterly check-in for compound patients
@@ -174,7 +274,7 @@ def send_quarterly_checkin():
     """
     # get patients who haven't had activity in 60+ days
     formula = "AND({IsCompoundPatient} = TRUE(), {DaysSinceLastOrder} > 60)"
-    patients = airtable.get_records("Patients", formula, max_records=50)
+    patients = airtable.iter_records("Patients", formula, fields=["GHLContactId", "FirstName"])
     
     sent = 0
     for patient in patients:
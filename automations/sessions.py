@@ -0,0 +1,243 @@
+"""
+automations/sessions.py - where intake sessions live between messages
+in-memory for a single process, sqlite when workers need to share them
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from enum import Enum
+from typing import Callable, Dict, Optional
+
+from config import settings
+
+
+class IntakeStep(Enum):
+    STARTED = "started"
+    NAME_COLLECTED = "name_collected"
+    DOB_COLLECTED = "dob_collected"
+    DOCTOR_ASKED = "doctor_asked"
+    DOCTOR_COLLECTED = "doctor_collected"
+    COMPLETED = "completed"
+
+
+class IntakeSession:
+    """one contact's place in the intake flow - slots keep lots of these small"""
+    
+    __slots__ = ("session_id", "contact_id", "current_step", "data")
+    
+    def __init__(self, session_id: str, contact_id: str, current_step: IntakeStep, data: Dict):
+        self.session_id = session_id
+        self.contact_id = contact_id
+        self.current_step = current_step
+        self.data = data
+    
+    def __eq__(self, other):
+        if not isinstance(other, IntakeSession):
+            return NotImplemented
+        return all(getattr(self, s) == getattr(other, s) for s in self.__slots__)
+    
+    def __repr__(self):
+        return f"IntakeSession({self.session_id!r}, {self.contact_id!r}, {self.current_step.value})"
+
+
+class SessionStore(ABC):
+    """
+    contact id -> intake session, with a ttl so abandoned ones go away
+    
+    every put refreshes the ttl. changes to a session you got back
+    aren't kept until you put it again
+    """
+    
+    @abstractmethod
+    def get(self, contact_id: str) -> Optional[IntakeSession]:
+        raise NotImplementedError
+    
+    @abstractmethod
+    def put(self, session: IntakeSession):
+        raise NotImplementedError
+    
+    @abstractmethod
+    def delete(self, contact_id: str) -> bool:
+        raise NotImplementedError
+    
+    @abstractmethod
+    def sweep(self) -> int:
+        """drop expired sessions, returns how many"""
+        raise NotImplementedError
+    
+    @abstractmethod
+    def __len__(self) -> int:
+        raise NotImplementedError
+    
+    def __contains__(self, contact_id: str) -> bool:
+        return self.get(contact_id) is not None
+    
+    def close(self):
+        pass
+
+
+class MemorySessionStore(SessionStore):
+    """
+    sessions in a dict, only visible to this process
+    
+    args:
+        ttl: seconds a session lives after its last put
+        sweep_interval: puts sweep expired sessions at most this often
+        clock: time source (tests pass a fake one)
+    """
+    
+    def __init__(self, ttl: float = None, sweep_interval: float = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ttl = settings.INTAKE_SESSION_TTL if ttl is None else ttl
+        self.sweep_interval = settings.INTAKE_SESSION_SWEEP_INTERVAL if sweep_interval is None else sweep_interval
+        self.clock = clock
+        self.expired = 0
+        # oldest put first - with one ttl that's also soonest to expire, so sweeps stop early
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()  # contact id -> (expires_at, session)
+        self._lock = threading.Lock()
+        self._last_sweep = clock()
+    
+    def get(self, contact_id: str) -> Optional[IntakeSession]:
+        with self._lock:
+            item = self._data.get(contact_id)
+            if item is None:
+                return None
+            if item[0] <= self.clock():
+                del self._data[contact_id]
+                self.expired += 1
+                return None
+            return item[1]
+    
+    def put(self, session: IntakeSession):
+        now = self.clock()
+        with self._lock:
+            self._data[session.contact_id] = (now + self.ttl, session)
+            self._data.move_to_end(session.contact_id)
+        if now - self._last_sweep >= self.sweep_interval:
+            self.sweep()
+    
+    def delete(self, contact_id: str) -> bool:
+        with self._lock:
+            return self._data.pop(contact_id, None) is not None
+    
+    def sweep(self) -> int:
+        now = self.clock()
+        removed = 0
+        with self._lock:
+            self._last_sweep = now
+            while self._data:
+                contact_id, (expires_at, _) = next(iter(self._data.items()))
+                if expires_at > now:
+                    break
+                del self._data[contact_id]
+                removed += 1
+            self.expired += removed
+        return removed
+    
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    sessions in a sqlite file (wal mode) so every worker process sees them
+    and they survive restarts
+    
+    each process opens its own connection on first use (also after a fork).
+    two workers updating the same contact at once is last-write-wins, which
+    is fine for one person answering sms prompts one at a time
+    
+    args:
+        path: sqlite file
+        ttl / sweep_interval: as MemorySessionStore (wall clock, shared by workers)
+    """
+    
+    def __init__(self, path: str = None, ttl: float = None, sweep_interval: float = None):
+        self.path = path or settings.INTAKE_SESSION_PATH
+        self.ttl = settings.INTAKE_SESSION_TTL if ttl is None else ttl
+        self.sweep_interval = settings.INTAKE_SESSION_SWEEP_INTERVAL if sweep_interval is None else sweep_interval
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._last_sweep = time.time()
+    
+    def _connection(self) -> sqlite3.Connection:
+        # a connection must not cross a fork - open a fresh one in the child
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS intake_sessions ("
+                "contact_id TEXT PRIMARY KEY, session_id TEXT, step TEXT, data TEXT, expires REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS intake_sessions_expires ON intake_sessions (expires)")
+            conn.commit()
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+    
+    def get(self, contact_id: str) -> Optional[IntakeSession]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT session_id, step, data FROM intake_sessions WHERE contact_id = ? AND expires > ?",
+                (contact_id, time.time())
+            ).fetchone()
+        if row is None:
+            return None
+        return IntakeSession(row[0], contact_id, IntakeStep(row[1]), json.loads(row[2]))
+    
+    def put(self, session: IntakeSession):
+        with self._lock:
+            conn = self._connection()
+            now = time.time()
+            conn.execute(
+                "INSERT OR REPLACE INTO intake_sessions VALUES (?, ?, ?, ?, ?)",
+                (session.contact_id, session.session_id, session.current_step.value,
+                 json.dumps(session.data), now + self.ttl)
+            )
+            conn.commit()
+        if now - self._last_sweep >= self.sweep_interval:
+            self.sweep()
+    
+    def delete(self, contact_id: str) -> bool:
+        with self._lock:
+            conn = self._connection()
+            cur = conn.execute("DELETE FROM intake_sessions WHERE contact_id = ?", (contact_id,))
+            conn.commit()
+            return cur.rowcount > 0
+    
+    def sweep(self) -> int:
+        with self._lock:
+            self._last_sweep = time.time()
+            conn = self._connection()
+            cur = conn.execute("DELETE FROM intake_sessions WHERE expires <= ?", (self._last_sweep,))
+            conn.commit()
+            return cur.rowcount
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection().execute(
+                "SELECT COUNT(*) FROM intake_sessions WHERE expires > ?", (time.time(),)
+            ).fetchone()[0]
+    
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+
+def build_session_store(backend: str = None) -> SessionStore:
+    """store picked by INTAKE_SESSION_BACKEND (memory or sqlite)"""
+    backend = (backend or settings.INTAKE_SESSION_BACKEND).lower()
+    if backend == "memory":
+        return MemorySessionStore()
+    if backend == "sqlite":
+        return SQLiteSessionStore()
+    raise ValueError(f"unknown session backend: {backend}")
@@ -0,0 +1,314 @@
+"""
+automations/sms_queue.py - outbound sms dispatch queue
+n async workers send through ghl with rate limits, retries and
+idempotency keys so reruns never double-text anyone
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+import weakref
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # windows - in-process locking only
+    fcntl = None
+
+from config import settings
+from integrations.ratelimit import KeyedRateLimiter, TokenBucket, backoff_delay
+
+
+logger = logging.getLogger("sms_queue")
+
+LOG_DIR = "logs"
+SENT_KEYS_FILE = "sms_sent_keys.jsonl"
+DEAD_LETTER_FILE = "sms_dead_letter.jsonl"
+
+# dispatchers with live workers, so shutdown can drain them
+_running = weakref.WeakSet()
+
+
+@dataclass
+class OutboundSMS:
+    contact_id: str
+    message: str
+    idempotency_key: str
+    on_sent: Optional[Callable[[], None]] = None
+    attempts: int = 0
+    enqueued_at: float = field(default_factory=time.monotonic)
+    result: Optional[asyncio.Future] = None
+
+
+class SentKeys:
+    """
+    append-only record of idempotency keys that were delivered
+    
+    keys are date-stamped, so once a key is older than the retention
+    window nothing will enqueue it again - those are dropped on load and
+    the file is compacted, so it doesn't grow with every text ever sent
+    """
+    
+    def __init__(self, path: str, retention_days: float = None):
+        self.path = path
+        days = settings.SMS_SENT_KEY_RETENTION_DAYS if retention_days is None else retention_days
+        self.retention = days * 86400
+        self._keys = set()
+        if os.path.exists(path):
+            self._load()
+    
+    @contextmanager
+    def _locked(self):
+        """file lock so a compaction can't drop another worker's appends"""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if not fcntl:
+            yield
+            return
+        with open(self.path + ".lock", "a") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+    
+    def _load(self):
+        cutoff = time.time() - self.retention
+        with self._locked():
+            kept, dropped = [], 0
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        item = json.loads(line)
+                        key = item["key"]
+                    except Exception:
+                        dropped += 1
+                        continue
+                    if item.get("ts", 0) < cutoff:
+                        dropped += 1
+                        continue
+                    self._keys.add(key)
+                    kept.append(line if line.endswith("\n") else line + "\n")
+            
+            if dropped:
+                tmp = self.path + ".tmp"
+                with open(tmp, "w") as f:
+                    f.write("".join(kept))
+                os.replace(tmp, self.path)
+    
+    def __contains__(self, key: str) -> bool:
+        return key in self._keys
+    
+    def __len__(self) -> int:
+        return len(self._keys)
+    
+    def add(self, key: str):
+        self._keys.add(key)
+        with self._locked():
+            with open(self.path, "a") as f:
+                f.write(json.dumps({"key": key, "ts": time.time()}) + "\n")
+
+
+class SMSDispatcher:
+    """
+    queue + worker pool for outbound sms
+    
+    args:
+        client: anything with `async send_sms(contact_id, message)` (AsyncGHLClient)
+        workers: concurrent senders
+        rate_per_second: global send rate
+        per_contact_interval: min seconds between texts to one contact
+        max_retries: attempts after the first before dead-lettering
+    """
+    
+    def __init__(self, client=None, workers: int = None, rate_per_second: float = None,
+                 per_contact_interval: float = None, max_retries: int = None,
+                 log_dir: str = None):
+        if client is None:
+            from integrations.ghl import async_ghl
+            client = async_ghl
+        self.client = client
+        self.workers = workers or settings.SMS_QUEUE_WORKERS
+        rate = rate_per_second or settings.SMS_RATE_PER_SECOND
+        interval = settings.SMS_PER_CONTACT_INTERVAL if per_contact_interval is None else per_contact_interval
+        self.max_retries = settings.SMS_MAX_RETRIES if max_retries is None else max_retries
+        
+        self.global_limit = TokenBucket(rate, capacity=max(rate, 1.0))
+        self.contact_limit = KeyedRateLimiter(1 / interval, capacity=1) if interval > 0 else None
+        
+        log_dir = log_dir or LOG_DIR
+        self.sent_keys = SentKeys(os.path.join(log_dir, SENT_KEYS_FILE))
+        self.dead_letter_path = os.path.join(log_dir, DEAD_LETTER_FILE)
+        
+        self.stats = {"sent": 0, "retried": 0, "dead_lettered": 0, "duplicates": 0}
+        self.latencies: List[float] = []  # enqueue -> delivered, seconds
+        
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._delayed = set()
+        self._pending: Dict[str, OutboundSMS] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    async def start(self):
+        if self._tasks:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        _running.add(self)
+    
+    async def enqueue(self, contact_id: str, message: str, idempotency_key: str,
+                      on_sent: Callable[[], None] = None) -> Optional[asyncio.Future]:
+        """
+        queue a message
+        returns a future that resolves True (sent) / False (dead-lettered),
+        or None if this key was already sent or is already queued
+        """
+        if idempotency_key in self.sent_keys or idempotency_key in self._pending:
+            self.stats["duplicates"] += 1
+            return None
+        
+        await self.start()
+        item = OutboundSMS(contact_id, message, idempotency_key, on_sent)
+        item.result = asyncio.get_running_loop().create_future()
+        self._pending[idempotency_key] = item
+        self._queue.put_nowait(item)
+        return item.result
+    
+    async def join(self):
+        """wait until everything queued has been sent or dead-lettered"""
+        if self._queue is None:
+            return
+        while True:
+            await self._queue.join()
+            if not self._delayed:
+                return
+            await asyncio.gather(*list(self._delayed))
+    
+    async def stop(self, drain: bool = True):
+        """stop the workers - by default after the queue drains"""
+        if drain:
+            await self.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        _running.discard(self)
+    
+    def queue_depth(self) -> int:
+        return (self._queue.qsize() if self._queue else 0) + len(self._delayed)
+    
+    async def _worker(self):
+        while True:
+            item = await self._queue.get()
+            try:
+                await self._send(item)
+            except Exception:
+                # never let one message kill the worker or leave its future hanging
+                logger.exception("sms %s failed in dispatch", item.idempotency_key)
+                self._finish(item, False)
+            finally:
+                self._queue.task_done()
+    
+    async def _send(self, item: OutboundSMS):
+        await self.global_limit.acquire()
+        if self.contact_limit:
+            await self.contact_limit.acquire(item.contact_id)
+        
+        item.attempts += 1
+        try:
+            result = await self.client.send_sms(item.contact_id, item.message)
+        except Exception as e:
+            result = {"error": str(e)}
+        
+        if "error" not in result:
+            self.stats["sent"] += 1
+            self.latencies.append(time.monotonic() - item.enqueued_at)
+            # it's delivered - bookkeeping failures get logged, not retried
+            try:
+                self.sent_keys.add(item.idempotency_key)
+                if item.on_sent:
+                    item.on_sent()
+            except Exception:
+                logger.exception("sms %s sent, but recording it failed", item.idempotency_key)
+            self._finish(item, True)
+            return
+        
+        if item.attempts <= self.max_retries:
+            # try again later without holding this worker
+            self.stats["retried"] += 1
+            task = asyncio.create_task(self._retry_later(item, backoff_delay(item.attempts - 1)))
+            self._delayed.add(task)
+            task.add_done_callback(self._delayed.discard)
+            return
+        
+        try:
+            self._dead_letter(item, result.get("error"))
+        except Exception:
+            logger.exception("sms %s failed and couldn't be dead-lettered", item.idempotency_key)
+        self._finish(item, False)
+    
+    async def _retry_later(self, item: OutboundSMS, delay: float):
+        await asyncio.sleep(delay)
+        self._queue.put_nowait(item)
+    
+    def _finish(self, item: OutboundSMS, sent: bool):
+        self._pending.pop(item.idempotency_key, None)
+        if item.result and not item.result.done():
+            item.result.set_result(sent)
+    
+    def _dead_letter(self, item: OutboundSMS, error: str):
+        """
+        note failed messages for staff to follow up - no message body,
+        it's phi and can be rebuilt from the idempotency key
+        """
+        self.stats["dead_lettered"] += 1
+        os.makedirs(os.path.dirname(self.dead_letter_path) or ".", exist_ok=True)
+        with open(self.dead_letter_path, "a") as f:
+            f.write(json.dumps({
+                "key": item.idempotency_key,
+                "contact_id": item.contact_id,
+                "attempts": item.attempts,
+                "error": error,
+                "ts": time.time(),
+            }) + "\n")
+    
+    def latency_percentiles(self) -> Dict[str, float]:
+        if not self.latencies:
+            return {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+        ordered = sorted(self.latencies)
+        
+        def pct(p):
+            return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+        
+        return {"p50": pct(0.50), "p95": pct(0.95), "p99": pct(0.99)}
+
+
+async def drain_dispatchers(timeout: float = 30.0) -> int:
+    """
+    send what's still queued on every running dispatcher, then stop them
+    anything not sent within the timeout stays unsent (its key isn't
+    recorded, so a rerun picks it up). returns how many were stopped
+    """
+    loop = asyncio.get_running_loop()
+    stops = []
+    for dispatcher in list(_running):
+        if dispatcher._loop is loop:
+            stops.append(dispatcher.stop())
+        elif dispatcher._loop is not None and dispatcher._loop.is_running():
+            # started from sync code on the background loop
+            stops.append(asyncio.wrap_future(
+                asyncio.run_coroutine_threadsafe(dispatcher.stop(), dispatcher._loop)))
+    if not stops:
+        return 0
+    
+    try:
+        await asyncio.wait_for(asyncio.gather(*stops), timeout)
+    except asyncio.TimeoutError:
+        for dispatcher in list(_running):
+            if dispatcher._loop is loop:
+                await dispatcher.stop(drain=False)
+    return len(stops)
@@ -0,0 +1 @@
+# benchmarks module - perf harnesses, run them as scripts
@@ -0,0 +1,78 @@
+"""
+benchmarks/bench_chat_stream.py - time to first byte, /api/chat/message vs /api/chat/stream
+runs the app with uvicorn against the local openai stub, which streams a
+60-word answer after a 300ms "thinking" delay
+
+usage:
+    python -m benchmarks.bench_chat_stream
+"""
+
+import asyncio
+import socket
+import statistics
+import threading
+import time
+
+import httpx
+import uvicorn
+from openai import AsyncOpenAI
+
+from config import settings
+from integrations import openai_client
+from tests.stubs import OpenAIStub, StubServer
+
+
+REQUESTS = 10
+MESSAGE = {"message": "Is my prescription ready for pickup?", "session_id": "bench"}
+REPLY = " ".join(["Your prescription is being prepared and should be ready soon."] * 6)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def measure(client: httpx.AsyncClient, path: str):
+    """(first byte, first answer text, done) in seconds"""
+    start = time.perf_counter()
+    first_byte = first_text = None
+    async with client.stream("POST", path, json=MESSAGE) as response:
+        async for chunk in response.aiter_text():
+            now = time.perf_counter() - start
+            if first_byte is None:
+                first_byte = now
+            if first_text is None and ('"text"' in chunk or '"response"' in chunk):
+                first_text = now
+    return first_byte, first_text, time.perf_counter() - start
+
+
+def run():
+    with StubServer(OpenAIStub(REPLY, first_token_delay=0.3, token_delay=0.02)) as stub:
+        settings.MOCK_MODE = False
+        openai_client.client = AsyncOpenAI(api_key="bench", base_url=f"{stub.url}/v1", max_retries=0)
+        openai_client.completion_cache = None  # every request goes to the model
+        
+        from main import app
+        port = free_port()
+        server = uvicorn.Server(uvicorn.Config(app, port=port, log_level="warning"))
+        threading.Thread(target=server.run, daemon=True).start()
+        while not server.started:
+            time.sleep(0.01)
+        
+        async def go():
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=30) as client:
+                print(f"{'endpoint':>18} {'ttfb ms':>9} {'first text ms':>14} {'total ms':>9}")
+                for path in ("/api/chat/message", "/api/chat/stream"):
+                    runs = [await measure(client, path) for _ in range(REQUESTS)]
+                    fb, ft, total = (statistics.median(r[i] for r in runs) * 1000 for i in range(3))
+                    print(f"{path:>18} {fb:>9.0f} {ft:>14.0f} {total:>9.0f}")
+        
+        try:
+            asyncio.run(go())
+        finally:
+            server.should_exit = True
+
+
+if __name__ == "__main__":
+    run()
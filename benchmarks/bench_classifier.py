@@ -0,0 +1,108 @@
+"""
+benchmarks/bench_classifier.py - local email intent model, accuracy and latency
+trains on synthetic de-identified emails, then reports accuracy overall and
+on the share confident enough to skip the llm, plus per-email latency
+
+usage:
+    python -m benchmarks.bench_classifier
+"""
+
+import random
+import time
+
+from brain.classifier import IntentClassifier
+from handlers.email import EMAIL_INTENTS
+
+
+PHRASES = {
+    "compound_question": [
+        "do you compound {med} without dyes", "can you make a {form} version of {med}",
+        "is a custom {form} of {med} possible", "what strengths can you formulate {med} in",
+        "could you compound {med} into a {form} for my child",
+    ],
+    "refill_request": [
+        "please refill my {med}", "I need a refill of {med}", "I'm running out of {med}, can I get more",
+        "requesting a refill for RX [RX_NUM_1]", "can you renew my {med} prescription",
+    ],
+    "rx_status": [
+        "where is my {med} order", "is my prescription ready yet", "when will my {med} ship",
+        "checking on the status of RX [RX_NUM_1]", "has my {med} been filled",
+    ],
+    "provider_update": [
+        "this is dr [NAME_1]'s office, we changed the {med} dose", "the clinic is sending a new script for {med}",
+        "provider update: discontinue {med} for [NAME_2]", "prescriber note - increase {med} to twice daily",
+        "our office faxed a revised order for {med}",
+    ],
+    "new_patient": [
+        "I'm a new patient and want to transfer my prescriptions", "how do I start using your pharmacy",
+        "first time here, do you need my insurance card", "I'd like to become a patient",
+        "can I transfer my {med} from another pharmacy",
+    ],
+    "billing": [
+        "I was charged twice for {med}", "why is my copay so high this month", "can I get a receipt for {med}",
+        "my insurance should have covered {med}", "question about my bill for last month",
+    ],
+    "general": [
+        "what are your holiday hours", "do you have a fax number", "is there parking near the store",
+        "do you sell blood pressure monitors", "can I pick up for my spouse",
+    ],
+    "spam": [
+        "limited offer on seo services for your business", "you have won a gift card click here",
+        "grow your instagram followers today", "cheap wholesale supplies best price",
+        "partnership opportunity for your website",
+    ],
+}
+MEDS = ["semaglutide", "tirzepatide", "testosterone", "progesterone", "levothyroxine", "metformin", "nad+", "b12"]
+FORMS = ["cream", "capsule", "troche", "liquid", "gel"]
+OPENERS = ["Hi,", "Hello,", "Good morning,", "Hey there -", "To whom it may concern,", ""]
+CLOSERS = ["Thanks, [NAME_1]", "Call me at [PHONE_1]", "Thank you!", "Best regards", "", "sent from my phone"]
+
+
+def make_emails(n: int, seed: int = 2):
+    """(texts, intents) - de-identified like triage sees them"""
+    rnd = random.Random(seed)
+    texts, labels = [], []
+    for _ in range(n):
+        intent = rnd.choice(EMAIL_INTENTS)
+        body = rnd.choice(PHRASES[intent]).format(med=rnd.choice(MEDS), form=rnd.choice(FORMS))
+        # a little cross-talk so it isn't trivially separable
+        if rnd.random() < 0.2:
+            other = rnd.choice(EMAIL_INTENTS)
+            body += ". also " + rnd.choice(PHRASES[other]).format(med=rnd.choice(MEDS), form=rnd.choice(FORMS))
+        subject = " ".join(body.split()[:4])
+        texts.append(f"Subject: {subject}\n\n{rnd.choice(OPENERS)} {body}. {rnd.choice(CLOSERS)}")
+        labels.append(intent)
+    return texts, labels
+
+
+def run(threshold: float = 0.85):
+    train_texts, train_labels = make_emails(3000, seed=1)
+    test_texts, test_labels = make_emails(2000, seed=2)
+    
+    start = time.perf_counter()
+    model = IntentClassifier(EMAIL_INTENTS).fit(train_texts, train_labels)
+    train_s = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    preds = model.predict(test_texts)
+    batch_us = (time.perf_counter() - start) / len(test_texts) * 1e6
+    
+    start = time.perf_counter()
+    for text in test_texts[:500]:
+        model.predict_one(text)
+    single_us = (time.perf_counter() - start) / 500 * 1e6
+    
+    correct = [label == pred for (label, _), pred in zip(preds, test_labels)]
+    confident = [conf >= threshold for _, conf in preds]
+    covered = [c for c, ok in zip(correct, confident) if ok]
+    
+    print(f"trained on {len(train_texts)} emails in {train_s:.2f}s")
+    print(f"accuracy (all)          {sum(correct) / len(correct):.3f}")
+    print(f"handled locally @{threshold}  {sum(confident) / len(confident):.3f}")
+    print(f"accuracy (handled)      {sum(covered) / max(1, len(covered)):.3f}")
+    print(f"latency single          {single_us:.0f} us/email")
+    print(f"latency batch           {batch_us:.0f} us/email")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,62 @@
+"""
+benchmarks/bench_deidentify.py - single-pass scanner vs the original deidentify
+
+usage:
+    python -m benchmarks.bench_deidentify
+"""
+
+import random
+import timeit
+
+from phi.deidentify import deidentify
+from tests.phi_reference import deidentify_reference
+
+
+FILLER = [
+    "Hi there, I wanted to check on my compounded cream.",
+    "The pharmacy said it would be ready by Friday afternoon.",
+    "Can you let me know if insurance covered the last fill?",
+    "My doctor changed the dose last week so please double check.",
+    "Thanks so much for all the help with the refill schedule.",
+]
+
+PHI = [
+    "call me at {a}{b}-555-{c}",
+    "my email is patient{a}@example.com",
+    "born {m}/{d}/19{b}",
+    "order RX{a}{b}{c}",
+    "ssn {a}-{b}-{c}",
+]
+
+
+def make_text(size: int, seed: int = 42) -> str:
+    """realistic-ish email/transcript text of roughly `size` bytes"""
+    rnd = random.Random(seed)
+    parts = []
+    total = 0
+    while total < size:
+        if rnd.random() < 0.25:
+            part = rnd.choice(PHI).format(
+                a=rnd.randint(100, 999), b=rnd.randint(10, 99),
+                c=rnd.randint(1000, 9999), m=rnd.randint(1, 12), d=rnd.randint(1, 28)
+            )
+        else:
+            part = rnd.choice(FILLER)
+        parts.append(part)
+        total += len(part) + 1
+    return " ".join(parts)[:size]
+
+
+def run(sizes=(1_000, 10_000, 100_000)):
+    extra = {"name": "Jane Doe"}
+    print(f"{'size':>8} {'reference ms':>14} {'scanner ms':>12} {'speedup':>8}")
+    for size in sizes:
+        text = "Jane Doe here. " + make_text(size)
+        number = max(1, 200_000 // size)
+        ref = min(timeit.repeat(lambda: deidentify_reference(text, extra), number=number, repeat=3)) / number
+        new = min(timeit.repeat(lambda: deidentify(text, extra), number=number, repeat=3)) / number
+        print(f"{size:>8} {ref * 1000:>14.3f} {new * 1000:>12.3f} {ref / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,27 @@
+"""
+benchmarks/bench_reidentify.py - one-pass token restore vs the original replace loop
+
+usage:
+    python -m benchmarks.bench_reidentify
+"""
+
+import timeit
+
+from phi.reidentify import reidentify, partial_reidentify
+from tests.phi_reference import make_case, partial_reidentify_reference, reidentify_reference
+
+
+def run():
+    print(f"{'tokens':>7} {'size':>7} {'ref ms':>9} {'new ms':>9} {'speedup':>8} {'partial x':>10}")
+    for n_tokens, size in [(5, 1_000), (50, 10_000), (500, 100_000)]:
+        text, token_map = make_case(n_tokens, size)
+        number = max(1, 100_000 // size)
+        ref = min(timeit.repeat(lambda: reidentify_reference(text, token_map), number=number, repeat=3)) / number
+        new = min(timeit.repeat(lambda: reidentify(text, token_map), number=number, repeat=3)) / number
+        p_ref = min(timeit.repeat(lambda: partial_reidentify_reference(text, token_map, ["NAME"]), number=number, repeat=3))
+        p_new = min(timeit.repeat(lambda: partial_reidentify(text, token_map, ["NAME"]), number=number, repeat=3))
+        print(f"{n_tokens:>7} {size:>7} {ref * 1000:>9.3f} {new * 1000:>9.3f} {ref / new:>7.1f}x {p_ref / p_new:>9.1f}x")
+
+
+if __name__ == "__main__":
+    run()
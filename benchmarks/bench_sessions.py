@@ -0,0 +1,119 @@
+"""
+benchmarks/bench_sessions.py - intake session stores with 100k live sessions
+record size (slots vs the old dataclass), memory and sqlite store throughput,
+ttl sweeps, and sqlite shared by several worker processes
+
+usage:
+    python -m benchmarks.bench_sessions
+"""
+
+import multiprocessing
+import os
+import tempfile
+import time
+import tracemalloc
+
+from automations.sessions import IntakeSession, IntakeStep, MemorySessionStore, SQLiteSessionStore
+from benchmarks.reference import IntakeSessionReference
+
+
+SESSIONS = 100_000
+WORKERS = 4
+
+
+def make(cls, i):
+    return cls(f"s{i}", f"c{i}", IntakeStep.STARTED, {"initial_query": "hi"})
+
+
+def record_size(cls) -> float:
+    """bytes per record, the shared data dicts included"""
+    tracemalloc.start()
+    records = [make(cls, i) for i in range(SESSIONS)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del records
+    return size / SESSIONS
+
+
+def timed(label, fn, n=SESSIONS):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<22} {n / elapsed:>10,.0f} ops/s  {elapsed * 1e6 / n:>7.1f} us/op")
+
+
+def exercise(store, clock=None):
+    ids = [f"c{i}" for i in range(SESSIONS)]
+    
+    def put_all():
+        for i in range(SESSIONS):
+            store.put(make(IntakeSession, i))
+    
+    def get_all():
+        for contact_id in ids:
+            store.get(contact_id)
+    
+    def advance_all():
+        # what one intake reply costs the store: read, change, write back
+        for contact_id in ids:
+            session = store.get(contact_id)
+            session.data["name"] = "Jane Doe"
+            session.current_step = IntakeStep.NAME_COLLECTED
+            store.put(session)
+    
+    timed("put", put_all)
+    timed("get", get_all)
+    timed("get + put (one reply)", advance_all)
+    assert len(store) == SESSIONS
+
+
+def worker(path, wid):
+    store = SQLiteSessionStore(path, sweep_interval=3600)
+    per = SESSIONS // WORKERS
+    for i in range(wid * per, (wid + 1) * per):
+        store.put(make(IntakeSession, i))
+        store.get(f"c{i}")
+    store.close()
+
+
+def run():
+    plain, slotted = record_size(IntakeSessionReference), record_size(IntakeSession)
+    print(f"record size ({SESSIONS:,} sessions)")
+    print(f"  dataclass {plain:>6.0f} B   slots {slotted:>6.0f} B   "
+          f"saves {(plain - slotted) * SESSIONS / 2**20:.1f} MiB")
+    
+    print("\nmemory store")
+    now = [0.0]
+    store = MemorySessionStore(ttl=60, sweep_interval=3600, clock=lambda: now[0])
+    exercise(store)
+    now[0] += 61  # everything abandoned
+    timed("sweep (all expired)", store.sweep)
+    assert len(store) == 0
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "sessions.db")
+        print("\nsqlite store (wal)")
+        store = SQLiteSessionStore(path, ttl=3600, sweep_interval=3600)
+        exercise(store)
+        print(f"  file size {os.path.getsize(path) / 2**20:.1f} MiB")
+        store.close()
+        
+        # same file, several processes writing at once
+        path = os.path.join(tmp, "shared.db")
+        SQLiteSessionStore(path).sweep()  # create the table up front
+        ctx = multiprocessing.get_context("fork" if hasattr(os, "fork") else "spawn")
+        procs = [ctx.Process(target=worker, args=(path, w)) for w in range(WORKERS)]
+        start = time.perf_counter()
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        elapsed = time.perf_counter() - start
+        shared = SQLiteSessionStore(path)
+        print(f"\nsqlite shared by {WORKERS} processes")
+        print(f"  put + get              {SESSIONS / elapsed:>10,.0f} sessions/s, {len(shared):,} visible to all")
+        shared.close()
+
+
+if __name__ == "__main__":
+    run()
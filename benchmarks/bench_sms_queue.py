@@ -0,0 +1,71 @@
+"""
+benchmarks/bench_sms_queue.py - sms dispatch throughput against the local ghl stub
+compares the old one-at-a-time loop with the queue at a few worker counts
+
+usage:
+    python -m benchmarks.bench_sms_queue
+"""
+
+import asyncio
+import tempfile
+import time
+
+from config import settings
+from automations.sms_queue import SMSDispatcher
+from integrations import ghl as ghl_module
+from integrations.ghl import AsyncGHLClient
+from tests.stubs import GHLStub, StubServer
+
+
+MESSAGES = 400
+LATENCY = 0.02  # per request on the stub
+
+
+async def sequential(client) -> float:
+    start = time.perf_counter()
+    for i in range(MESSAGES):
+        await client.send_sms(f"c{i}", "Your refill is ready")
+    return time.perf_counter() - start
+
+
+async def queued(client, workers: int):
+    with tempfile.TemporaryDirectory() as log_dir:
+        d = SMSDispatcher(client=client, workers=workers, rate_per_second=10_000,
+                          per_contact_interval=0, log_dir=log_dir)
+        start = time.perf_counter()
+        futures = [await d.enqueue(f"c{i}", "Your refill is ready", f"bench:{i}") for i in range(MESSAGES)]
+        await asyncio.gather(*futures)
+        elapsed = time.perf_counter() - start
+        await d.stop()
+        return elapsed, d.latency_percentiles()
+
+
+def run():
+    # lift the client-side api limits so the stub latency is what we measure
+    for limiter in (ghl_module.location_limiter, ghl_module.endpoint_limiter):
+        limiter.rate = limiter.capacity = 100_000
+    
+    with StubServer(GHLStub(), latency=LATENCY) as server:
+        settings.MOCK_MODE = False
+        settings.GHL_BASE_URL = f"{server.url}/v1"
+        settings.GHL_API_KEY = "bench"
+        settings.GHL_MAX_CONNECTIONS = 64
+        
+        async def go():
+            client = AsyncGHLClient()
+            try:
+                base = await sequential(client)
+                print(f"{'mode':>12} {'msgs/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'speedup':>8}")
+                print(f"{'sequential':>12} {MESSAGES / base:>9.0f} {'-':>8} {'-':>8} {'1.0x':>8}")
+                for workers in (1, 8, 32):
+                    elapsed, pct = await queued(client, workers)
+                    print(f"{f'{workers} workers':>12} {MESSAGES / elapsed:>9.0f} "
+                          f"{pct['p50'] * 1000:>8.0f} {pct['p95'] * 1000:>8.0f} {base / elapsed:>7.1f}x")
+            finally:
+                await client.aclose()
+        
+        asyncio.run(go())
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,62 @@
+"""
+benchmarks/bench_startup.py - cold start of a worker
+fresh interpreter each run: import main, then import + startup + first /health.
+"eager" also imports what main used to pull in at import time (openai sdk,
+requests, httpx, numpy), which is the old cold start
+
+usage:
+    python -m benchmarks.bench_startup
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+
+
+RUNS = 7
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EAGER = "import openai, requests, httpx, numpy; "
+
+IMPORT = """
+import time
+t = time.perf_counter()
+{prefix}import main
+print((time.perf_counter() - t) * 1000)
+"""
+
+FIRST_HEALTH = """
+import time, warnings
+warnings.simplefilter("ignore")
+t = time.perf_counter()
+{prefix}import main
+from fastapi.testclient import TestClient
+with TestClient(main.app) as client:
+    assert client.get("/health").status_code == 200
+    print((time.perf_counter() - t) * 1000)
+"""
+
+
+def cold(script: str) -> float:
+    """median ms over fresh interpreters"""
+    times = []
+    for _ in range(RUNS):
+        out = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, cwd=ROOT,
+                             env=dict(os.environ, MOCK_MODE="true"))
+        if out.returncode:
+            raise RuntimeError(out.stderr)
+        times.append(float(out.stdout.strip().splitlines()[-1]))
+    return statistics.median(times)
+
+
+def run():
+    print(f"{'cold start (median of ' + str(RUNS) + ')':<28} {'eager ms':>9} {'lazy ms':>9} {'speedup':>8}")
+    for label, script in (("import main", IMPORT), ("import + first /health", FIRST_HEALTH)):
+        eager = cold(script.format(prefix=EAGER))
+        lazy = cold(script.format(prefix=""))
+        print(f"{label:<28} {eager:>9.0f} {lazy:>9.0f} {eager / lazy:>7.2f}x")
+    print("\nbreakdown: python main.py --profile-startup")
+
+
+if __name__ == "__main__":
+    run()
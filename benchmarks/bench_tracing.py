@@ -0,0 +1,99 @@
+"""
+benchmarks/bench_tracing.py - what the span timing costs
+a traced no-op vs a plain call, then whole requests through the asgi
+stack with and without TracingMiddleware (no sockets, so the middleware
+and span overhead isn't hidden behind network time)
+
+usage:
+    python -m benchmarks.bench_tracing
+"""
+
+import asyncio
+import time
+
+from fastapi import FastAPI
+
+import tracing
+from phi.deidentify import deidentify
+from tracing import TracingMiddleware, metrics, traced
+
+
+CALLS = 200_000
+REQUESTS = 5_000
+TEXT = "Patient John Smith, DOB 01/02/1980, called from 555-123-4567 about RX1234567"
+
+
+def per_call_ns(fn, n=CALLS) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n * 1e9
+
+
+def build_app(traced_app: bool) -> FastAPI:
+    app = FastAPI()
+    
+    @app.post("/scrub/{session_id}")
+    async def scrub(session_id: str):
+        return {"text": deidentify(TEXT).text}
+    
+    if traced_app:
+        app.add_middleware(TracingMiddleware)
+    return app
+
+
+async def drive(app, n: int) -> float:
+    """us per request, calling the asgi app directly"""
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+    
+    async def send(message):
+        pass
+    
+    def scope(i):
+        return {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+            "scheme": "http", "path": f"/scrub/s{i}", "raw_path": f"/scrub/s{i}".encode(),
+            "query_string": b"", "root_path": "", "headers": [], "client": ("127.0.0.1", 1),
+            "server": ("127.0.0.1", 80), "app": app,
+        }
+    
+    for i in range(200):  # warm up routing and the phi regexes
+        await app(scope(i), receive, send)
+    start = time.perf_counter()
+    for i in range(n):
+        await app(scope(i), receive, send)
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def run():
+    def noop():
+        return None
+    
+    plain = per_call_ns(noop)
+    wrapped = per_call_ns(traced("bench")(noop))
+    token = tracing._trace.set({})
+    in_request = per_call_ns(traced("bench")(noop))
+    tracing._trace.reset(token)
+    print(f"{'span overhead':<34} {'ns/call':>9}")
+    print(f"  {'plain call':<32} {plain:>9.0f}")
+    print(f"  {'traced, no request':<32} {wrapped:>9.0f}  (+{wrapped - plain:.0f})")
+    print(f"  {'traced, inside a request':<32} {in_request:>9.0f}  (+{in_request - plain:.0f})")
+    
+    untraced_app = build_app(False)
+    traced_app = build_app(True)
+    metrics.reset()
+    base = asyncio.run(drive(untraced_app, REQUESTS))
+    timed = asyncio.run(drive(traced_app, REQUESTS))
+    print(f"\n{'asgi request (deidentify route)':<34} {'us/req':>9}")
+    print(f"  {'no middleware':<32} {base:>9.1f}")
+    print(f"  {'TracingMiddleware':<32} {timed:>9.1f}  (+{timed - base:.1f}, {(timed / base - 1) * 100:.1f}%)")
+    
+    snap = metrics.snapshot()
+    route = snap["route_spans"]["/scrub/{session_id} deidentify"]
+    print(f"\n  recorded {route['count']} deidentify spans, p50 {route['p50'] * 1000:.0f} us, p99 {route['p99'] * 1000:.0f} us")
+    print(f"  render() with these series: {per_call_ns(metrics.render, 200) / 1e6:.2f} ms")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,574 @@
+"""
+benchmarks/loadtest.py - end-to-end load test of the api
+boots the app in its own process (mock mode, or pointed at the local
+openai/ghl/airtable stubs with a set latency), drives a weighted mix of
+chat, sms webhook, email triage and voice traffic, and reports throughput
+and latency percentiles per endpoint. results go to a json file so runs
+can be compared across commits
+
+usage:
+    python -m benchmarks.loadtest                          # stubs, 10s, 16 users
+    python -m benchmarks.loadtest --mode mock --duration 30
+    python -m benchmarks.loadtest --rate 200 --latency 20  # open loop, 200 req/s
+    python -m benchmarks.loadtest --workers 4 --set AUDIT_WRITE_MODE=buffered
+    python -m benchmarks.loadtest --compare logs/loadtest/<earlier run>.json
+    python -m benchmarks.loadtest --url http://10.0.0.5:8000  # a server you started
+
+closed loop (default): --concurrency users each send the next request as
+soon as the last one answers. open loop (--rate): requests are due at a fixed
+rate whether or not earlier ones finished, and latency counts from when a
+request was due, so a stalled server can't hide its queueing delay
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from tests.stubs import AirtableStub, GHLStub, OpenAIStub, StubServer
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "logs", "loadtest")
+
+DEFAULT_MIX = {"chat": 40, "sms": 25, "email": 15, "voice": 20}
+PERCENTILES = (0.50, 0.90, 0.95, 0.99)
+
+# patients/contacts the stubs know about, so lookups hit as often as they miss
+PATIENTS = [
+    ("Jane Doe", "5551234567", "jane.doe@example.com"),
+    ("John Smith", "5552345678", "jsmith@example.com"),
+    ("Maria Garcia", "5553456789", "maria.g@example.com"),
+    ("Robert Johnson", "5554567890", "rjohnson@example.com"),
+]
+UNKNOWN = [("Pat Lee", "5559990000", "pat.lee@example.com")]
+
+
+# traffic - each builder returns (method, path, json body) for one request
+
+CHAT_MESSAGES = [
+    "What are your hours on Saturday?",
+    "Where is your location? Is there parking?",
+    "Do you take insurance from Aetna?",
+    "I need a refill on my lisinopril please",
+    "Hi, this is {name}, DOB 03/14/1975. Can I get a refill on RX{rx}?",
+    "Is my prescription ready for pickup yet?",
+    "What's the status of my order RX{rx}? My number is {phone}",
+    "Can you make a compound cream without parabens for my daughter?",
+    "I want to talk to a real person",
+    "My doctor said to ask you about side effects of metformin",
+    "hello?",
+]
+
+SMS_MESSAGES = [
+    "help",
+    "yes",
+    "Is my prescription ready?",
+    "need a refill on my blood pressure meds",
+    "Can you check on RX{rx} for {name}",
+    "What time do you close today",
+    "ok thanks",
+    "Do you deliver to 123 Oak Street?",
+]
+
+EMAILS = [
+    ("Refill request", "Hi, this is {name} (DOB 01/02/1980). Please refill RX{rx}. Call me at {phone}."),
+    ("Prescription status", "Hello, is RX{rx} ready? I dropped it off Monday. Thanks, {name}"),
+    ("New patient", "I'm moving to the area and want to transfer my prescriptions to you. {name}, {phone}"),
+    ("Question about billing", "I was charged twice for my last fill, can someone look into it? {name}"),
+    ("Updated prescriber info", "Dr. Adams has a new fax number 555-222-3333 for all patients including {name}."),
+    ("Compounding", "Do you compound hormone creams? My doctor wants a custom strength."),
+    ("WIN A FREE CRUISE", "Click here to claim your prize!!!"),
+]
+
+TRANSCRIPTIONS = [
+    "what are your hours",
+    "where are you located",
+    "what's your fax number",
+    "hi this is doctor Adams calling from the clinic about a patient",
+    "I'd like to check on my prescription",
+    "I need a refill on my medication",
+    "do you make compounded medications",
+    "um yeah I had a question about something",
+]
+
+
+def _fill(template: str, rng: random.Random) -> Tuple[str, Dict[str, str]]:
+    name, phone, email = rng.choice(PATIENTS + UNKNOWN)
+    values = {"name": name, "phone": phone, "email": email, "rx": str(rng.randint(1_000_000, 9_999_999))}
+    return template.format(**values), values
+
+
+def chat_request(rng: random.Random) -> Tuple[str, str, Dict]:
+    text, values = _fill(rng.choice(CHAT_MESSAGES), rng)
+    body = {"message": text, "session_id": f"load-chat-{rng.randint(1, 500)}"}
+    if rng.random() < 0.5:
+        body["patient_phone"] = values["phone"]
+    return "POST", "/api/chat/message", body
+
+
+def sms_request(rng: random.Random) -> Tuple[str, str, Dict]:
+    text, values = _fill(rng.choice(SMS_MESSAGES), rng)
+    return "POST", "/api/sms/webhook", {
+        "contactId": f"contact{rng.randint(1, len(PATIENTS))}",
+        "message": text,
+        "phone": values["phone"],
+        "conversationId": f"load-sms-{rng.randint(1, 500)}",
+    }
+
+
+def email_request(rng: random.Random) -> Tuple[str, str, Dict]:
+    subject, body_template = rng.choice(EMAILS)
+    body, values = _fill(body_template, rng)
+    return "POST", "/api/email/triage", {"from_email": values["email"], "subject": subject, "body": body}
+
+
+def voice_request(rng: random.Random) -> Tuple[str, str, Dict]:
+    _, phone, _ = rng.choice(PATIENTS + UNKNOWN)
+    event = {"call_id": f"load-call-{rng.randint(1, 500)}", "caller_number": phone}
+    roll = rng.random()
+    if roll < 0.15:
+        event["event_type"] = "started"
+    elif roll < 0.3:
+        event.update(event_type="ended", duration=rng.randint(20, 400))
+    else:
+        event.update(event_type="transcription", transcription=rng.choice(TRANSCRIPTIONS))
+    return "POST", "/api/voice/event", event
+
+
+ENDPOINTS: Dict[str, Callable[[random.Random], Tuple[str, str, Dict]]] = {
+    "chat": chat_request,
+    "sms": sms_request,
+    "email": email_request,
+    "voice": voice_request,
+}
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """"chat=50,sms=50" -> weights. unknown endpoints and all-zero mixes are errors"""
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"unknown endpoint in mix: {name} (have {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    if not any(w > 0 for w in mix.values()):
+        raise ValueError("mix needs at least one endpoint with weight > 0")
+    return mix
+
+
+# stats
+
+def percentile(ordered: List[float], p: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict:
+    """latencies in seconds -> counts, throughput and ms percentiles"""
+    ordered = sorted(latencies)
+    stats = {
+        "requests": len(ordered) + errors,
+        "errors": errors,
+        "rps": round((len(ordered) + errors) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2) if ordered else 0.0,
+        "max_ms": round(ordered[-1] * 1000, 2) if ordered else 0.0,
+    }
+    for p in PERCENTILES:
+        stats[f"p{int(p * 100)}_ms"] = round(percentile(ordered, p) * 1000, 2)
+    return stats
+
+
+class Recorder:
+    """latencies and errors per endpoint, only while recording is on (after warmup)"""
+    
+    def __init__(self):
+        self.recording = False
+        self.latencies: Dict[str, List[float]] = {name: [] for name in ENDPOINTS}
+        self.errors: Dict[str, int] = {name: 0 for name in ENDPOINTS}
+        self.statuses: Dict[str, Dict[str, int]] = {name: {} for name in ENDPOINTS}
+    
+    def add(self, name: str, seconds: Optional[float], status):
+        if not self.recording:
+            return
+        key = str(status)
+        self.statuses[name][key] = self.statuses[name].get(key, 0) + 1
+        if seconds is None or not isinstance(status, int) or status >= 400:
+            self.errors[name] += 1
+        else:
+            self.latencies[name].append(seconds)
+    
+    def report(self, elapsed: float) -> Dict:
+        endpoints = {}
+        for name in ENDPOINTS:
+            if self.latencies[name] or self.errors[name]:
+                endpoints[name] = dict(summarize(self.latencies[name], self.errors[name], elapsed),
+                                       statuses=self.statuses[name])
+        everything = [s for name in ENDPOINTS for s in self.latencies[name]]
+        return {"overall": summarize(everything, sum(self.errors.values()), elapsed), "endpoints": endpoints}
+
+
+# load generation
+
+async def send(client: httpx.AsyncClient, recorder: Recorder, name: str, rng: random.Random,
+               due: float = None):
+    method, path, body = ENDPOINTS[name](rng)
+    start = time.perf_counter() if due is None else due
+    try:
+        response = await client.request(method, path, json=body)
+        recorder.add(name, time.perf_counter() - start, response.status_code)
+    except httpx.HTTPError as e:
+        recorder.add(name, None, type(e).__name__)
+
+
+async def drive(url: str, mix: Dict[str, float], duration: float, warmup: float,
+                concurrency: int, rate: float = None, seed: int = 1) -> Dict:
+    """send traffic for warmup + duration seconds, returns the recorded report"""
+    names = [n for n, w in mix.items() if w > 0]
+    weights = [mix[n] for n in names]
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        begin = time.perf_counter()
+        measure_from = begin + warmup
+        stop_at = measure_from + duration
+        
+        async def flip_recording():
+            await asyncio.sleep(warmup)
+            recorder.recording = True
+        
+        flipper = asyncio.create_task(flip_recording())
+        
+        if rate:
+            # open loop - request i is due at begin + i / rate, in flight capped at concurrency
+            rng = random.Random(seed)
+            slots = asyncio.Semaphore(concurrency)
+            pending = set()
+            
+            async def one(name, due):
+                async with slots:
+                    await send(client, recorder, name, rng, due)
+            
+            i = 0
+            while True:
+                due = begin + i / rate
+                if due >= stop_at:
+                    break
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                task = asyncio.create_task(one(rng.choices(names, weights)[0], due))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+                i += 1
+            await asyncio.gather(*pending)
+        else:
+            async def user(n):
+                rng = random.Random(seed * 1000 + n)
+                while time.perf_counter() < stop_at:
+                    await send(client, recorder, rng.choices(names, weights)[0], rng)
+            
+            await asyncio.gather(*(user(n) for n in range(concurrency)))
+        
+        flipper.cancel()
+        elapsed = time.perf_counter() - measure_from
+        report = recorder.report(elapsed)
+        report["elapsed_s"] = round(elapsed, 2)
+        
+        # server side spans (from tracing) - one worker's view, warmup included
+        try:
+            r = await client.get("/api/metrics/summary")
+            if r.status_code == 200:
+                report["server"] = r.json()
+        except httpx.HTTPError:
+            pass
+    return report
+
+
+# the app under test
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def coerce(name: str, value: str):
+    """--set KEY=VALUE as the type the setting already has"""
+    from config import settings
+    if not hasattr(settings, name):
+        raise ValueError(f"unknown setting: {name}")
+    current = getattr(settings, name)
+    if isinstance(current, bool):
+        return value.lower() == "true"
+    if isinstance(current, (int, float)):
+        return type(current)(value)
+    return value
+
+
+def serve_app(port: int, overrides: Dict, workers: int, scratch: str):
+    """
+    body of the server process. runs from a scratch dir so the audit log,
+    sessions and counters it writes don't end up in the real logs/
+    """
+    sys.path.insert(0, ROOT)
+    os.chdir(scratch)
+    from config import settings
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+    if workers:
+        from server import serve
+        serve(workers, "127.0.0.1", port)
+    else:
+        import uvicorn
+        from main import app
+        uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def start_stubs(latency: float, llm_latency: float) -> Tuple[List[StubServer], Dict]:
+    """openai/ghl/airtable stubs seeded with the load test's patients, plus the settings that point at them"""
+    airtable = AirtableStub()
+    ghl = GHLStub()
+    for i, (name, phone, email) in enumerate(PATIENTS):
+        patient = airtable.add("Patients", {"Name": name, "Phone": phone, "Email": email})
+        airtable.add("Prescriptions", {"PatientId": patient["id"], "Status": "ready" if i % 2 else "processing"})
+        ghl.contacts[f"contact{i + 1}"] = {"id": f"contact{i + 1}", "email": email, "phone": phone}
+    
+    openai_stub = StubServer(OpenAIStub(first_token_delay=llm_latency)).start()
+    ghl_stub = StubServer(ghl, latency=latency).start()
+    airtable_stub = StubServer(airtable, latency=latency).start()
+    overrides = {
+        "MOCK_MODE": False,
+        "OPENAI_API_KEY": "loadtest",
+        "OPENAI_BASE_URL": f"{openai_stub.url}/v1",
+        "GHL_API_KEY": "loadtest",
+        "GHL_LOCATION_ID": "loadtest",
+        "GHL_BASE_URL": f"{ghl_stub.url}/v1",
+        "AIRTABLE_API_KEY": "loadtest",
+        "AIRTABLE_BASE_ID": "appLoadTest",
+        "AIRTABLE_BASE_URL": f"{airtable_stub.url}/v0",
+        # measure the app, not ghl's per-location quota (--set puts it back)
+        "GHL_RATE_PER_SECOND": 10_000.0,
+        "GHL_RATE_BURST": 10_000,
+        "GHL_ENDPOINT_RATE_PER_SECOND": 10_000.0,
+        "GHL_ENDPOINT_RATE_BURST": 10_000,
+    }
+    return [openai_stub, ghl_stub, airtable_stub], overrides
+
+
+def wait_ready(url: str, proc, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc is not None and not proc.is_alive():
+            raise RuntimeError(f"server exited with {proc.exitcode} before it was ready")
+        try:
+            if httpx.get(f"{url}/health", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"server at {url} wasn't ready after {timeout:.0f}s")
+
+
+def git_commit() -> Dict:
+    def git(*args):
+        out = subprocess.run(["git", *args], capture_output=True, text=True, cwd=ROOT)
+        return out.stdout.strip() if out.returncode == 0 else ""
+    return {"commit": git("rev-parse", "--short", "HEAD") or "unknown",
+            "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def run(mode: str = "stubs", duration: float = 10.0, warmup: float = 2.0, concurrency: int = 16,
+        rate: float = None, mix: Dict[str, float] = None, latency_ms: float = 50.0,
+        llm_latency_ms: float = 300.0, workers: int = 0, url: str = None,
+        settings_overrides: Dict = None, seed: int = 1) -> Dict:
+    """
+    one load test run, returns the results dict (what gets saved as json)
+    with url set the server (and its mode) are whatever is already running there
+    """
+    mix = mix or DEFAULT_MIX
+    stubs: List[StubServer] = []
+    proc = None
+    overrides: Dict = {}
+    scratch = None
+    
+    try:
+        if url is None:
+            if mode == "stubs":
+                stubs, overrides = start_stubs(latency_ms / 1000, llm_latency_ms / 1000)
+            elif mode == "mock":
+                overrides = {"MOCK_MODE": True}
+            else:
+                raise ValueError(f"unknown mode: {mode}")
+            overrides["LOG_LEVEL"] = "WARNING"  # no access log lines
+            overrides.update(settings_overrides or {})
+            
+            scratch = tempfile.TemporaryDirectory(prefix="loadtest-")
+            os.symlink(os.path.join(ROOT, "dashboard"), os.path.join(scratch.name, "dashboard"))
+            port = free_port()
+            url = f"http://127.0.0.1:{port}"
+            proc = multiprocessing.get_context("spawn").Process(
+                target=serve_app, args=(port, overrides, workers, scratch.name))
+            proc.start()
+            wait_ready(url, proc)
+        else:
+            mode = "external"
+        
+        started = datetime.now()
+        report = asyncio.run(drive(url, mix, duration, warmup, concurrency, rate, seed))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.join(30)
+            if proc.is_alive():
+                proc.kill()
+                proc.join()
+        for stub in stubs:
+            stub.stop()
+        if scratch is not None:
+            scratch.cleanup()
+    
+    meta = {
+        **git_commit(),
+        "started": started.isoformat(timespec="seconds"),
+        "mode": mode,
+        "url": url if mode == "external" else None,
+        "duration_s": duration,
+        "warmup_s": warmup,
+        "concurrency": concurrency,
+        "rate": rate,
+        "workers": workers,
+        "mix": mix,
+        "seed": seed,
+        "latency_ms": latency_ms if mode == "stubs" else None,
+        "llm_latency_ms": llm_latency_ms if mode == "stubs" else None,
+        # urls and keys are per run, the rest is what was being measured
+        "settings": {k: v for k, v in overrides.items() if not k.endswith(("_URL", "_KEY", "_ID"))},
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+    }
+    return {"meta": meta, **report}
+
+
+# output
+
+def print_report(result: Dict):
+    meta = result["meta"]
+    load = f"{meta['rate']} req/s open loop" if meta["rate"] else f"{meta['concurrency']} users"
+    print(f"{meta['mode']} @ {meta['commit']}{' (dirty)' if meta['dirty'] else ''}, "
+          f"{load}, {result['elapsed_s']}s measured")
+    print(f"\n{'endpoint':<10} {'reqs':>7} {'errors':>7} {'req/s':>8} "
+          + " ".join(f"{'p' + str(int(p * 100)):>8}" for p in PERCENTILES) + f" {'max':>8}   (ms)")
+    rows = list(result["endpoints"].items()) + [("overall", result["overall"])]
+    for name, s in rows:
+        print(f"{name:<10} {s['requests']:>7} {s['errors']:>7} {s['rps']:>8.1f} "
+              + " ".join(f"{s['p' + str(int(p * 100)) + '_ms']:>8.1f}" for p in PERCENTILES)
+              + f" {s['max_ms']:>8.1f}")
+    
+    spans = result.get("server", {}).get("route_spans", {})
+    if spans:
+        print(f"\n{'server spans (one worker)':<40} {'count':>7} {'p50':>8} {'p95':>8}")
+        for key, s in sorted(spans.items()):
+            print(f"{key:<40} {s['count']:>7} {s['p50']:>8.2f} {s['p95']:>8.2f}")
+
+
+def compare(baseline: Dict, current: Dict, threshold_pct: float = None) -> List[str]:
+    """
+    print old -> new per endpoint, returns the endpoints whose p95 got more
+    than threshold_pct worse (or that started failing)
+    """
+    regressions = []
+    print(f"\nvs {baseline['meta']['commit']} ({baseline['meta']['started']})")
+    keys = ("mode", "concurrency", "rate", "workers", "mix", "latency_ms", "llm_latency_ms", "settings")
+    differs = [k for k in keys if baseline["meta"].get(k) != current["meta"].get(k)]
+    if differs:
+        print(f"  runs aren't like for like - {', '.join(differs)} differ")
+    print(f"{'endpoint':<10} " + " ".join(f"{h:>24}" for h in ("req/s", "p50 ms", "p95 ms", "p99 ms")))
+    
+    def cell(old, new):
+        change = (new / old - 1) * 100 if old else 0.0
+        return f"{old:>8.1f} -> {new:<8.1f}{change:+5.0f}%"
+    
+    rows = [(name, baseline["endpoints"].get(name), s) for name, s in current["endpoints"].items()]
+    rows.append(("overall", baseline["overall"], current["overall"]))
+    for name, old, new in rows:
+        if old is None:
+            print(f"{name:<10} (not in baseline)")
+            continue
+        print(f"{name:<10} " + " ".join(cell(old[k], new[k]) for k in ("rps", "p50_ms", "p95_ms", "p99_ms")))
+        if threshold_pct is not None and name != "overall":
+            worse = old["p95_ms"] and (new["p95_ms"] / old["p95_ms"] - 1) * 100 > threshold_pct
+            if worse or (new["errors"] and not old["errors"]):
+                regressions.append(name)
+    return regressions
+
+
+def save(result: Dict, path: str = None) -> str:
+    if path is None:
+        stamp = result["meta"]["started"].replace(":", "").replace("-", "")
+        path = os.path.join(RESULTS_DIR, f"loadtest-{result['meta']['commit']}-{stamp}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(result, f, indent=2)
+    return path
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="end-to-end load test of the pharmacy api")
+    parser.add_argument("--mode", choices=("stubs", "mock"), default="stubs",
+                        help="stubs = real clients against local stub apis, mock = MOCK_MODE")
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds of unrecorded traffic first")
+    parser.add_argument("--concurrency", type=int, default=16, help="users (closed loop) or max in flight (open loop)")
+    parser.add_argument("--rate", type=float, help="open loop at this many requests/s")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="e.g. chat=40,sms=25,email=15,voice=20")
+    parser.add_argument("--latency", type=float, default=50.0, help="ghl/airtable stub latency, ms")
+    parser.add_argument("--llm-latency", type=float, default=300.0, help="openai stub latency, ms")
+    parser.add_argument("--workers", type=int, default=0, help="run under the preforking launcher with n workers")
+    parser.add_argument("--url", help="load an already running server instead of starting one")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="override a setting in the server process (repeatable)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="results json (default logs/loadtest/loadtest-<commit>-<time>.json)")
+    parser.add_argument("--compare", metavar="JSON", help="earlier results to compare against")
+    parser.add_argument("--max-regression", type=float, metavar="PCT",
+                        help="with --compare, exit 1 if any endpoint's p95 is this much worse")
+    args = parser.parse_args(argv)
+    
+    overrides = {}
+    for item in args.set:
+        name, _, value = item.partition("=")
+        overrides[name] = coerce(name, value)
+    
+    result = run(args.mode, args.duration, args.warmup, args.concurrency, args.rate, args.mix,
+                 args.latency, args.llm_latency, args.workers, args.url, overrides, args.seed)
+    print_report(result)
+    print(f"\nsaved {save(result, args.out)}")
+    
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, result, args.max_regression)
+        if regressions:
+            print(f"\np95 regressed more than {args.max_regression}%: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
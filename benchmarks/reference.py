@@ -0,0 +1,46 @@
+"""
+benchmarks/reference.py - frozen copies of the original implementations
+used as the baseline for benchmarks and equivalence tests
+do not "fix" these - they are supposed to stay slow
+(the phi ones live in tests/phi_reference.py)
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict
+
+
+def detect_intent_reference(text: str, intent_keywords: Dict) -> tuple:
+    """original detect_intent - first keyword hit in table order wins"""
+    text_lower = text.lower()
+    
+    for intent, keywords in intent_keywords.items():
+        for kw in keywords:
+            if kw in text_lower:
+                confidence = 0.7 if len(kw) > 5 else 0.5
+                return intent, confidence
+    
+    return None, 0.3
+
+
+def detect_caller_type_reference(transcription: str, provider_keywords: list, patient_keywords: list) -> str:
+    """original detect_caller_type - provider loop, then patient loop"""
+    text_lower = transcription.lower()
+    
+    for kw in provider_keywords:
+        if kw in text_lower:
+            return "provider"
+    
+    for kw in patient_keywords:
+        if kw in text_lower:
+            return "patient"
+    
+    return "unknown"
+
+
+@dataclass
+class IntakeSessionReference:
+    """original intake session record - a plain dataclass with a __dict__"""
+    session_id: str
+    contact_id: str
+    current_step: Any
+    data: Dict
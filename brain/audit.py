@@ -1,19 +1,38 @@
 """
 brain/audit.py - logging and audit trails for compliance
 keeps track of what the system does for HIPAA
+
+the log is split into one append-only jsonl segment per day
+(logs/audit/YYYY-MM-DD.jsonl) - same line format as the old single file.
+each segment has a side index (YYYY-MM-DD.idx) with the byte offset of
+every line plus its session_id and action, so lookups never re-read
+the whole history
 """
 
+import atexit
 import json
 import os
-from datetime import datetime
-from typing import Optional
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date as date_type, datetime
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # windows - in-process locking only
+    fcntl = None
 
+from config import settings
 from phi.models import AuditEntry
+from tracing import traced
 
 
 # store logs here - in prod use a proper db
 LOG_DIR = "logs"
-AUDIT_FILE = "audit_log.jsonl"
+AUDIT_FILE = "audit_log.jsonl"  # old single-file log, migrated on first use
+SEGMENT_DIR = "audit"
 
 
 def ensure_log_dir():
@@ -22,6 +41,451 @@ def ensure_log_dir():
         os.makedirs(LOG_DIR)
 
 
+class SegmentIndex:
+    """in-memory copy of one day's side index, tailed as the file grows"""
+    
+    def __init__(self):
+        self.sessions: Dict[str, List[tuple]] = {}  # session_id -> [(offset, length)]
+        self.actions: Dict[str, List[tuple]] = {}   # action -> [(offset, length)]
+        self.index_pos = 0  # bytes of the .idx file already read
+        self.data_end = 0   # bytes of the segment covered by the index
+    
+    def add(self, offset: int, length: int, session_id: str, action: str):
+        self.sessions.setdefault(session_id, []).append((offset, length))
+        self.actions.setdefault(action, []).append((offset, length))
+        self.data_end = max(self.data_end, offset + length)
+
+
+class AuditStore:
+    """
+    day-segmented, indexed audit log
+    
+    writes only ever append - to the segment and then to its index.
+    if a crash leaves lines without index entries they're indexed
+    on the next read. the lock file and the segment/index files being
+    written are kept open per process, so an append is one flock and
+    two writes
+    """
+    
+    def __init__(self, root: str = None, legacy_file: str = None):
+        self.root = root or os.path.join(LOG_DIR, SEGMENT_DIR)
+        self.legacy_file = legacy_file if legacy_file is not None else os.path.join(LOG_DIR, AUDIT_FILE)
+        self._indexes: Dict[str, SegmentIndex] = {}
+        self._lock = threading.RLock()
+        self._ready = False
+        # open handles, only valid in the process that opened them
+        self._pid = None
+        self._lock_file = None
+        self._files: Dict[str, tuple] = {}  # day -> (segment, index)
+        # called as listener(day, start_offset, [(line, session_id, action)])
+        # after every append - used by the live counters
+        self.listeners: List = []
+    
+    # paths
+    def segment_path(self, day: str) -> str:
+        return os.path.join(self.root, f"{day}.jsonl")
+    
+    def index_path(self, day: str) -> str:
+        return os.path.join(self.root, f"{day}.idx")
+    
+    def days(self) -> List[str]:
+        """all days that have a segment, oldest first"""
+        self._setup()
+        return sorted(name[:-6] for name in os.listdir(self.root) if name.endswith(".jsonl"))
+    
+    def _check_pid(self):
+        """
+        drop handles inherited across a fork - the child's flock would share
+        the parent's open file and not exclude it. caller holds the lock
+        """
+        if self._pid != os.getpid():
+            self._close_files()
+            self._pid = os.getpid()
+    
+    def _close_files(self):
+        if self._lock_file is not None:
+            self._lock_file.close()
+        for segment, index in self._files.values():
+            segment.close()
+            index.close()
+        self._lock_file = None
+        self._files = {}
+    
+    def _day_files(self, day: str) -> tuple:
+        """(segment, index) append handles for a day - caller holds the lock"""
+        self._check_pid()
+        files = self._files.get(day)
+        if files is None:
+            # only today (and yesterday, around midnight) is written to
+            while len(self._files) >= 2:
+                old = next(iter(self._files))
+                for fh in self._files.pop(old):
+                    fh.close()
+            files = self._files[day] = (open(self.segment_path(day), "ab"), open(self.index_path(day), "a"))
+        return files
+    
+    def close(self):
+        """close the cached file handles - they reopen on the next write"""
+        with self._lock:
+            if self._pid == os.getpid():
+                self._close_files()
+            self._lock_file = None
+            self._files = {}
+    
+    @contextmanager
+    def _locked(self):
+        """thread lock always, plus a file lock across worker processes"""
+        with self._lock:
+            if not fcntl:
+                yield
+                return
+            self._check_pid()
+            if self._lock_file is None:
+                self._lock_file = open(os.path.join(self.root, ".lock"), "a")
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+    
+    def _setup(self):
+        """create the segment dir and fold in the old single-file log once"""
+        if self._ready:
+            return
+        with self._lock:
+            if self._ready:
+                return
+            os.makedirs(self.root, exist_ok=True)
+            if self.legacy_file and os.path.exists(self.legacy_file):
+                with self._locked():
+                    # another worker may have migrated it while we waited
+                    if os.path.exists(self.legacy_file):
+                        self._migrate_legacy()
+            self._ready = True
+    
+    def _migrate_legacy(self):
+        """
+        copy old audit_log.jsonl lines into day segments, byte for byte
+        caller holds the lock, so only one worker ever reads the old file
+        """
+        by_day: Dict[str, List[tuple]] = {}
+        with open(self.legacy_file, "rb") as f:
+            for line in f:
+                try:
+                    data = json.loads(line)
+                    ts = datetime.fromisoformat(data["timestamp"])
+                except Exception:
+                    continue
+                record = (line.rstrip(b"\n") + b"\n", data.get("session_id"), data.get("action"))
+                by_day.setdefault(ts.date().isoformat(), []).append(record)
+        
+        for day, records in by_day.items():
+            self._append_records(day, records)
+        
+        # keep the original for retention, just out of the way
+        os.replace(self.legacy_file, self.legacy_file + ".migrated")
+    
+    # writing
+    def append(self, entry: AuditEntry, fsync: bool = False):
+        self.append_many([entry], fsync=fsync)
+    
+    def append_many(self, entries: Iterable[AuditEntry], fsync: bool = False):
+        """append entries, one locked write per day touched"""
+        self._setup()
+        by_day: Dict[str, List[tuple]] = {}
+        for entry in entries:
+            record = ((entry.model_dump_json() + "\n").encode("utf-8"), entry.session_id, entry.action)
+            by_day.setdefault(entry.timestamp.date().isoformat(), []).append(record)
+        
+        with self._locked():
+            for day, records in by_day.items():
+                self._append_records(day, records, fsync=fsync)
+    
+    def _append_records(self, day: str, records: List[tuple], fsync: bool = False):
+        """
+        write (line, session_id, action) records then their index entries
+        caller holds the lock
+        """
+        segment, index = self._day_files(day)
+        offset = segment.seek(0, os.SEEK_END)
+        segment.write(b"".join(line for line, _, _ in records))
+        segment.flush()
+        if fsync:
+            os.fsync(segment.fileno())
+        
+        for listener in self.listeners:
+            listener(day, offset, records)
+        
+        index_lines = []
+        for line, session_id, action in records:
+            index_lines.append(json.dumps({"o": offset, "n": len(line), "s": session_id, "a": action}) + "\n")
+            offset += len(line)
+        
+        index.write("".join(index_lines))
+        index.flush()
+        if fsync:
+            os.fsync(index.fileno())
+    
+    # index maintenance
+    def _index(self, day: str) -> SegmentIndex:
+        """cached index for a day, caught up with anything appended since"""
+        with self._lock:
+            index = self._indexes.setdefault(day, SegmentIndex())
+            self._tail_index(day, index)
+            
+            data_path = self.segment_path(day)
+            if os.path.exists(data_path) and os.path.getsize(data_path) > index.data_end:
+                with self._locked():
+                    # another writer may have finished its index while we waited
+                    self._tail_index(day, index)
+                    self._repair_index(day, index)
+            return index
+    
+    def _tail_index(self, day: str, index: SegmentIndex):
+        """read index lines we haven't seen yet"""
+        path = self.index_path(day)
+        if not os.path.exists(path) or os.path.getsize(path) <= index.index_pos:
+            return
+        with open(path, "rb") as f:
+            f.seek(index.index_pos)
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break  # half-written line, pick it up next time
+                index.index_pos += len(raw)
+                try:
+                    item = json.loads(raw)
+                    index.add(item["o"], item["n"], item["s"], item["a"])
+                except Exception:
+                    continue
+    
+    def _repair_index(self, day: str, index: SegmentIndex):
+        """index segment lines that have no index entry (crash mid-write)"""
+        missing = []
+        with open(self.segment_path(day), "rb") as f:
+            f.seek(index.data_end)
+            offset = index.data_end
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break
+                try:
+                    data = json.loads(raw)
+                    missing.append({"o": offset, "n": len(raw),
+                                    "s": data.get("session_id"), "a": data.get("action")})
+                except Exception:
+                    pass
+                offset += len(raw)
+        
+        if missing:
+            _, index_file = self._day_files(day)
+            index_file.write("".join(json.dumps(item) + "\n" for item in missing))
+            index_file.flush()
+            self._tail_index(day, index)
+    
+    # reading
+    def _read_at(self, day: str, spans: List[tuple]) -> List[AuditEntry]:
+        """seek straight to indexed lines"""
+        entries = []
+        with open(self.segment_path(day), "rb") as f:
+            for offset, length in sorted(spans):
+                f.seek(offset)
+                try:
+                    entries.append(AuditEntry(**json.loads(f.read(length))))
+                except Exception:
+                    continue
+        return entries
+    
+    def read_day(self, day: date_type) -> List[AuditEntry]:
+        """every entry for one day - only that segment is read"""
+        self._setup()
+        path = self.segment_path(day.isoformat())
+        if not os.path.exists(path):
+            return []
+        
+        entries = []
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    entries.append(AuditEntry(**json.loads(line)))
+                except Exception:
+                    continue
+        return entries
+    
+    def read_session(self, session_id: str) -> List[AuditEntry]:
+        """every entry for a session, oldest first"""
+        entries = []
+        for day in self.days():
+            spans = self._index(day).sessions.get(session_id)
+            if spans:
+                entries.extend(self._read_at(day, spans))
+        return entries
+    
+    def read_action(self, action: str, day: date_type = None) -> List[AuditEntry]:
+        """entries with an exact action - one day or all of them"""
+        days = [day.isoformat()] if day else self.days()
+        entries = []
+        for d in days:
+            if not os.path.exists(self.segment_path(d)):
+                continue
+            spans = self._index(d).actions.get(action)
+            if spans:
+                entries.extend(self._read_at(d, spans))
+        return entries
+    
+    def count_actions(self, day: date_type) -> Dict[str, int]:
+        """action -> count for a day, straight from the index"""
+        self._setup()
+        d = day.isoformat()
+        if not os.path.exists(self.segment_path(d)):
+            return {}
+        return {action: len(spans) for action, spans in self._index(d).actions.items()}
+
+
+class AuditWriter:
+    """
+    buffered writer - log_action just queues the entry and a background
+    thread writes batches in one group commit (one lock, one write per day)
+    
+    a batch is committed when it reaches max_batch entries, when the oldest
+    entry has waited max_latency_ms, or when someone calls flush()
+    """
+    
+    _STOP = object()
+    
+    def __init__(self, store: AuditStore, max_batch: int = 256,
+                 max_latency_ms: int = 50, fsync: str = "never"):
+        self.store = store
+        self.max_batch = max_batch
+        self.max_latency = max_latency_ms / 1000
+        self.fsync = fsync == "batch"
+        self.commits = 0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+    
+    def start(self):
+        if self.running:
+            return
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+    
+    def submit(self, entry: AuditEntry):
+        """queue an entry - never touches the disk"""
+        self._queue.put(entry)
+    
+    def flush(self, timeout: float = 5.0) -> bool:
+        """commit everything queued so far and wait for it"""
+        if not self.running:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+    
+    def stop(self, timeout: float = 10.0):
+        """commit whatever is queued, then stop the thread"""
+        if not self.running:
+            return
+        self._queue.put(self._STOP)
+        self._thread.join(timeout)
+        self._thread = None
+    
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            batch, waiters, stop = [], [], False
+            deadline = time.monotonic() + self.max_latency
+            
+            # keep pulling until the batch is full, a flush/stop shows up,
+            # or the oldest entry has waited long enough
+            while True:
+                if item is self._STOP:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                
+                if stop or waiters or len(batch) >= self.max_batch:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            
+            # stop means drain - anything still queued goes out too
+            if stop:
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if isinstance(item, threading.Event):
+                        waiters.append(item)
+                    elif item is not self._STOP:
+                        batch.append(item)
+            
+            if batch:
+                self._commit(batch)
+            for done in waiters:
+                done.set()
+            if stop:
+                return
+    
+    def _commit(self, batch: List[AuditEntry]):
+        """write one batch - keeps retrying so a disk hiccup doesn't drop entries"""
+        attempt = 0
+        while True:
+            try:
+                self.store.append_many(batch, fsync=self.fsync)
+                self.commits += 1
+                return
+            except Exception as e:
+                attempt += 1
+                print(f"audit write failed (attempt {attempt}): {e}")
+                time.sleep(min(0.1 * attempt, 1.0))
+
+
+# singletons
+audit_store = AuditStore()
+_writer: Optional[AuditWriter] = None
+
+
+def start_writer(store: AuditStore = None) -> AuditWriter:
+    """switch log_action to buffered group-commit mode"""
+    global _writer
+    if _writer is None:
+        _writer = AuditWriter(
+            store or audit_store,
+            max_batch=settings.AUDIT_BATCH_SIZE,
+            max_latency_ms=settings.AUDIT_MAX_LATENCY_MS,
+            fsync=settings.AUDIT_FSYNC
+        )
+        # interpreter exit counts as a clean stop too
+        atexit.register(stop_writer)
+    _writer.start()
+    return _writer
+
+
+def stop_writer():
+    """flush pending entries and go back to direct writes - call on shutdown"""
+    global _writer
+    if _writer is not None:
+        _writer.stop()
+        _writer = None
+
+
+def flush():
+    """make sure everything logged so far is on disk (no-op in sync mode)"""
+    if _writer is not None:
+        _writer.flush()
+
+
+@traced("audit")
 def log_action(action: str, session_id: str, details: str = None, 
                user_id: str = None) -> AuditEntry:
     """
@@ -33,8 +497,6 @@ def log_action(action: str, session_id: str, details: str = None,
         details: optional extra info
         user_id: optional user/staff id
     """
-    ensure_log_dir()
-    
     entry = AuditEntry(
         timestamp=datetime.now(),
         action=action,
@@ -43,57 +505,30 @@ def log_action(action: str, session_id: str, details: str = None,
         details=details
     )
     
-    # append to jsonl file
-    log_path = os.path.join(LOG_DIR, AUDIT_FILE)
-    with open(log_path, "a") as f:
-        f.write(entry.model_dump_json() + "\n")
+    if _writer is not None and _writer.running:
+        _writer.submit(entry)
+    else:
+        audit_store.append(entry, fsync=settings.AUDIT_FSYNC == "batch")
     
     return entry
 
 
 def get_session_logs(session_id: str) -> list[AuditEntry]:
     """get all logs for a session"""
-    ensure_log_dir()
-    log_path = os.path.join(LOG_DIR, AUDIT_FILE)
-    
-    if not os.path.exists(log_path):
-        return []
-    
-    entries = []
-    with open(log_path, "r") as f:
-        for line in f:
-            try:
-                data = json.loads(line)
-                if data.get("session_id") == session_id:
-                    entries.append(AuditEntry(**data))
-            except:
-                continue
-    
-    return entries
+    flush()
+    return audit_store.read_session(session_id)
 
 
 def get_logs_by_date(date: datetime) -> list[AuditEntry]:
     """get all logs for a specific date"""
-    ensure_log_dir()
-    log_path = os.path.join(LOG_DIR, AUDIT_FILE)
-    
-    if not os.path.exists(log_path):
-        return []
-    
-    target_date = date.date()
-    entries = []
-    
-    with open(log_path, "r") as f:
-        for line in f:
-            try:
-                data = json.loads(line)
-                ts = datetime.fromisoformat(data["timestamp"])
-                if ts.date() == target_date:
-                    entries.append(AuditEntry(**data))
-            except:
-                continue
-    
-    return entries
+    flush()
+    return audit_store.read_day(date.date())
+
+
+def get_logs_by_action(action: str, date: datetime = None) -> list[AuditEntry]:
+    """get logs with a given action, optionally for one date"""
+    flush()
+    return audit_store.read_action(action, date.date() if date else None)
 
 
 def log_phi_access(session_id: str, phi_type: str, action: str):
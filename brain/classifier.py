@@ -0,0 +1,250 @@
+"""
+brain/classifier.py - small on-box intent classifier
+hashed word/char n-grams into a numpy softmax (multinomial logistic)
+model, trained from the intents the llm already assigned to emails
+(kept in EMAIL_TRAINING_PATH when EMAIL_TRAINING_ENABLED is on).
+confident predictions skip the llm round-trip entirely
+
+train from the collected examples:
+    python -m brain.classifier
+"""
+
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config import settings
+
+
+WORD = re.compile(r"[a-z0-9]+|\[[A-Z_]+_\d+\]")
+TOKEN = re.compile(r"\[([A-Z_]+)_\d+\]")
+
+
+class HashedNgrams:
+    """
+    text -> sparse l2-normalised feature vector
+    word unigrams + bigrams and char 4-grams, hashed into `dims` buckets
+    (crc32, so feature ids are stable across processes)
+    """
+    
+    def __init__(self, dims: int = 2 ** 18, char_n: int = 4):
+        self.dims = dims
+        self.char_n = char_n
+    
+    def features(self, text: str) -> List[str]:
+        # phi tokens count as their type - [NAME_1] and [NAME_2] are the same word
+        words = WORD.findall(TOKEN.sub(r"[\1]", text).lower())
+        feats = list(words)
+        feats.extend(f"{a} {b}" for a, b in zip(words, words[1:]))
+        n = self.char_n
+        for w in words:
+            padded = f" {w} "
+            feats.extend("#" + padded[i:i + n] for i in range(len(padded) - n + 1))
+        return feats
+    
+    def transform_one(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(feature ids, weights) for one text"""
+        counts: Dict[int, float] = {}
+        for feat in self.features(text):
+            idx = zlib.crc32(feat.encode()) % self.dims
+            counts[idx] = counts.get(idx, 0.0) + 1.0
+        ids = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        vals = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+        norm = np.linalg.norm(vals)
+        return ids, (vals / norm if norm else vals)
+    
+    def transform(self, texts: Sequence[str]):
+        """batch as csr parts - (ids, weights, row offsets)"""
+        rows = [self.transform_one(t) for t in texts]
+        offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(ids) for ids, _ in rows])
+        if not rows:
+            return np.zeros(0, np.int64), np.zeros(0, np.float32), offsets
+        return np.concatenate([r[0] for r in rows]), np.concatenate([r[1] for r in rows]), offsets
+
+
+def _row_sums(values: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """sum consecutive runs of rows - empty runs give zeros"""
+    out = np.zeros((len(offsets) - 1,) + values.shape[1:], dtype=np.float32)
+    lengths = np.diff(offsets)
+    nonempty = lengths > 0
+    if nonempty.any():
+        out[nonempty] = np.add.reduceat(values, offsets[:-1][nonempty], axis=0)
+    return out
+
+
+class IntentClassifier:
+    """
+    linear softmax over hashed n-grams
+    
+    args:
+        labels: the fixed label set (e.g. EMAIL_INTENTS)
+        dims: hash buckets
+    """
+    
+    def __init__(self, labels: Sequence[str], dims: int = 2 ** 18):
+        self.labels = list(labels)
+        self.vectorizer = HashedNgrams(dims)
+        self.weights = np.zeros((dims, len(self.labels)), dtype=np.float32)
+        self.bias = np.zeros(len(self.labels), dtype=np.float32)
+        self.trained_on = 0
+    
+    def _logits(self, ids, vals, offsets) -> np.ndarray:
+        return _row_sums(self.weights[ids] * vals[:, None], offsets) + self.bias
+    
+    @staticmethod
+    def _softmax(logits: np.ndarray) -> np.ndarray:
+        z = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return z / z.sum(axis=1, keepdims=True)
+    
+    def fit(self, texts: Sequence[str], labels: Sequence[str], epochs: int = 30,
+            lr: float = 1.0, l2: float = 1e-5, batch_size: int = 64, seed: int = 0) -> "IntentClassifier":
+        """mini-batch gradient descent on cross-entropy"""
+        index = {label: i for i, label in enumerate(self.labels)}
+        keep = [i for i, label in enumerate(labels) if label in index]
+        texts = [texts[i] for i in keep]
+        y = np.array([index[labels[i]] for i in keep], dtype=np.int64)
+        rows = [self.vectorizer.transform_one(t) for t in texts]
+        rnd = np.random.default_rng(seed)
+        
+        for _ in range(epochs):
+            order = rnd.permutation(len(rows))
+            for start in range(0, len(order), batch_size):
+                batch = order[start:start + batch_size]
+                ids = np.concatenate([rows[i][0] for i in batch])
+                vals = np.concatenate([rows[i][1] for i in batch])
+                offsets = np.zeros(len(batch) + 1, dtype=np.int64)
+                offsets[1:] = np.cumsum([len(rows[i][0]) for i in batch])
+                
+                probs = self._softmax(self._logits(ids, vals, offsets))
+                probs[np.arange(len(batch)), y[batch]] -= 1.0
+                delta = probs / len(batch)
+                
+                # each feature's gradient is its weight times its row's delta
+                row_of = np.repeat(np.arange(len(batch)), np.diff(offsets))
+                grad = vals[:, None] * delta[row_of]
+                touched = np.unique(ids)
+                self.weights[touched] *= (1 - lr * l2)
+                np.add.at(self.weights, ids, -lr * grad)
+                self.bias -= lr * delta.sum(axis=0)
+        
+        self.trained_on = len(rows)
+        return self
+    
+    def predict_proba(self, texts: Sequence[str]) -> np.ndarray:
+        ids, vals, offsets = self.vectorizer.transform(texts)
+        return self._softmax(self._logits(ids, vals, offsets))
+    
+    def predict(self, texts: Sequence[str]) -> List[Tuple[str, float]]:
+        """batch api - (label, confidence) per text"""
+        if not len(texts):
+            return []
+        probs = self.predict_proba(texts)
+        best = probs.argmax(axis=1)
+        return [(self.labels[i], float(probs[row, i])) for row, i in enumerate(best)]
+    
+    def predict_one(self, text: str) -> Tuple[str, float]:
+        return self.predict([text])[0]
+    
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # only rows that were ever touched - the rest are zeros
+        rows = np.flatnonzero(np.any(self.weights != 0, axis=1))
+        tmp = path + ".tmp.npz"
+        np.savez_compressed(
+            tmp, labels=np.array(self.labels), dims=self.vectorizer.dims,
+            rows=rows, values=self.weights[rows], bias=self.bias, trained_on=self.trained_on
+        )
+        os.replace(tmp, path)
+    
+    @classmethod
+    def load(cls, path: str) -> "IntentClassifier":
+        with np.load(path) as data:
+            model = cls([str(label) for label in data["labels"]], int(data["dims"]))
+            model.weights[data["rows"]] = data["values"]
+            model.bias[:] = data["bias"]
+            model.trained_on = int(data["trained_on"])
+        return model
+
+
+# training data - a separate opt-in file, never the audit log
+# (the audit log is readable by session id and the email text is only
+# regex-scrubbed, so names and diagnoses can still be in it)
+
+_training_lock = threading.Lock()
+
+
+def record_training_example(text: str, intent: str, path: str = None):
+    """append one llm-labelled, de-identified email to the training file (owner-only perms)"""
+    path = path or settings.EMAIL_TRAINING_PATH
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    line = json.dumps({"ts": time.time(), "intent": intent, "text": text[:2000]}) + "\n"
+    with _training_lock:
+        # O_APPEND so workers writing the same file don't interleave lines
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            os.write(fd, line.encode())
+        finally:
+            os.close(fd)
+
+
+def labelled_emails(path: str = None) -> Tuple[List[str], List[str]]:
+    """(texts, intents) from the training file - only llm labels ever go in it"""
+    path = path or settings.EMAIL_TRAINING_PATH
+    texts, labels = [], []
+    if not os.path.exists(path):
+        return texts, labels
+    with open(path) as f:
+        for line in f:
+            try:
+                example = json.loads(line)
+            except ValueError:
+                continue  # torn last line
+            if example.get("text") and example.get("intent"):
+                texts.append(example["text"])
+                labels.append(example["intent"])
+    return texts, labels
+
+
+def train_email_classifier(labels: Iterable[str], dataset: str = None, min_examples: int = 50,
+                           path: str = None) -> Optional[IntentClassifier]:
+    """train on the collected examples and save - None if there aren't enough yet"""
+    texts, intents = labelled_emails(dataset)
+    if len(texts) < min_examples:
+        return None
+    model = IntentClassifier(list(labels)).fit(texts, intents)
+    model.save(path or settings.EMAIL_CLASSIFIER_PATH)
+    return model
+
+
+_email_model = None
+_email_model_mtime = None
+
+
+def email_classifier() -> Optional[IntentClassifier]:
+    """the saved email model, reloaded when the file changes - None if not trained"""
+    global _email_model, _email_model_mtime
+    path = settings.EMAIL_CLASSIFIER_PATH
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    if mtime != _email_model_mtime:
+        _email_model = IntentClassifier.load(path)
+        _email_model_mtime = mtime
+    return _email_model
+
+
+if __name__ == "__main__":
+    from handlers.email import EMAIL_INTENTS
+    model = train_email_classifier(EMAIL_INTENTS)
+    if model is None:
+        print(f"not enough llm-labelled emails in {settings.EMAIL_TRAINING_PATH} yet (is EMAIL_TRAINING_ENABLED on?)")
+    else:
+        print(f"trained on {model.trained_on} emails -> {settings.EMAIL_CLASSIFIER_PATH}")
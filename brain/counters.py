@@ -0,0 +1,163 @@
+"""
+brain/counters.py - live per-day action counters for the dashboard
+updated as log_action writes, so analytics never rescans the audit log
+
+state per day is (counts, bytes of the segment already counted). on
+startup we load the last checkpoint and only read the segment tail
+written after it
+"""
+
+import json
+import os
+import threading
+from datetime import date as date_type
+from typing import Callable, Dict, List
+
+from .audit import AuditStore, audit_store
+
+
+# dashboard buckets - action name -> does it count
+CATEGORIES: Dict[str, Callable[[str], bool]] = {
+    "chats": lambda a: a.startswith("chat"),
+    "sms": lambda a: a.startswith("sms"),
+    "calls": lambda a: a.startswith("call"),
+    "emails": lambda a: a.startswith("email"),
+    "refill_reminders": lambda a: "refill_reminder" in a,
+    "refill_confirmed": lambda a: a == "refill_confirmed",
+    "escalated": lambda a: "escalat" in a or "transfer" in a,
+}
+
+CHECKPOINT_FILE = "counters.json"
+CHECKPOINT_EVERY = 1000  # entries between automatic checkpoints
+
+
+class DayCounters:
+    """counts for one day's segment"""
+    
+    def __init__(self):
+        self.position = 0  # bytes of the segment already counted
+        self.total = 0
+        self.actions: Dict[str, int] = {}
+        self.categories: Dict[str, int] = {name: 0 for name in CATEGORIES}
+    
+    def to_dict(self) -> Dict:
+        return {"position": self.position, "actions": self.actions}
+
+
+class ActionCounters:
+    """materialized per-day, per-action counts"""
+    
+    def __init__(self, store: AuditStore = None, checkpoint_path: str = None):
+        self.store = store or audit_store
+        self.checkpoint_path = checkpoint_path or os.path.join(self.store.root, CHECKPOINT_FILE)
+        self._days: Dict[str, DayCounters] = {}
+        self._action_categories: Dict[str, List[str]] = {}
+        self._since_checkpoint = 0
+        self.loaded = False
+        self._lock = threading.Lock()
+        self.store.listeners.append(self._on_append)
+    
+    def _categories_for(self, action: str) -> List[str]:
+        """which buckets an action falls in - worked out once per action name"""
+        cats = self._action_categories.get(action)
+        if cats is None:
+            cats = [name for name, match in CATEGORIES.items() if match(action)]
+            self._action_categories[action] = cats
+        return cats
+    
+    def _count(self, counters: DayCounters, action: str, n: int = 1):
+        counters.total += n
+        counters.actions[action] = counters.actions.get(action, 0) + n
+        for cat in self._categories_for(action):
+            counters.categories[cat] += n
+    
+    def _on_append(self, day: str, offset: int, records: List[tuple]):
+        """store listener - count our own writes as they land"""
+        with self._lock:
+            counters = self._days.get(day)
+            if counters is None or counters.position != offset:
+                # not loaded yet, or another process wrote in between -
+                # the next read catches up from the segment
+                return
+            for line, _, action in records:
+                self._count(counters, action)
+                counters.position += len(line)
+            self._since_checkpoint += len(records)
+        
+        if self._since_checkpoint >= CHECKPOINT_EVERY:
+            self.checkpoint()
+    
+    def _catch_up(self, day: str) -> DayCounters:
+        """count anything in the segment past our position - caller holds the lock"""
+        counters = self._days.setdefault(day, DayCounters())
+        path = self.store.segment_path(day)
+        if not os.path.exists(path):
+            return counters
+        
+        size = os.path.getsize(path)
+        if size < counters.position:
+            # segment was replaced - start over
+            counters = self._days[day] = DayCounters()
+        if size == counters.position:
+            return counters
+        
+        with open(path, "rb") as f:
+            f.seek(counters.position)
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break  # half-written line
+                counters.position += len(raw)
+                try:
+                    self._count(counters, json.loads(raw)["action"])
+                except Exception:
+                    continue
+        return counters
+    
+    def snapshot(self, day: date_type) -> Dict:
+        """current counts for a day"""
+        with self._lock:
+            counters = self._catch_up(day.isoformat())
+            return {
+                "total": counters.total,
+                "actions": dict(counters.actions),
+                "categories": dict(counters.categories),
+            }
+    
+    def load(self):
+        """rebuild from the last checkpoint plus whatever was written after it"""
+        days = self.store.days()
+        with self._lock:
+            self._days = {}
+            if os.path.exists(self.checkpoint_path):
+                try:
+                    with open(self.checkpoint_path) as f:
+                        saved = json.load(f)
+                except Exception:
+                    saved = {}
+                for day, data in saved.items():
+                    counters = DayCounters()
+                    for action, n in data.get("actions", {}).items():
+                        self._count(counters, action, n)
+                    counters.position = data.get("position", 0)
+                    self._days[day] = counters
+            
+            for day in days:
+                self._catch_up(day)
+            self.loaded = True
+    
+    def checkpoint(self):
+        """save counts + positions so the next startup only reads the tail"""
+        with self._lock:
+            data = {day: counters.to_dict() for day, counters in self._days.items()}
+            self._since_checkpoint = 0
+        
+        os.makedirs(os.path.dirname(self.checkpoint_path), exist_ok=True)
+        # per-process temp file - several workers may checkpoint at once
+        tmp_path = f"{self.checkpoint_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+
+# singleton
+action_counters = ActionCounters()
@@ -0,0 +1,112 @@
+"""
+brain/matcher.py - multi-keyword matching in one pass
+compiles a keyword table (label -> keywords) into a single regex so
+finding every keyword in a message is one scan instead of a loop of
+`kw in text` checks per label - overlapping keywords are still found
+"""
+
+import re
+from typing import Dict, Hashable, Iterable, List, Mapping, Optional
+
+
+def trie_regex(keywords: Iterable[str]) -> str:
+    """prefix-factored alternation matching exactly the given strings"""
+    trie: Dict = {}
+    for kw in keywords:
+        node = trie
+        for ch in kw:
+            node = node.setdefault(ch, {})
+        node[""] = True  # end of a keyword
+    
+    def build(node: Dict) -> str:
+        end = "" in node
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if end:
+            # a keyword ends here but longer ones continue
+            body = (body if len(branches) > 1 else "(?:" + body + ")") + "?"
+        return body
+    
+    return build(trie)
+
+
+class KeywordMatcher:
+    """
+    case-insensitive substring matcher over a keyword table
+    
+    labels keep the table's order, which callers use as priority
+    (first label wins, like the old if/for chains)
+    """
+    
+    def __init__(self, table: Mapping[Hashable, Iterable[str]]):
+        self.labels = list(table)
+        self.rank = {label: i for i, label in enumerate(self.labels)}
+        self.owners: Dict[str, List[Hashable]] = {}
+        for label, keywords in table.items():
+            for kw in keywords:
+                owners = self.owners.setdefault(kw.lower(), [])
+                if label not in owners:
+                    owners.append(label)
+        
+        # the regex is a trie ("ne(?:w patient|ver been)") so each position
+        # costs one branch per character instead of one try per keyword,
+        # and it's greedy, so the longest keyword at a position wins
+        keywords = sorted(self.owners)
+        self.pattern = re.compile(trie_regex(keywords)) if keywords else None
+        
+        # the scan skips keywords that start inside a match - for each
+        # keyword, list the others that could: (other, None) when fully
+        # contained, else (other, merged) where merged is the overlapped
+        # text that has to appear for the other keyword to start inside
+        self.inner = {kw: self._inner(kw, keywords) for kw in keywords}
+    
+    @staticmethod
+    def _inner(kw: str, keywords: List[str]) -> List[tuple]:
+        inner = []
+        for other in keywords:
+            if other == kw:
+                continue
+            if other in kw:
+                inner.append((other, None))
+                continue
+            for offset in range(1, len(kw)):
+                if other.startswith(kw[offset:]):
+                    inner.append((other, kw[:offset] + other))
+        return inner
+    
+    def keywords(self, text: str) -> List[str]:
+        """every distinct keyword in the text, in order of first appearance"""
+        if self.pattern is None:
+            return []
+        text = text.lower()
+        hits = self.pattern.findall(text)
+        if not hits:
+            return hits
+        found = dict.fromkeys(hits)
+        for kw in hits:
+            for other, merged in self.inner[kw]:
+                if other not in found and (merged is None or merged in text):
+                    found[other] = None
+        return list(found)
+    
+    def matches(self, text: str) -> Dict[Hashable, List[str]]:
+        """label -> keywords found for it, labels in table order"""
+        hits: Dict[Hashable, List[str]] = {}
+        for kw in self.keywords(text):
+            for label in self.owners[kw]:
+                if label in hits:
+                    hits[label].append(kw)
+                else:
+                    hits[label] = [kw]
+        if len(hits) > 1:
+            return {label: hits[label] for label in sorted(hits, key=self.rank.__getitem__)}
+        return hits
+    
+    def first(self, text: str, default: Hashable = None) -> Optional[Hashable]:
+        """highest-priority label with any keyword in the text"""
+        found = self.keywords(text)
+        if not found:
+            return default
+        return min((label for kw in found for label in self.owners[kw]), key=self.rank.__getitem__)
@@ -0,0 +1,74 @@
+"""
+brain/pipeline.py - run async steps as soon as their inputs are ready
+steps that don't depend on each other run at the same time
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class Pipeline:
+    """
+    small dependency graph of async steps
+    
+    each step gets the results of its deps as positional args, in order.
+    deps have to be added first, so the graph can't have cycles
+    
+        p = Pipeline()
+        p.step("a", fetch_a)
+        p.step("b", fetch_b)
+        p.step("c", combine, "a", "b")  # waits for a and b, which run together
+        results = await p.run()
+    """
+    
+    def __init__(self):
+        self.steps: Dict[str, Tuple[Callable[..., Awaitable], Tuple[str, ...]]] = {}
+        self.timings: Dict[str, float] = {}  # name -> ms spent in the step itself
+        self.started: Dict[str, float] = {}  # name -> ms after run() began
+        self.total_ms = 0.0
+    
+    def step(self, name: str, fn: Callable[..., Awaitable], *deps: str) -> "Pipeline":
+        """add a step - returns self so calls chain"""
+        if name in self.steps:
+            raise ValueError(f"duplicate step: {name}")
+        missing = [d for d in deps if d not in self.steps]
+        if missing:
+            raise ValueError(f"step {name} depends on unknown steps: {missing}")
+        self.steps[name] = (fn, deps)
+        return self
+    
+    async def run(self) -> Dict[str, Any]:
+        """run every step, returns name -> result. first failure cancels the rest"""
+        begin = time.perf_counter()
+        tasks: Dict[str, asyncio.Task] = {}
+        
+        async def go(name):
+            fn, deps = self.steps[name]
+            args = [await tasks[d] for d in deps]
+            start = time.perf_counter()
+            self.started[name] = round((start - begin) * 1000, 2)
+            try:
+                return await fn(*args)
+            finally:
+                self.timings[name] = round((time.perf_counter() - start) * 1000, 2)
+        
+        # tasks don't start until we yield, so every dep is in the dict by then
+        for name in self.steps:
+            tasks[name] = asyncio.create_task(go(name))
+        
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        finally:
+            self.total_ms = round((time.perf_counter() - begin) * 1000, 2)
+        
+        return {name: task.result() for name, task in tasks.items()}
+    
+    def report(self) -> Dict[str, Any]:
+        """timings for debug output"""
+        return {"total_ms": self.total_ms, "steps_ms": dict(self.timings), "started_ms": dict(self.started)}
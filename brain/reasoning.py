@@ -3,12 +3,13 @@ brain/reasoning.py - unified AI reasoning engine
 wraps openai with de-identification
 """
 
-from typing import Dict, Any, Optional
+from typing import Dict, Any, AsyncIterator, Optional
 import json
 
+from config import settings
 from phi.deidentify import deidentify
-from phi.reidentify import reidentify
-from integrations.openai_client import get_completion
+from phi.reidentify import StreamingReidentifier, reidentify
+from integrations.openai_client import get_completion, get_completion_stream
 from .audit import log_action
 
 
@@ -34,6 +35,18 @@ Confirm important details by repeating them back.""",
 }
 
 
+# contexts whose prompts carry a patient's own message - never cached
+UNCACHED_CONTEXTS = ("email",)
+
+
+def answer_cache():
+    """the semantic answer cache, None when it's off (numpy is only imported when on)"""
+    if not settings.SEMANTIC_CACHE_ENABLED:
+        return None
+    from .semantic_cache import semantic_cache
+    return semantic_cache
+
+
 class ReasoningEngine:
     """main AI reasoning wrapper"""
     
@@ -41,6 +54,15 @@ class ReasoningEngine:
         self.context = context
         self.system_prompt = SYSTEM_PROMPTS.get(context, SYSTEM_PROMPTS["chat"])
     
+    def _answer_cache(self, safe_data, patient_data: Dict[str, str] = None):
+        """the answer cache if this call may use it - never for a known patient"""
+        cache = answer_cache()
+        if cache is None or patient_data or self.context in UNCACHED_CONTEXTS:
+            return None
+        if not cache.cacheable(safe_data.text, safe_data.token_map):
+            return None
+        return cache
+    
     async def process(self, 
                       user_input: str, 
                       patient_data: Dict[str, str] = None,
@@ -69,7 +91,18 @@ class ReasoningEngine:
             {"role": "user", "content": safe_data.text}
         ]
         
-        ai_response = await get_completion(messages)
+        # generic questions (no phi at all) can reuse an earlier answer
+        cache = self._answer_cache(safe_data, patient_data)
+        cached, vector = None, None
+        if cache is not None:
+            cached, vector = await cache.lookup(safe_data.text, self.context)
+        
+        if cached is not None:
+            ai_response = cached
+        else:
+            ai_response = await get_completion(messages, priority=self.context)
+            if vector is not None:
+                cache.store(self.context, vector, safe_data.text, ai_response)
         
         # step 3: reidentify the response
         final_response = reidentify(ai_response, safe_data.token_map)
@@ -78,9 +111,52 @@ class ReasoningEngine:
             "response": final_response,
             "deidentified_input": safe_data.text,
             "tokens_found": len(safe_data.token_map),
-            "context": self.context
+            "context": self.context,
+            "cached": cached is not None
         }
     
+    async def process_stream(self,
+                             user_input: str,
+                             patient_data: Dict[str, str] = None,
+                             session_id: str = None) -> AsyncIterator[str]:
+        """
+        same as process, but yields the response as it's generated
+        tokens are restored on the fly, even when split across chunks
+        """
+        safe_data = deidentify(user_input, patient_data)
+        
+        if session_id:
+            log_action("ai_call", session_id, f"context={self.context} stream=true")
+        
+        messages = [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": safe_data.text}
+        ]
+        
+        cache = self._answer_cache(safe_data, patient_data)
+        cached, vector = None, None
+        if cache is not None:
+            cached, vector = await cache.lookup(safe_data.text, self.context)
+        
+        if cached is not None:
+            yield reidentify(cached, safe_data.token_map)
+            return
+        
+        restorer = StreamingReidentifier(safe_data.token_map)
+        parts = []
+        async for delta in get_completion_stream(messages, priority=self.context):
+            parts.append(delta)
+            text = restorer.feed(delta)
+            if text:
+                yield text
+        
+        tail = restorer.flush()
+        if tail:
+            yield tail
+        
+        if vector is not None:
+            cache.store(self.context, vector, safe_data.text, "".join(parts))
+    
     async def classify(self, text: str) -> Dict[str, Any]:
         """
         classify text intent without generating a response
@@ -100,7 +176,7 @@ Return format: {{"intent": "category", "confidence": 0.0-1.0, "summary": "brief
             {"role": "user", "content": classify_prompt}
         ]
         
-        result = await get_completion(messages)
+        result = await get_completion(messages, priority=self.context)
         
         # try to parse as json
         try:
@@ -7,6 +7,8 @@ from enum import Enum
 from typing import Dict, Any, Optional
 from dataclasses import dataclass
 
+from .matcher import KeywordMatcher
+
 
 class EventType(Enum):
     CHAT = "chat"
@@ -51,21 +53,47 @@ INTENT_KEYWORDS = {
 }
 
 
+# compiled once - every keyword found in a single pass
+_intent_matcher = KeywordMatcher(INTENT_KEYWORDS)
+
+
+def keyword_weight(kw: str) -> float:
+    """longer keywords are more specific"""
+    return 0.7 if len(kw) > 5 else 0.5
+
+
+def score_intents(text: str) -> Dict[Intent, float]:
+    """intent -> summed weight of its keywords found in text (table order)"""
+    return {
+        intent: sum(map(keyword_weight, keywords))
+        for intent, keywords in _intent_matcher.matches(text).items()
+    }
+
+
 def detect_intent(text: str) -> tuple[Intent, float]:
     """
     basic intent detection from text
     returns intent and confidence score
+    
+    every intent's keywords are scored, the best total wins and ties go
+    to the intent listed first in INTENT_KEYWORDS
     """
-    text_lower = text.lower()
+    hits = _intent_matcher.matches(text)
+    if not hits:
+        return Intent.UNKNOWN, 0.3
     
-    for intent, keywords in INTENT_KEYWORDS.items():
-        for kw in keywords:
-            if kw in text_lower:
-                # found a match - confidence based on keyword specificity
-                confidence = 0.7 if len(kw) > 5 else 0.5
-                return intent, confidence
+    if len(hits) == 1:
+        intent, keywords = next(iter(hits.items()))
+    else:
+        # max() keeps the first of equal scores, and hits are in table order
+        intent = max(hits, key=lambda i: sum(map(keyword_weight, hits[i])))
+        keywords = hits[intent]
     
-    return Intent.UNKNOWN, 0.3
+    # strongest keyword, nudged up a little for each extra one that agrees
+    confidence = max(map(keyword_weight, keywords))
+    if len(keywords) > 1:
+        confidence = round(min(0.95, confidence + 0.1 * (len(keywords) - 1)), 2)
+    return intent, confidence
 
 
 def route_event(event_type: EventType, payload: Dict[str, Any]) -> RouteResult:
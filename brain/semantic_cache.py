@@ -0,0 +1,231 @@
+"""
+brain/semantic_cache.py - answer cache keyed on meaning, not exact text
+embeds the de-identified question and reuses a previous answer when a
+close enough question was already answered in the same context
+
+vectors live in a memory-mapped .npy per context so startup is instant,
+question/answer text sits next to it in a jsonl file (row n <-> line n)
+"""
+
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # windows - in-process locking only
+    fcntl = None
+
+from config import settings
+from phi.deidentify import quick_check
+from phi.reidentify import TOKEN_PATTERN
+
+
+VECTORS_FILE = "vectors.npy"
+ENTRIES_FILE = "entries.jsonl"
+LOCK_FILE = ".lock"
+INITIAL_CAPACITY = 1024
+
+# names the phi patterns miss - an untitled introduction ("this is jane,")
+# or a greeting ("Hi Jane") ties the text to one patient
+_PERSONAL = re.compile(
+    r"\b(?:this is|my name is|i'm|i am|it's)\s+[a-z]+(?:\s+[a-z]+)?\s*(?:[,.!?]|$)"
+    r"|^\W*(?:hi|hello|hey|dear)\s+(?!there\b|all\b|team\b)[a-z]+",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+
+class VectorIndex:
+    """
+    append-only matrix of unit vectors backed by a .npy memmap
+    rows past `size` are preallocated space, grown by doubling
+    
+    prefork workers share the files - appends take an flock on the
+    directory and write at the on-disk entry count, and each process
+    reads in what the others appended before searching or writing
+    """
+    
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.vectors_path = os.path.join(directory, VECTORS_FILE)
+        self.entries_path = os.path.join(directory, ENTRIES_FILE)
+        self.lock_path = os.path.join(directory, LOCK_FILE)
+        self.entries: List[Dict[str, str]] = []
+        self.matrix: Optional[np.ndarray] = None
+        self._offset = 0  # bytes of entries.jsonl already read
+        self._vectors_id = None  # (dev, inode) the matrix was mapped from
+        self._lock = threading.Lock()
+        with self._lock:
+            self._catch_up()
+    
+    @property
+    def size(self) -> int:
+        return len(self.entries)
+    
+    @contextmanager
+    def _file_lock(self, exclusive: bool):
+        if not fcntl:
+            yield
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.lock_path, "a") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+    
+    def _catch_up(self):
+        """read entries appended since last time (by any process), remap a regrown matrix"""
+        if os.path.exists(self.entries_path):
+            with open(self.entries_path, "rb") as f:
+                f.seek(self._offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # torn last line from a crash
+                    try:
+                        self.entries.append(json.loads(line))
+                    except ValueError:
+                        break
+                    self._offset += len(line)
+        # entries are written after their vector, so once we've seen an
+        # entry the file it points into is already in place
+        try:
+            st = os.stat(self.vectors_path)
+        except FileNotFoundError:
+            return
+        if (st.st_dev, st.st_ino) != self._vectors_id:
+            self.matrix = np.load(self.vectors_path, mmap_mode="r+")
+            self._vectors_id = (st.st_dev, st.st_ino)
+    
+    def _stale(self) -> bool:
+        try:
+            return os.path.getsize(self.entries_path) != self._offset
+        except FileNotFoundError:
+            return False
+    
+    def _ensure_capacity(self, dim: int):
+        if self.matrix is not None and self.size < self.matrix.shape[0]:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        capacity = max(INITIAL_CAPACITY, 2 * self.size)
+        tmp = f"{self.vectors_path}.{os.getpid()}.tmp"
+        grown = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=(capacity, dim))
+        if self.matrix is not None:
+            grown[:self.size] = self.matrix[:self.size]
+        grown.flush()
+        del grown
+        os.replace(tmp, self.vectors_path)
+        st = os.stat(self.vectors_path)
+        self.matrix = np.load(self.vectors_path, mmap_mode="r+")
+        self._vectors_id = (st.st_dev, st.st_ino)
+    
+    def search(self, vector: np.ndarray) -> Tuple[int, float]:
+        """(row, cosine similarity) of the best match, (-1, 0.0) when empty"""
+        with self._lock:
+            if self._stale():
+                with self._file_lock(exclusive=False):
+                    self._catch_up()
+            if not self.size or self.matrix.shape[1] != vector.shape[0]:
+                return -1, 0.0
+            scores = self.matrix[:self.size] @ vector
+            best = int(np.argmax(scores))
+            return best, float(scores[best])
+    
+    def add(self, vector: np.ndarray, entry: Dict[str, str]):
+        with self._lock, self._file_lock(exclusive=True):
+            # the row is the on-disk count, not what this process has seen
+            self._catch_up()
+            if self.matrix is not None and self.matrix.shape[1] != vector.shape[0]:
+                raise ValueError(f"embedding size changed: {self.matrix.shape[1]} -> {vector.shape[0]}")
+            self._ensure_capacity(vector.shape[0])
+            self.matrix[self.size] = vector
+            self.matrix.flush()
+            line = (json.dumps(entry) + "\n").encode()
+            with open(self.entries_path, "ab") as f:
+                # drop a torn tail first, or line n would stop matching row n
+                if f.tell() > self._offset:
+                    f.truncate(self._offset)
+                f.write(line)
+            self.entries.append(entry)
+            self._offset += len(line)
+
+
+def normalize(vector) -> np.ndarray:
+    v = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(v)
+    return v / norm if norm else v
+
+
+class SemanticCache:
+    """
+    args:
+        embedder: async text -> vector (defaults to openai get_embedding)
+        directory: where the per-context indexes live
+        threshold: min cosine similarity to reuse an answer
+    """
+    
+    def __init__(self, embedder: Callable[[str], Awaitable[List[float]]] = None,
+                 directory: str = None, threshold: float = None):
+        if embedder is None:
+            from integrations.openai_client import get_embedding
+            embedder = get_embedding
+        self.embedder = embedder
+        self.directory = directory or settings.SEMANTIC_CACHE_DIR
+        self.threshold = settings.SEMANTIC_CACHE_THRESHOLD if threshold is None else threshold
+        self.indexes: Dict[str, VectorIndex] = {}
+        self.counts = {"hits": 0, "misses": 0, "skipped_phi": 0}
+    
+    def index(self, context: str) -> VectorIndex:
+        if context not in self.indexes:
+            self.indexes[context] = VectorIndex(os.path.join(self.directory, context))
+        return self.indexes[context]
+    
+    @staticmethod
+    def cacheable(text: str, token_map: Dict[str, str] = None) -> bool:
+        """
+        only generic text - anything with phi, [TYPE_N] tokens (already
+        de-identified upstream) or a patient's name would hand one
+        patient's answer to another
+        """
+        return (not token_map and not quick_check(text)
+                and not TOKEN_PATTERN.search(text) and not _PERSONAL.search(text))
+    
+    async def lookup(self, text: str, context: str) -> Tuple[Optional[str], np.ndarray]:
+        """
+        (cached answer or None, query vector)
+        pass the vector back to store() so a miss only embeds once
+        """
+        vector = normalize(await self.embedder(text))
+        index = self.index(context)
+        row, score = index.search(vector)
+        if row >= 0 and score >= self.threshold:
+            self.counts["hits"] += 1
+            return index.entries[row]["answer"], vector
+        self.counts["misses"] += 1
+        return None, vector
+    
+    def store(self, context: str, vector: np.ndarray, question: str, answer: str) -> bool:
+        if answer.startswith("Error:"):
+            return False
+        if not self.cacheable(question) or not self.cacheable(answer):
+            self.counts["skipped_phi"] += 1
+            return False
+        self.index(context).add(vector, {"question": question, "answer": answer})
+        return True
+    
+    def stats(self) -> Dict:
+        lookups = self.counts["hits"] + self.counts["misses"]
+        return {
+            **self.counts,
+            "hit_rate": round(self.counts["hits"] / lookups, 4) if lookups else 0.0,
+            "entries": {ctx: idx.size for ctx, idx in self.indexes.items()},
+        }
+
+
+semantic_cache = SemanticCache() if settings.SEMANTIC_CACHE_ENABLED else None
@@ -12,20 +12,87 @@ load_dotenv()
 class Settings:
     # openai stuff
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+    # empty = the real api, set to point at a proxy or local stub
+    OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "")
+    
+    # llm dispatch - concurrent openai calls and retry backoff (seconds)
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+    LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+    LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+    LLM_BACKOFF_CAP = float(os.getenv("LLM_BACKOFF_CAP", "20"))
+    
+    # completion cache - path enables the sqlite tier, hotter calls skip the cache
+    COMPLETION_CACHE_ENABLED = os.getenv("COMPLETION_CACHE_ENABLED", "true").lower() == "true"
+    COMPLETION_CACHE_SIZE = int(os.getenv("COMPLETION_CACHE_SIZE", "2048"))
+    COMPLETION_CACHE_TTL = float(os.getenv("COMPLETION_CACHE_TTL", "86400"))
+    COMPLETION_CACHE_PATH = os.getenv("COMPLETION_CACHE_PATH", "")
+    COMPLETION_CACHE_MAX_TEMPERATURE = float(os.getenv("COMPLETION_CACHE_MAX_TEMPERATURE", "0.7"))
+    
+    # semantic answer cache - costs one embedding call per question when on
+    SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+    SEMANTIC_CACHE_DIR = os.getenv("SEMANTIC_CACHE_DIR", "logs/semantic_cache")
+    SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+    
+    # local email intent model - below the threshold the llm classifies
+    EMAIL_CLASSIFIER_PATH = os.getenv("EMAIL_CLASSIFIER_PATH", "logs/email_classifier.npz")
+    EMAIL_CLASSIFIER_THRESHOLD = float(os.getenv("EMAIL_CLASSIFIER_THRESHOLD", "0.85"))
+    # opt-in: keep llm-labelled (de-identified) emails as training data, never in the audit log
+    EMAIL_TRAINING_ENABLED = os.getenv("EMAIL_TRAINING_ENABLED", "false").lower() == "true"
+    EMAIL_TRAINING_PATH = os.getenv("EMAIL_TRAINING_PATH", "logs/email_training.jsonl")
     
     # ghl config
     GHL_API_KEY = os.getenv("GHL_API_KEY", "")
     GHL_LOCATION_ID = os.getenv("GHL_LOCATION_ID", "")
     GHL_BASE_URL = "https://rest.gohighlevel.com/v1"
+    GHL_MAX_CONNECTIONS = int(os.getenv("GHL_MAX_CONNECTIONS", "20"))
+    GHL_TIMEOUT = float(os.getenv("GHL_TIMEOUT", "10"))
+    # ghl allows ~100 requests per 10s per location
+    GHL_RATE_PER_SECOND = float(os.getenv("GHL_RATE_PER_SECOND", "10"))
+    GHL_RATE_BURST = float(os.getenv("GHL_RATE_BURST", "100"))
+    GHL_ENDPOINT_RATE_PER_SECOND = float(os.getenv("GHL_ENDPOINT_RATE_PER_SECOND", "10"))
+    GHL_ENDPOINT_RATE_BURST = float(os.getenv("GHL_ENDPOINT_RATE_BURST", "20"))
+    GHL_MAX_RETRIES = int(os.getenv("GHL_MAX_RETRIES", "3"))
+    
+    # outbound sms queue
+    SMS_QUEUE_WORKERS = int(os.getenv("SMS_QUEUE_WORKERS", "8"))
+    SMS_RATE_PER_SECOND = float(os.getenv("SMS_RATE_PER_SECOND", "10"))
+    SMS_PER_CONTACT_INTERVAL = float(os.getenv("SMS_PER_CONTACT_INTERVAL", "1"))
+    SMS_MAX_RETRIES = int(os.getenv("SMS_MAX_RETRIES", "3"))
+    SMS_SENT_KEY_RETENTION_DAYS = float(os.getenv("SMS_SENT_KEY_RETENTION_DAYS", "30"))
+    
+    # intake sessions - sqlite is shared by workers, memory is per process
+    INTAKE_SESSION_BACKEND = os.getenv("INTAKE_SESSION_BACKEND", "sqlite")
+    INTAKE_SESSION_PATH = os.getenv("INTAKE_SESSION_PATH", "logs/intake_sessions.db")
+    INTAKE_SESSION_TTL = float(os.getenv("INTAKE_SESSION_TTL", "86400"))
+    INTAKE_SESSION_SWEEP_INTERVAL = float(os.getenv("INTAKE_SESSION_SWEEP_INTERVAL", "300"))
     
     # airtable
     AIRTABLE_API_KEY = os.getenv("AIRTABLE_API_KEY", "")
     AIRTABLE_BASE_ID = os.getenv("AIRTABLE_BASE_ID", "")
     AIRTABLE_BASE_URL = "https://api.airtable.com/v0"
+    AIRTABLE_MAX_CONNECTIONS = int(os.getenv("AIRTABLE_MAX_CONNECTIONS", "20"))
+    AIRTABLE_MAX_KEEPALIVE = int(os.getenv("AIRTABLE_MAX_KEEPALIVE", "10"))
+    AIRTABLE_TIMEOUT = float(os.getenv("AIRTABLE_TIMEOUT", "10"))
+    AIRTABLE_BATCH_CONCURRENCY = int(os.getenv("AIRTABLE_BATCH_CONCURRENCY", "4"))
+    
+    # patient-by-phone lookup cache (seconds)
+    PATIENT_CACHE_SIZE = int(os.getenv("PATIENT_CACHE_SIZE", "1024"))
+    PATIENT_CACHE_TTL = float(os.getenv("PATIENT_CACHE_TTL", "300"))
+    PATIENT_CACHE_NEGATIVE_TTL = float(os.getenv("PATIENT_CACHE_NEGATIVE_TTL", "30"))
     
     # vapi voice
     VAPI_API_KEY = os.getenv("VAPI_API_KEY", "")
     
+    # server - workers > 0 runs the preforking production launcher
+    SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+    SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+    SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "0"))
+    SERVER_GRACEFUL_TIMEOUT = int(os.getenv("SERVER_GRACEFUL_TIMEOUT", "30"))
+    SERVER_DRAIN_DELAY = float(os.getenv("SERVER_DRAIN_DELAY", "0"))
+    
+    # per-request span timing, exported at /api/metrics (prometheus text)
+    TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+    
     # app config
     DEBUG = os.getenv("DEBUG", "false").lower() == "true"
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
@@ -35,6 +102,17 @@ class Settings:
     
     # phi settings - how long to keep re-id mappings (hours)
     PHI_MAPPING_TTL = 24
+    
+    # batch deidentify - batches bigger than this go to a process pool
+    PHI_BATCH_INLINE_MAX = int(os.getenv("PHI_BATCH_INLINE_MAX", "64"))
+    PHI_BATCH_WORKERS = int(os.getenv("PHI_BATCH_WORKERS", "0"))  # 0 = one per core
+    
+    # audit writer - "sync" writes on every call, "buffered" group-commits
+    # from a background thread
+    AUDIT_WRITE_MODE = os.getenv("AUDIT_WRITE_MODE", "sync")
+    AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "256"))
+    AUDIT_MAX_LATENCY_MS = int(os.getenv("AUDIT_MAX_LATENCY_MS", "50"))
+    AUDIT_FSYNC = os.getenv("AUDIT_FSYNC", "never")  # never, batch
 
 
 settings = Settings()
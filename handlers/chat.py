@@ -4,14 +4,18 @@ handles patient questions from the website
 """
 
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, Optional, Tuple
+import asyncio
+import json
 import uuid
 
 from brain.reasoning import ReasoningEngine
 from brain.router import detect_intent, Intent
+from brain.matcher import KeywordMatcher
 from brain.audit import log_action
-from integrations.airtable import airtable
+from integrations.airtable import async_airtable
 
 
 router = APIRouter()
@@ -36,29 +40,24 @@ QUICK_REPLIES = {
     "location": "We're located at 123 Main Street. There's parking in the back.",
     "insurance": "We accept most major insurance plans. Please call for specifics on your plan.",
 }
+quick_reply_matcher = KeywordMatcher({kw: [kw] for kw in QUICK_REPLIES})
 
 
-@router.post("/message", response_model=ChatResponse)
-async def handle_chat_message(msg: ChatMessage):
+async def route_message(msg: ChatMessage, session_id: str) -> Tuple[Optional[ChatResponse], Optional[Intent], Optional[Dict]]:
     """
-    handle incoming chat message
-    returns ai response or routes to human
+    quick replies, intent and escalation
+    returns (finished response, None, None) when no ai is needed,
+    otherwise (None, intent, patient data)
     """
-    session_id = msg.session_id or str(uuid.uuid4())
-    
-    # log the incoming message
-    log_action("chat_received", session_id, msg.message[:100])
-    
     # check for quick reply matches first
-    msg_lower = msg.message.lower()
-    for keyword, reply in QUICK_REPLIES.items():
-        if keyword in msg_lower:
-            return ChatResponse(
-                response=reply,
-                session_id=session_id,
-                needs_human=False,
-                intent="quick_reply"
-            )
+    keyword = quick_reply_matcher.first(msg.message)
+    if keyword:
+        return ChatResponse(
+            response=QUICK_REPLIES[keyword],
+            session_id=session_id,
+            needs_human=False,
+            intent="quick_reply"
+        ), None, None
     
     # detect intent
     intent, confidence = detect_intent(msg.message)
@@ -66,7 +65,7 @@ async def handle_chat_message(msg: ChatMessage):
     # if we need to look up patient data
     patient_data = None
     if msg.patient_phone:
-        patient = airtable.find_patient_by_phone(msg.patient_phone)
+        patient = await async_airtable.find_patient_by_phone(msg.patient_phone)
         if patient:
             patient_data = {
                 "name": patient.get("fields", {}).get("Name"),
@@ -81,7 +80,25 @@ async def handle_chat_message(msg: ChatMessage):
             session_id=session_id,
             needs_human=True,
             intent=intent.value
-        )
+        ), None, None
+    
+    return None, intent, patient_data
+
+
+@router.post("/message", response_model=ChatResponse)
+async def handle_chat_message(msg: ChatMessage):
+    """
+    handle incoming chat message
+    returns ai response or routes to human
+    """
+    session_id = msg.session_id or str(uuid.uuid4())
+    
+    # log the incoming message
+    log_action("chat_received", session_id, msg.message[:100])
+    
+    done, intent, patient_data = await route_message(msg, session_id)
+    if done:
+        return done
     
     # use AI for response
     engine = ReasoningEngine("chat")
@@ -101,9 +118,52 @@ async def handle_chat_message(msg: ChatMessage):
     )
 
 
+def sse(data: Dict, event: str = None) -> str:
+    """one server-sent event - json data so newlines in text are safe"""
+    head = f"event: {event}\n" if event else ""
+    return f"{head}data: {json.dumps(data)}\n\n"
+
+
+@router.post("/stream")
+async def stream_chat_message(msg: ChatMessage):
+    """
+    same as /message, but the answer streams back as server-sent events
+    
+    events: "meta" (session_id, intent, needs_human), then unnamed
+    message events with {"text": ...} pieces, then "done"
+    """
+    session_id = msg.session_id or str(uuid.uuid4())
+    log_action("chat_received", session_id, msg.message[:100])
+    
+    done, intent, patient_data = await route_message(msg, session_id)
+    
+    async def events():
+        if done:
+            yield sse({"session_id": session_id, "intent": done.intent, "needs_human": done.needs_human}, "meta")
+            yield sse({"text": done.response})
+            yield sse({}, "done")
+            return
+        
+        yield sse({"session_id": session_id, "intent": intent.value, "needs_human": False}, "meta")
+        engine = ReasoningEngine("chat")
+        async for text in engine.process_stream(msg.message, patient_data=patient_data, session_id=session_id):
+            yield sse({"text": text})
+        
+        log_action("chat_responded", session_id, "stream=true")
+        yield sse({}, "done")
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # no proxy buffering, or the first byte waits for the last
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/history/{session_id}")
 async def get_chat_history(session_id: str):
     """get chat history for a session - for debugging"""
     from brain.audit import get_session_logs
-    logs = get_session_logs(session_id)
+    # flushes the audit writer and reads the segments - keep it off the loop
+    logs = await asyncio.to_thread(get_session_logs, session_id)
     return {"session_id": session_id, "logs": [l.model_dump() for l in logs]}
@@ -5,14 +5,17 @@ classifies emails and drafts responses
 
 from fastapi import APIRouter
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
+import json
 import uuid
 import re
 
+from config import settings
 from brain.reasoning import ReasoningEngine
+from brain.pipeline import Pipeline
 from brain.audit import log_action
 from phi.deidentify import deidentify
-from integrations.ghl import ghl
+from integrations.ghl import async_ghl
 
 
 router = APIRouter()
@@ -32,6 +35,13 @@ class TriageResult(BaseModel):
     draft_response: Optional[str] = None
     contact_id: Optional[str] = None
     tasks_created: List[str] = []
+    metadata: Optional[Dict[str, Any]] = None  # step timings, only when DEBUG is on
+
+
+def email_classifier():
+    """local intent model - imported on first triage so numpy isn't a startup cost"""
+    from brain.classifier import email_classifier as load
+    return load()
 
 
 # email intent categories
@@ -69,6 +79,9 @@ async def triage_email(email: EmailPayload):
     """
     triage incoming email
     classifies and drafts response
+    
+    the steps run as a small pipeline - the contact lookup doesn't wait
+    for classification, and the draft, task and note run side by side
     """
     session_id = email.thread_id or str(uuid.uuid4())
     
@@ -77,23 +90,52 @@ async def triage_email(email: EmailPayload):
     # deidentify the email content
     safe_email = deidentify(f"Subject: {email.subject}\n\n{email.body}")
     
-    # classify with AI
-    engine = ReasoningEngine("email")
-    
-    classify_prompt = f"""Classify this pharmacy email and determine priority.
-
-Email content:
-{safe_email.text}
-
-Classify as one of: {', '.join(EMAIL_INTENTS)}
-
-Also determine priority: high, medium, low
-
-Return JSON format:
-{{"intent": "category", "confidence": 0.0-1.0, "priority": "high/medium/low", "summary": "brief description"}}"""
-    
-    result = await engine.classify(classify_prompt)
+    async def classify():
+        # confident local prediction first - the llm only sees the hard ones
+        model = email_classifier()
+        if model is not None:
+            label, score = model.predict_one(safe_email.text)
+            if score >= settings.EMAIL_CLASSIFIER_THRESHOLD:
+                result = {"intent": label, "confidence": round(score, 3), "summary": email.subject}
+                return result, "local"
+        return await classify_with_llm(safe_email.text), "llm"
+    
+    async def find_contact():
+        contacts = await async_ghl.search_contacts(email.from_email)
+        return contacts[0].get("id") if contacts else None
+    
+    async def draft(classified):
+        # draft response if confidence is high enough
+        result, _ = classified
+        intent = result.get("intent", "general")
+        if result.get("confidence", 0.5) > 0.7 and intent != "spam":
+            return await generate_draft_response(email, intent, safe_email.text)
+        return None
+    
+    async def create_task(classified, contact_id):
+        intent = classified[0].get("intent", "general")
+        if contact_id and intent in ["refill_request", "rx_status"]:
+            task = await async_ghl.create_task(contact_id, f"Email: {intent} - {email.subject[:30]}")
+            return task.get("id", "")
+        return None
+    
+    async def add_note(classified, contact_id):
+        # add note with email summary
+        if contact_id:
+            summary = classified[0].get("summary", email.subject)
+            await async_ghl.add_note(contact_id, f"Email received: {summary[:100]}")
+    
+    pipeline = (
+        Pipeline()
+        .step("classify", classify)
+        .step("contact", find_contact)
+        .step("draft", draft, "classify")
+        .step("task", create_task, "classify", "contact")
+        .step("note", add_note, "classify", "contact")
+    )
+    done = await pipeline.run()
     
+    result, source = done["classify"]
     intent = result.get("intent", "general")
     confidence = result.get("confidence", 0.5)
     priority = result.get("priority", "medium")
@@ -102,41 +144,46 @@ Return JSON format:
     if intent in ["new_patient", "provider_update", "rx_status"]:
         priority = "high"
     
-    # look up contact
-    metadata = extract_email_metadata(email.body)
-    contact_id = None
-    
-    contacts = ghl.search_contacts(email.from_email)
-    if contacts:
-        contact_id = contacts[0].get("id")
-    
-    # draft response if confidence is high enough
-    draft = None
-    if confidence > 0.7 and intent != "spam":
-        draft = await generate_draft_response(email, intent, safe_email.text)
-    
-    # create tasks based on intent
-    tasks = []
-    if contact_id:
-        if intent in ["refill_request", "rx_status"]:
-            task = ghl.create_task(contact_id, f"Email: {intent} - {email.subject[:30]}")
-            tasks.append(task.get("id", ""))
-        
-        # add note with email summary
-        ghl.add_note(contact_id, f"Email received: {result.get('summary', email.subject)[:100]}")
+    tasks = [done["task"]] if done["task"] is not None else []
     
-    log_action("email_triaged", session_id, f"intent={intent}, priority={priority}")
+    log_action("email_triaged", session_id, json.dumps({
+        "intent": intent, "priority": priority, "confidence": confidence, "source": source,
+    }))
+    # llm labels train the local model - opt in, and kept out of the audit log
+    if source == "llm" and settings.EMAIL_TRAINING_ENABLED:
+        from brain.classifier import record_training_example
+        record_training_example(safe_email.text, intent)
     
     return TriageResult(
         intent=intent,
         confidence=confidence,
         priority=priority,
-        draft_response=draft,
-        contact_id=contact_id,
-        tasks_created=tasks
+        draft_response=done["draft"],
+        contact_id=done["contact"],
+        tasks_created=tasks,
+        metadata={"timings": pipeline.report()} if settings.DEBUG else None
     )
 
 
+async def classify_with_llm(safe_text: str) -> dict:
+    """ask the llm for intent, priority and a summary"""
+    engine = ReasoningEngine("email")
+    
+    classify_prompt = f"""Classify this pharmacy email and determine priority.
+
+Email content:
+{safe_text}
+
+Classify as one of: {', '.join(EMAIL_INTENTS)}
+
+Also determine priority: high, medium, low
+
+Return JSON format:
+{{"intent": "category", "confidence": 0.0-1.0, "priority": "high/medium/low", "summary": "brief description"}}"""
+    
+    return await engine.classify(classify_prompt)
+
+
 async def generate_draft_response(email: EmailPayload, intent: str, 
                                    safe_body: str) -> str:
     """generate draft email response"""
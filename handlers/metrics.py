@@ -0,0 +1,27 @@
+"""
+handlers/metrics.py - prometheus scrape endpoint
+request and span latency histograms for this worker (see tracing.py)
+"""
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from tracing import metrics
+
+
+router = APIRouter()
+
+
+@router.get("", response_class=PlainTextResponse)
+def get_metrics():
+    """
+    histograms + p50/p95/p99 per route and span, prometheus text format
+    under the launcher each worker keeps its own numbers, a scrape sees whichever worker answered
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@router.get("/summary")
+def get_summary():
+    """same numbers as json in ms, for the dashboard and quick looks"""
+    return metrics.snapshot()
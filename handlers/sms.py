@@ -11,8 +11,8 @@ import uuid
 from brain.reasoning import ReasoningEngine
 from brain.router import detect_intent, Intent
 from brain.audit import log_action
-from integrations.ghl import ghl
-from integrations.airtable import airtable
+from integrations.ghl import async_ghl
+from integrations.airtable import async_airtable
 
 
 router = APIRouter()
@@ -48,7 +48,7 @@ async def handle_sms_webhook(webhook: SMSWebhook):
     if msg_lower in AUTO_REPLIES:
         reply = AUTO_REPLIES[msg_lower]
         if reply:
-            ghl.send_sms(webhook.contactId, reply)
+            await async_ghl.send_sms(webhook.contactId, reply)
             return {"status": "auto_reply", "message": reply}
     
     # check for "yes" - refill confirmation
@@ -61,7 +61,7 @@ async def handle_sms_webhook(webhook: SMSWebhook):
     # get patient info
     patient_data = None
     if webhook.phone:
-        patient = airtable.find_patient_by_phone(webhook.phone)
+        patient = await async_airtable.find_patient_by_phone(webhook.phone)
         if patient:
             patient_data = {
                 "name": patient.get("fields", {}).get("Name"),
@@ -75,7 +75,7 @@ async def handle_sms_webhook(webhook: SMSWebhook):
         response = await handle_refill_request(webhook, patient_data)
     elif confidence < 0.5:
         # low confidence - create task for staff
-        ghl.create_task(
+        await async_ghl.create_task(
             webhook.contactId,
             f"SMS needs review: {webhook.message[:50]}..."
         )
@@ -91,7 +91,7 @@ async def handle_sms_webhook(webhook: SMSWebhook):
         response = result["response"]
     
     # send response
-    ghl.send_sms(webhook.contactId, response)
+    await async_ghl.send_sms(webhook.contactId, response)
     log_action("sms_sent", session_id, response[:100])
     
     return {"status": "ok", "response": response}
@@ -103,11 +103,11 @@ async def handle_rx_status(webhook: SMSWebhook, patient_data: dict) -> str:
         return "I couldn't find your account. Please call us at 555-123-4567 for status updates."
     
     # get prescriptions from airtable
-    patient = airtable.find_patient_by_phone(patient_data.get("phone", ""))
+    patient = await async_airtable.find_patient_by_phone(patient_data.get("phone", ""))
     if not patient:
         return "I couldn't find your prescriptions. Please call us for help."
     
-    prescriptions = airtable.get_prescriptions(patient.get("id", ""))
+    prescriptions = await async_airtable.get_prescriptions(patient.get("id", ""))
     
     if not prescriptions:
         return "I don't see any active prescriptions. Want me to have someone call you?"
@@ -125,7 +125,7 @@ async def handle_refill_request(webhook: SMSWebhook, patient_data: dict) -> str:
         return "To request a refill, please call us at 555-123-4567 or visit our website."
     
     # create task for pharmacy staff
-    ghl.create_task(
+    await async_ghl.create_task(
         webhook.contactId,
         f"Refill request from {patient_data.get('name', 'patient')}"
     )
@@ -136,19 +136,19 @@ async def handle_refill_request(webhook: SMSWebhook, patient_data: dict) -> str:
 async def handle_refill_confirmation(webhook: SMSWebhook, session_id: str) -> dict:
     """handle YES reply for refill confirmation"""
     # add note to contact
-    ghl.add_note(
+    await async_ghl.add_note(
         webhook.contactId,
         "Patient confirmed refill via SMS"
     )
     
     # create task
-    ghl.create_task(
+    await async_ghl.create_task(
         webhook.contactId,
         "Confirmed refill - please process"
     )
     
     response = "Perfect! Your refill has been confirmed. We'll text you when it's ready for pickup."
-    ghl.send_sms(webhook.contactId, response)
+    await async_ghl.send_sms(webhook.contactId, response)
     
     log_action("refill_confirmed", session_id, f"contact={webhook.contactId}")
     
@@ -9,8 +9,9 @@ from typing import Optional, List
 import uuid
 
 from brain.router import detect_intent, Intent
+from brain.matcher import KeywordMatcher
 from brain.audit import log_action
-from integrations.ghl import ghl
+from integrations.ghl import async_ghl
 
 
 router = APIRouter()
@@ -43,20 +44,14 @@ APPROVED_RESPONSES = {
     "hold": "Please hold while I transfer you to a team member.",
 }
 
+# compiled once - provider keywords win over patient ones
+caller_matcher = KeywordMatcher({"provider": PROVIDER_KEYWORDS, "patient": PATIENT_KEYWORDS})
+approved_matcher = KeywordMatcher({kw: [kw] for kw in APPROVED_RESPONSES})
+
 
 def detect_caller_type(transcription: str) -> str:
     """figure out if caller is patient, provider, or other"""
-    text_lower = transcription.lower()
-    
-    for kw in PROVIDER_KEYWORDS:
-        if kw in text_lower:
-            return "provider"
-    
-    for kw in PATIENT_KEYWORDS:
-        if kw in text_lower:
-            return "patient"
-    
-    return "unknown"
+    return caller_matcher.first(transcription, "unknown")
 
 
 @router.post("/event")
@@ -77,9 +72,9 @@ async def handle_call_event(event: CallEvent):
     
     if event.event_type == "ended":
         # log the call in ghl
-        contacts = ghl.search_contacts(event.caller_number)
+        contacts = await async_ghl.search_contacts(event.caller_number)
         if contacts:
-            ghl.add_note(
+            await async_ghl.add_note(
                 contacts[0].get("id"),
                 f"Call received - duration: {event.duration}s"
             )
@@ -94,13 +89,11 @@ async def handle_call_event(event: CallEvent):
 async def process_transcription(event: CallEvent) -> VoiceResponse:
     """process caller speech and decide response"""
     session_id = event.call_id
-    text = event.transcription.lower()
-    
     # check for approved quick responses
-    for keyword, response in APPROVED_RESPONSES.items():
-        if keyword in text:
-            log_action("call_auto_response", session_id, keyword)
-            return VoiceResponse(action="say", message=response)
+    keyword = approved_matcher.first(event.transcription)
+    if keyword:
+        log_action("call_auto_response", session_id, keyword)
+        return VoiceResponse(action="say", message=APPROVED_RESPONSES[keyword])
     
     # detect caller type
     caller_type = detect_caller_type(event.transcription)
@@ -3,14 +3,83 @@ integrations/airtable.py - airtable data layer
 crud operations for our data warehouse
 """
 
-import requests
-from typing import Dict, Any, List, Optional
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, AsyncIterator, Iterator, List, Optional
 
 from config import settings
+from tracing import traced
+from .cache import MISSING, SingleFlight, TTLCache
+from .http import build_async_client
 
 
-class AirtableClient:
-    """wrapper for airtable api"""
+class PatientCache:
+    """
+    read-through cache for patient lookups by phone
+    
+    - keyed by the phone digits, lru + ttl
+    - misses are cached too, with a shorter ttl
+    - concurrent async lookups for one phone share a single request
+    - any write to the Patients table invalidates what it could affect
+    """
+    
+    def __init__(self, maxsize: int = None, ttl: float = None, negative_ttl: float = None):
+        self.negative_ttl = settings.PATIENT_CACHE_NEGATIVE_TTL if negative_ttl is None else negative_ttl
+        self.cache = TTLCache(
+            maxsize=maxsize or settings.PATIENT_CACHE_SIZE,
+            ttl=settings.PATIENT_CACHE_TTL if ttl is None else ttl
+        )
+        self.flight = SingleFlight()
+    
+    @staticmethod
+    def key(phone: str) -> str:
+        return ''.join(filter(str.isdigit, phone or ""))
+    
+    def get(self, phone: str) -> Any:
+        """patient record, None for a cached miss, or MISSING"""
+        return self.cache.get(self.key(phone))
+    
+    def put(self, phone: str, patient: Optional[Dict]):
+        key = self.key(phone)
+        if patient is None:
+            self.cache.set(key, None, ttl=self.negative_ttl)
+            return
+        self.cache.set(key, patient)
+    
+    def on_write(self, record_id: str = None, fields: Dict = None):
+        """
+        a Patients record changed - drop anything it could make stale
+        one pass over the cache: the record itself (found by id, so there's
+        no reverse map to outlive evicted entries), its new phone, and every
+        cached miss, since a new/changed phone could now match one
+        """
+        phone = self.key(fields["Phone"]) if fields and fields.get("Phone") else None
+        
+        def stale(key, value):
+            return value is None or key == phone or (record_id is not None and value.get("id") == record_id)
+        
+        self.cache.delete_where(stale)
+    
+    def clear(self):
+        self.cache.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        return {**self.cache.stats(), "coalesced": self.flight.coalesced}
+
+
+# airtable caps batch create/update/delete at 10 records per request
+BATCH_SIZE = 10
+# and list pages at 100
+PAGE_SIZE = 100
+# record ids per OR(RECORD_ID()...) lookup, keeps the url short
+ID_BATCH_SIZE = 50
+# statuses where airtable looked at the batch and refused it without writing
+# anything - only these are worth redoing record by record
+REJECTED_STATUSES = (404, 422)
+
+
+class _AirtableBase:
+    """shared setup for the sync and async clients"""
     
     def __init__(self):
         self.base_url = f"{settings.AIRTABLE_BASE_URL}/{settings.AIRTABLE_BASE_ID}"
@@ -18,21 +87,118 @@ class AirtableClient:
             "Authorization": f"Bearer {settings.AIRTABLE_API_KEY}",
             "Content-Type": "application/json"
         }
+        # upstream api calls made by this client (pages, batches, retries)
+        self.requests_made = 0
+    
+    def _url(self, table: str, record_id: str = None) -> str:
+        url = f"{self.base_url}/{table}"
+        if record_id:
+            url += f"/{record_id}"
+        return url
+    
+    @staticmethod
+    def _mock_response() -> Dict:
+        return {
+            "id": "rec_mock_123",
+            "fields": {"Name": "Test Patient", "Status": "Active"},
+            "records": []
+        }
+    
+    @staticmethod
+    def _list_params(filter_formula: str = None, fields: List[str] = None,
+                     page_size: int = PAGE_SIZE, max_records: int = None) -> Dict:
+        params = {"pageSize": min(page_size, PAGE_SIZE)}
+        if filter_formula:
+            params["filterByFormula"] = filter_formula
+        if fields:
+            params["fields[]"] = list(fields)
+        if max_records:
+            params["maxRecords"] = max_records
+        return params
+    
+    @staticmethod
+    def _error(e: Exception) -> Dict:
+        """error result for a failed request, with the http status when there was one"""
+        error = {"error": str(e)}
+        status = getattr(getattr(e, "response", None), "status_code", None)
+        if status is not None:
+            error["status"] = status
+        return error
+    
+    @staticmethod
+    def _rejected(result: Dict, chunk: list) -> bool:
+        """
+        should a failed batch be redone one record at a time? only when airtable
+        rejected its contents - after a timeout the batch may already be written
+        (resending POSTs would duplicate it) and a 429/5xx would just come back
+        ten times over
+        """
+        return len(chunk) > 1 and result.get("status") in REJECTED_STATUSES
+    
+    @staticmethod
+    def _chunked(items: list) -> List[list]:
+        return [items[i:i + BATCH_SIZE] for i in range(0, len(items), BATCH_SIZE)]
+    
+    @staticmethod
+    def _batch_payload(method: str, chunk: list) -> Dict:
+        """body (or query for DELETE) for one batch request"""
+        if method == "DELETE":
+            return {"records[]": chunk}
+        return {"records": chunk}
+    
+    @staticmethod
+    def _single_args(method: str, item) -> tuple:
+        """(data, record_id) to redo one batch item as its own request"""
+        if method == "POST":
+            return {"fields": item["fields"]}, None
+        if method == "PATCH":
+            return {"fields": item["fields"]}, item["id"]
+        return None, item
+    
+    @staticmethod
+    def _touch_patients(method: str, items: list):
+        """invalidate the patient cache for a bulk write"""
+        for item in items:
+            if method == "DELETE":
+                patient_cache.on_write(item)
+            else:
+                patient_cache.on_write(item.get("id"), item.get("fields"))
+    
+    @staticmethod
+    def _ids_chunked(record_ids) -> List[list]:
+        ids = [rid for rid in dict.fromkeys(record_ids) if rid]
+        return [ids[i:i + ID_BATCH_SIZE] for i in range(0, len(ids), ID_BATCH_SIZE)]
     
+    @staticmethod
+    def _ids_formula(record_ids: List[str]) -> str:
+        return "OR(" + ", ".join(f"RECORD_ID() = '{rid}'" for rid in record_ids) + ")"
+    
+    @staticmethod
+    def _phone_formula(phone: str) -> str:
+        # clean phone format
+        clean_phone = ''.join(filter(str.isdigit, phone))
+        return f"FIND('{clean_phone}', {{Phone}})"
+    
+    @staticmethod
+    def _prescriptions_formula(patient_id: str) -> str:
+        return f"{{PatientId}} = '{patient_id}'"
+
+
+class AirtableClient(_AirtableBase):
+    """wrapper for airtable api"""
+    
+    @traced("airtable")
     def _request(self, method: str, table: str, 
                  data: Dict = None, record_id: str = None) -> Dict:
         """make api request"""
         # mock mode
         if settings.MOCK_MODE:
-            return {
-                "id": "rec_mock_123",
-                "fields": {"Name": "Test Patient", "Status": "Active"},
-                "records": []
-            }
+            return self._mock_response()
         
-        url = f"{self.base_url}/{table}"
-        if record_id:
-            url += f"/{record_id}"
+        self.requests_made += 1
+        url = self._url(table, record_id)
+        # ~50ms to import, and only the sync client's live calls need it
+        import requests
         
         try:
             if method == "GET":
@@ -42,25 +208,54 @@ class AirtableClient:
             elif method == "PATCH":
                 resp = requests.patch(url, headers=self.headers, json=data)
             elif method == "DELETE":
-                resp = requests.delete(url, headers=self.headers)
+                resp = requests.delete(url, headers=self.headers, params=data)
             else:
                 raise ValueError(f"bad method: {method}")
             
             resp.raise_for_status()
             return resp.json()
         except Exception as e:
-            return {"error": str(e)}
+            return self._error(e)
     
     # generic crud
     def get_records(self, table: str, filter_formula: str = None,
                     max_records: int = 100) -> List[Dict]:
-        """get records from table"""
-        params = {"maxRecords": max_records}
-        if filter_formula:
-            params["filterByFormula"] = filter_formula
+        """get up to max_records records from table (follows pages)"""
+        return list(self.iter_records(table, filter_formula, max_records=max_records, prefetch=False))
+    
+    def iter_records(self, table: str, filter_formula: str = None,
+                     fields: List[str] = None, page_size: int = PAGE_SIZE,
+                     max_records: int = None, prefetch: bool = True) -> Iterator[Dict]:
+        """
+        stream every matching record, page by page
+        
+        follows airtable's offset cursor lazily, fetching the next page in
+        the background while the current one is consumed (one page ahead,
+        so memory stays flat on big tables)
+        
+        args:
+            fields: only return these fields - smaller payloads
+            max_records: stop after this many (None = all)
+        """
+        params = self._list_params(filter_formula, fields, page_size, max_records)
+        pool = ThreadPoolExecutor(max_workers=1) if prefetch else None
         
-        result = self._request("GET", table, params)
-        return result.get("records", [])
+        def fetch(offset):
+            page_params = dict(params, offset=offset) if offset else params
+            return self._request("GET", table, page_params)
+        
+        try:
+            page = fetch(None)
+            while True:
+                offset = page.get("offset")
+                next_page = pool.submit(fetch, offset) if (pool and offset) else None
+                yield from page.get("records", [])
+                if not offset:
+                    return
+                page = next_page.result() if next_page else fetch(offset)
+        finally:
+            if pool:
+                pool.shutdown(wait=False, cancel_futures=True)
     
     def get_record(self, table: str, record_id: str) -> Dict:
         """get single record"""
@@ -68,39 +263,345 @@ class AirtableClient:
     
     def create_record(self, table: str, fields: Dict) -> Dict:
         """create new record"""
-        return self._request("POST", table, {"fields": fields})
+        result = self._request("POST", table, {"fields": fields})
+        if table == "Patients":
+            patient_cache.on_write(result.get("id"), fields)
+        return result
     
     def update_record(self, table: str, record_id: str, 
                       fields: Dict) -> Dict:
         """update record"""
-        return self._request("PATCH", table, {"fields": fields}, record_id)
+        result = self._request("PATCH", table, {"fields": fields}, record_id)
+        if table == "Patients":
+            patient_cache.on_write(record_id, fields)
+        return result
     
     def delete_record(self, table: str, record_id: str) -> Dict:
         """delete record"""
-        return self._request("DELETE", table, record_id=record_id)
+        result = self._request("DELETE", table, record_id=record_id)
+        if table == "Patients":
+            patient_cache.on_write(record_id)
+        return result
+    
+    # bulk - 10 records per request, chunks sent concurrently
+    def _batch(self, method: str, table: str, chunk: list) -> List[Dict]:
+        """
+        one batch request - if airtable rejects it, redo the records one at
+        a time so only the bad ones come back with an error. any other failure
+        comes back as that error for every record in the chunk
+        """
+        result = self._request(method, table, self._batch_payload(method, chunk))
+        if "error" not in result:
+            return result.get("records", [])
+        if not self._rejected(result, chunk):
+            return [dict(result) for _ in chunk]
+        return [self._request(method, table, *self._single_args(method, item)) for item in chunk]
+    
+    def _bulk(self, method: str, table: str, items: list) -> List[Dict]:
+        if settings.MOCK_MODE:
+            return [self._mock_response() for _ in items]
+        
+        chunks = self._chunked(items)
+        with ThreadPoolExecutor(max_workers=settings.AIRTABLE_BATCH_CONCURRENCY) as pool:
+            results = [r for chunk in pool.map(lambda c: self._batch(method, table, c), chunks) for r in chunk]
+        
+        if table == "Patients":
+            self._touch_patients(method, items)
+        return results
+    
+    def create_records(self, table: str, fields_list: List[Dict]) -> List[Dict]:
+        """
+        create many records
+        returns one result per input, in order - record or {"error": ...}
+        """
+        return self._bulk("POST", table, [{"fields": f} for f in fields_list])
+    
+    def update_records(self, table: str, updates: List[Dict]) -> List[Dict]:
+        """update many records - updates are {"id": ..., "fields": {...}}"""
+        return self._bulk("PATCH", table, updates)
+    
+    def delete_records(self, table: str, record_ids: List[str]) -> List[Dict]:
+        """delete many records by id"""
+        return self._bulk("DELETE", table, list(record_ids))
+    
+    def get_records_by_id(self, table: str, record_ids, fields: List[str] = None) -> Dict[str, Dict]:
+        """
+        fetch many records by id - one OR(RECORD_ID()...) query per 50 ids
+        instead of a request per record. returns {id: record}, missing ids left out
+        """
+        def fetch(chunk):
+            return list(self.iter_records(table, self._ids_formula(chunk), fields=fields, prefetch=False))
+        
+        chunks = self._ids_chunked(record_ids)
+        if not chunks:
+            return {}
+        with ThreadPoolExecutor(max_workers=settings.AIRTABLE_BATCH_CONCURRENCY) as pool:
+            return {r["id"]: r for page in pool.map(fetch, chunks) for r in page if "id" in r}
     
     # convenience methods for common tables
     def get_patient(self, patient_id: str) -> Dict:
         """get patient by id"""
         return self.get_record("Patients", patient_id)
     
+    def get_patients(self, patient_ids, fields: List[str] = None) -> Dict[str, Dict]:
+        """get many patients by id in bulk"""
+        return self.get_records_by_id("Patients", patient_ids, fields)
+    
     def find_patient_by_phone(self, phone: str) -> Optional[Dict]:
-        """find patient by phone number"""
-        # clean phone format
-        clean_phone = ''.join(filter(str.isdigit, phone))
-        formula = f"FIND('{clean_phone}', {{Phone}})"
-        records = self.get_records("Patients", formula, max_records=1)
-        return records[0] if records else None
+        """find patient by phone number (cached)"""
+        cached = patient_cache.get(phone)
+        if cached is not MISSING:
+            return cached
+        
+        result = self._request("GET", "Patients", {
+            "maxRecords": 1, "filterByFormula": self._phone_formula(phone)
+        })
+        records = result.get("records", [])
+        patient = records[0] if records else None
+        # don't cache failures as "no such patient"
+        if "error" not in result:
+            patient_cache.put(phone, patient)
+        return patient
     
     def get_prescriptions(self, patient_id: str) -> List[Dict]:
         """get prescriptions for patient"""
-        formula = f"{{PatientId}} = '{patient_id}'"
-        return self.get_records("Prescriptions", formula)
+        return self.get_records("Prescriptions", self._prescriptions_formula(patient_id))
     
     def log_interaction(self, data: Dict) -> Dict:
         """log a patient interaction"""
         return self.create_record("Interactions", data)
+    
+    def log_interactions(self, items: List[Dict]) -> List[Dict]:
+        """log many interactions in 10-record batches"""
+        return self.create_records("Interactions", items)
+
+
+class AsyncAirtableClient(_AirtableBase):
+    """
+    async version of AirtableClient for use inside handlers
+    one pooled keep-alive connection set, so calls don't block the loop
+    or pay a new tls handshake each time
+    """
+    
+    def __init__(self, max_connections: int = None, max_keepalive: int = None,
+                 timeout: float = None):
+        super().__init__()
+        self.max_connections = max_connections or settings.AIRTABLE_MAX_CONNECTIONS
+        self.max_keepalive = max_keepalive or settings.AIRTABLE_MAX_KEEPALIVE
+        self.timeout = timeout or settings.AIRTABLE_TIMEOUT
+        self._client = None
+    
+    @property
+    def client(self):
+        """pooled http client, created on first request"""
+        if self._client is None:
+            self._client = build_async_client(
+                self.headers,
+                max_connections=self.max_connections,
+                max_keepalive=self.max_keepalive,
+                timeout=self.timeout,
+            )
+        return self._client
+    
+    async def aclose(self):
+        """close pooled connections - call on shutdown"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    @traced("airtable")
+    async def _request(self, method: str, table: str,
+                       data: Dict = None, record_id: str = None) -> Dict:
+        """make api request"""
+        # mock mode
+        if settings.MOCK_MODE:
+            return self._mock_response()
+        
+        self.requests_made += 1
+        url = self._url(table, record_id)
+        
+        try:
+            if method == "GET":
+                resp = await self.client.get(url, params=data)
+            elif method in ("POST", "PATCH"):
+                resp = await self.client.request(method, url, json=data)
+            elif method == "DELETE":
+                resp = await self.client.delete(url, params=data)
+            else:
+                raise ValueError(f"bad method: {method}")
+            
+            resp.raise_for_status()
+            return resp.json()
+        except Exception as e:
+            return self._error(e)
+    
+    # generic crud
+    async def get_records(self, table: str, filter_formula: str = None,
+                          max_records: int = 100) -> List[Dict]:
+        """get up to max_records records from table (follows pages)"""
+        return [r async for r in self.iter_records(table, filter_formula, max_records=max_records)]
+    
+    async def iter_records(self, table: str, filter_formula: str = None,
+                           fields: List[str] = None, page_size: int = PAGE_SIZE,
+                           max_records: int = None) -> AsyncIterator[Dict]:
+        """
+        async-iterate every matching record, page by page
+        the next page is requested while the current one is consumed
+        
+        args:
+            fields: only return these fields - smaller payloads
+            max_records: stop after this many (None = all)
+        """
+        params = self._list_params(filter_formula, fields, page_size, max_records)
+        
+        def fetch(offset):
+            page_params = dict(params, offset=offset) if offset else params
+            return asyncio.ensure_future(self._request("GET", table, page_params))
+        
+        next_page = fetch(None)
+        try:
+            while True:
+                page = await next_page
+                offset = page.get("offset")
+                next_page = fetch(offset) if offset else None
+                for record in page.get("records", []):
+                    yield record
+                if not offset:
+                    return
+        finally:
+            if next_page is not None and not next_page.done():
+                next_page.cancel()
+    
+    async def get_record(self, table: str, record_id: str) -> Dict:
+        """get single record"""
+        return await self._request("GET", table, record_id=record_id)
+    
+    async def create_record(self, table: str, fields: Dict) -> Dict:
+        """create new record"""
+        result = await self._request("POST", table, {"fields": fields})
+        if table == "Patients":
+            patient_cache.on_write(result.get("id"), fields)
+        return result
+    
+    async def update_record(self, table: str, record_id: str,
+                            fields: Dict) -> Dict:
+        """update record"""
+        result = await self._request("PATCH", table, {"fields": fields}, record_id)
+        if table == "Patients":
+            patient_cache.on_write(record_id, fields)
+        return result
+    
+    async def delete_record(self, table: str, record_id: str) -> Dict:
+        """delete record"""
+        result = await self._request("DELETE", table, record_id=record_id)
+        if table == "Patients":
+            patient_cache.on_write(record_id)
+        return result
+    
+    # bulk - 10 records per request, chunks sent concurrently
+    async def _batch(self, method: str, table: str, chunk: list) -> List[Dict]:
+        """
+        one batch request - if airtable rejects it, redo the records one at
+        a time so only the bad ones come back with an error. any other failure
+        comes back as that error for every record in the chunk
+        """
+        result = await self._request(method, table, self._batch_payload(method, chunk))
+        if "error" not in result:
+            return result.get("records", [])
+        if not self._rejected(result, chunk):
+            return [dict(result) for _ in chunk]
+        return list(await asyncio.gather(*[
+            self._request(method, table, *self._single_args(method, item)) for item in chunk
+        ]))
+    
+    async def _bulk(self, method: str, table: str, items: list,
+                    concurrency: int = None) -> List[Dict]:
+        if settings.MOCK_MODE:
+            return [self._mock_response() for _ in items]
+        
+        limit = asyncio.Semaphore(concurrency or settings.AIRTABLE_BATCH_CONCURRENCY)
+        
+        async def send(chunk):
+            async with limit:
+                return await self._batch(method, table, chunk)
+        
+        chunk_results = await asyncio.gather(*[send(c) for c in self._chunked(items)])
+        
+        if table == "Patients":
+            self._touch_patients(method, items)
+        return [r for chunk in chunk_results for r in chunk]
+    
+    async def create_records(self, table: str, fields_list: List[Dict]) -> List[Dict]:
+        """
+        create many records
+        returns one result per input, in order - record or {"error": ...}
+        """
+        return await self._bulk("POST", table, [{"fields": f} for f in fields_list])
+    
+    async def update_records(self, table: str, updates: List[Dict]) -> List[Dict]:
+        """update many records - updates are {"id": ..., "fields": {...}}"""
+        return await self._bulk("PATCH", table, updates)
+    
+    async def delete_records(self, table: str, record_ids: List[str]) -> List[Dict]:
+        """delete many records by id"""
+        return await self._bulk("DELETE", table, list(record_ids))
+    
+    async def get_records_by_id(self, table: str, record_ids, fields: List[str] = None) -> Dict[str, Dict]:
+        """
+        fetch many records by id - one OR(RECORD_ID()...) query per 50 ids
+        instead of a request per record. returns {id: record}, missing ids left out
+        """
+        limit = asyncio.Semaphore(settings.AIRTABLE_BATCH_CONCURRENCY)
+        
+        async def fetch(chunk):
+            async with limit:
+                return [r async for r in self.iter_records(table, self._ids_formula(chunk), fields=fields)]
+        
+        pages = await asyncio.gather(*[fetch(c) for c in self._ids_chunked(record_ids)])
+        return {r["id"]: r for page in pages for r in page if "id" in r}
+    
+    # convenience methods for common tables
+    async def get_patient(self, patient_id: str) -> Dict:
+        """get patient by id"""
+        return await self.get_record("Patients", patient_id)
+    
+    async def get_patients(self, patient_ids, fields: List[str] = None) -> Dict[str, Dict]:
+        """get many patients by id in bulk"""
+        return await self.get_records_by_id("Patients", patient_ids, fields)
+    
+    async def find_patient_by_phone(self, phone: str) -> Optional[Dict]:
+        """find patient by phone number (cached, concurrent lookups coalesced)"""
+        cached = patient_cache.get(phone)
+        if cached is not MISSING:
+            return cached
+        
+        async def fetch():
+            result = await self._request("GET", "Patients", {
+                "maxRecords": 1, "filterByFormula": self._phone_formula(phone)
+            })
+            records = result.get("records", [])
+            patient = records[0] if records else None
+            # don't cache failures as "no such patient"
+            if "error" not in result:
+                patient_cache.put(phone, patient)
+            return patient
+        
+        return await patient_cache.flight.do(patient_cache.key(phone), fetch)
+    
+    async def get_prescriptions(self, patient_id: str) -> List[Dict]:
+        """get prescriptions for patient"""
+        return await self.get_records("Prescriptions", self._prescriptions_formula(patient_id))
+    
+    async def log_interaction(self, data: Dict) -> Dict:
+        """log a patient interaction"""
+        return await self.create_record("Interactions", data)
+    
+    async def log_interactions(self, items: List[Dict]) -> List[Dict]:
+        """log many interactions in 10-record batches"""
+        return await self.create_records("Interactions", items)
 
 
-# singleton
+# singletons
+patient_cache = PatientCache()
 airtable = AirtableClient()
+async_airtable = AsyncAirtableClient()
@@ -0,0 +1,189 @@
+"""
+integrations/completion_cache.py - cache for openai completions
+memory lru + ttl in front of an optional sqlite file that survives restarts
+only de-identified prompts/responses are ever stored
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from config import settings
+from phi.deidentify import quick_check
+from .cache import MISSING, TTLCache
+
+
+# usd per 1M tokens (input, output) - used for the "saved" stats
+PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4-turbo": (10.00, 30.00),
+    "gpt-3.5-turbo": (0.50, 1.50),
+}
+
+
+def cache_key(messages: List[Dict[str, str]], model: str,
+              temperature: float, max_tokens: int) -> str:
+    raw = json.dumps([model, temperature, max_tokens, messages], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    price_in, price_out = PRICES.get(model, PRICES["gpt-4o-mini"])
+    return (prompt_tokens * price_in + completion_tokens * price_out) / 1_000_000
+
+
+class SQLiteTier:
+    """
+    key -> json blob with an expiry, in one sqlite file
+    the connection is opened on first use, so building the cache before
+    the server forks its workers doesn't hand them all one connection
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid = None
+    
+    def _connection(self) -> sqlite3.Connection:
+        # a connection must not cross a fork - open a fresh one in the child
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS completions (key TEXT PRIMARY KEY, value TEXT, expires REAL)"
+            )
+            conn.commit()
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+    
+    def get(self, key: str) -> Any:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT value, expires FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return MISSING
+        if row[1] <= time.time():
+            self.delete(key)
+            return MISSING
+        return json.loads(row[0])
+    
+    def set(self, key: str, value: Any, ttl: float):
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO completions VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time() + ttl)
+            )
+            conn.commit()
+    
+    def delete(self, key: str):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+            conn.commit()
+    
+    def purge_expired(self) -> int:
+        with self._lock:
+            conn = self._connection()
+            cur = conn.execute("DELETE FROM completions WHERE expires <= ?", (time.time(),))
+            conn.commit()
+            return cur.rowcount
+    
+    def clear(self):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM completions")
+            conn.commit()
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+    
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+
+class CompletionCache:
+    """
+    completion cache keyed on (model, temperature, max_tokens, messages)
+    
+    args:
+        maxsize/ttl: memory tier size and entry lifetime (seconds)
+        path: sqlite file for the disk tier, None for memory only
+        max_temperature: calls hotter than this skip the cache
+    """
+    
+    def __init__(self, maxsize: int = None, ttl: float = None, path: str = None,
+                 max_temperature: float = None):
+        self.ttl = settings.COMPLETION_CACHE_TTL if ttl is None else ttl
+        self.memory = TTLCache(maxsize or settings.COMPLETION_CACHE_SIZE, self.ttl)
+        path = settings.COMPLETION_CACHE_PATH if path is None else path
+        self.disk = SQLiteTier(path) if path else None
+        self.max_temperature = (settings.COMPLETION_CACHE_MAX_TEMPERATURE
+                                if max_temperature is None else max_temperature)
+        self.counts = {"hits": 0, "misses": 0, "disk_hits": 0, "bypassed": 0, "skipped_phi": 0}
+        self.tokens_saved = 0
+        self.dollars_saved = 0.0
+    
+    def accepts(self, messages: List[Dict[str, str]], temperature: float) -> bool:
+        """should this call go through the cache at all"""
+        if temperature > self.max_temperature:
+            self.counts["bypassed"] += 1
+            return False
+        if not all(self.safe(m.get("content") or "") for m in messages):
+            self.counts["skipped_phi"] += 1
+            return False
+        return True
+    
+    @staticmethod
+    def safe(text: str) -> bool:
+        """nothing that looks like raw phi - tokens like [NAME_1] are fine"""
+        return not quick_check(text)
+    
+    def get(self, key: str, model: str) -> Optional[str]:
+        entry = self.memory.get(key)
+        if entry is MISSING and self.disk is not None:
+            entry = self.disk.get(key)
+            if entry is not MISSING:
+                self.counts["disk_hits"] += 1
+                self.memory.set(key, entry)
+        if entry is MISSING:
+            self.counts["misses"] += 1
+            return None
+        
+        self.counts["hits"] += 1
+        self.tokens_saved += entry["prompt_tokens"] + entry["completion_tokens"]
+        self.dollars_saved += cost(model, entry["prompt_tokens"], entry["completion_tokens"])
+        return entry["text"]
+    
+    def put(self, key: str, text: str, prompt_tokens: int = 0, completion_tokens: int = 0):
+        entry = {"text": text, "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens}
+        self.memory.set(key, entry)
+        if self.disk is not None:
+            self.disk.set(key, entry, self.ttl)
+    
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.counts["hits"] + self.counts["misses"]
+        return {
+            **self.counts,
+            "hit_rate": round(self.counts["hits"] / lookups, 4) if lookups else 0.0,
+            "size": len(self.memory),
+            "disk_size": len(self.disk) if self.disk is not None else 0,
+            "tokens_saved": self.tokens_saved,
+            "dollars_saved": round(self.dollars_saved, 6),
+        }
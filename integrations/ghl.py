@@ -3,23 +3,66 @@ integrations/ghl.py - gohighlevel api wrapper
 contacts, sms, pipelines
 """
 
-import requests
-from typing import Dict, Any, Optional, List
+import asyncio
+from typing import Dict, List
 
 from config import settings
+from tracing import traced
+from .http import build_async_client, run_sync
+from .ratelimit import MAX_BACKOFF, KeyedRateLimiter, backoff_delay, parse_retry_after
 
 
-class GHLClient:
-    """wrapper for gohighlevel api"""
+# shared across clients so sync and async callers draw from the same budget
+location_limiter = KeyedRateLimiter(settings.GHL_RATE_PER_SECOND, settings.GHL_RATE_BURST)
+endpoint_limiter = KeyedRateLimiter(settings.GHL_ENDPOINT_RATE_PER_SECOND, settings.GHL_ENDPOINT_RATE_BURST)
+
+
+def endpoint_key(endpoint: str) -> str:
+    """rate limit group for an endpoint - /contacts/abc -> /contacts"""
+    return "/" + endpoint.strip("/").split("/")[0]
+
+
+class AsyncGHLClient:
+    """
+    async gohighlevel client
+    pooled keep-alive connections, token-bucket limits per location and
+    per endpoint, and backoff on 429s that honors Retry-After
+    """
     
-    def __init__(self):
+    def __init__(self, location_id: str = None):
         self.base_url = settings.GHL_BASE_URL
+        self.location_id = location_id or settings.GHL_LOCATION_ID
         self.headers = {
             "Authorization": f"Bearer {settings.GHL_API_KEY}",
             "Content-Type": "application/json"
         }
+        self.rate_limited = 0  # 429s seen
+        self._client = None
     
-    def _request(self, method: str, endpoint: str, data: Dict = None) -> Dict:
+    @property
+    def client(self):
+        """pooled http client, created on first request"""
+        if self._client is None:
+            self._client = build_async_client(
+                self.headers,
+                max_connections=settings.GHL_MAX_CONNECTIONS,
+                max_keepalive=settings.GHL_MAX_CONNECTIONS,
+                timeout=settings.GHL_TIMEOUT,
+            )
+        return self._client
+    
+    async def aclose(self):
+        """close pooled connections - call on shutdown"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    async def _throttle(self, endpoint: str):
+        await location_limiter.acquire(self.location_id)
+        await endpoint_limiter.acquire((self.location_id, endpoint_key(endpoint)))
+    
+    @traced("ghl")
+    async def _request(self, method: str, endpoint: str, data: Dict = None) -> Dict:
         """make api request"""
         # mock mode
         if settings.MOCK_MODE:
@@ -28,79 +71,149 @@ class GHLClient:
         url = f"{self.base_url}{endpoint}"
         
         try:
-            if method == "GET":
-                resp = requests.get(url, headers=self.headers, params=data)
-            elif method == "POST":
-                resp = requests.post(url, headers=self.headers, json=data)
-            elif method == "PUT":
-                resp = requests.put(url, headers=self.headers, json=data)
-            else:
+            if method not in ("GET", "POST", "PUT"):
                 raise ValueError(f"unsupported method: {method}")
             
+            for attempt in range(settings.GHL_MAX_RETRIES + 1):
+                await self._throttle(endpoint)
+                if method == "GET":
+                    resp = await self.client.get(url, params=data)
+                else:
+                    resp = await self.client.request(method, url, json=data)
+                
+                if resp.status_code == 429 and attempt < settings.GHL_MAX_RETRIES:
+                    # over the limit - empty our bucket so other callers back off too
+                    self.rate_limited += 1
+                    location_limiter.bucket(self.location_id).drain()
+                    # capped, or a bad header could park this request (and its sms worker) for hours
+                    wait = parse_retry_after(resp.headers.get("Retry-After"))
+                    await asyncio.sleep(min(wait, MAX_BACKOFF) if wait is not None else backoff_delay(attempt))
+                    continue
+                break
+            
             resp.raise_for_status()
             return resp.json()
         except Exception as e:
             return {"error": str(e)}
     
     # contacts
-    def get_contact(self, contact_id: str) -> Dict:
+    async def get_contact(self, contact_id: str) -> Dict:
         """get contact by id"""
-        return self._request("GET", f"/contacts/{contact_id}")
+        return await self._request("GET", f"/contacts/{contact_id}")
     
-    def search_contacts(self, query: str) -> List[Dict]:
+    async def search_contacts(self, query: str) -> List[Dict]:
         """search contacts by email or phone"""
-        result = self._request("GET", "/contacts/", {"query": query})
+        result = await self._request("GET", "/contacts/", {"query": query})
         return result.get("contacts", [])
     
-    def create_contact(self, data: Dict) -> Dict:
+    async def create_contact(self, data: Dict) -> Dict:
         """create new contact"""
-        data["locationId"] = settings.GHL_LOCATION_ID
-        return self._request("POST", "/contacts/", data)
+        data["locationId"] = self.location_id
+        return await self._request("POST", "/contacts/", data)
     
-    def update_contact(self, contact_id: str, data: Dict) -> Dict:
+    async def update_contact(self, contact_id: str, data: Dict) -> Dict:
         """update existing contact"""
-        return self._request("PUT", f"/contacts/{contact_id}", data)
+        return await self._request("PUT", f"/contacts/{contact_id}", data)
     
     # sms
-    def send_sms(self, contact_id: str, message: str) -> Dict:
+    async def send_sms(self, contact_id: str, message: str) -> Dict:
         """send sms to contact"""
         data = {
             "type": "SMS",
             "contactId": contact_id,
             "message": message
         }
-        return self._request("POST", "/conversations/messages", data)
+        return await self._request("POST", "/conversations/messages", data)
     
     # pipeline
-    def move_to_stage(self, contact_id: str, pipeline_id: str, 
-                      stage_id: str) -> Dict:
+    async def move_to_stage(self, contact_id: str, pipeline_id: str,
+                            stage_id: str) -> Dict:
         """move contact to pipeline stage"""
         data = {
             "pipelineId": pipeline_id,
             "pipelineStageId": stage_id
         }
-        return self._request("PUT", f"/contacts/{contact_id}", data)
+        return await self._request("PUT", f"/contacts/{contact_id}", data)
     
     # tasks
-    def create_task(self, contact_id: str, title: str, 
-                    due_date: str = None) -> Dict:
+    async def create_task(self, contact_id: str, title: str,
+                          due_date: str = None) -> Dict:
         """create task for contact"""
         data = {
             "contactId": contact_id,
             "title": title,
             "dueDate": due_date
         }
-        return self._request("POST", "/tasks/", data)
+        return await self._request("POST", "/tasks/", data)
     
     # notes
-    def add_note(self, contact_id: str, body: str) -> Dict:
+    async def add_note(self, contact_id: str, body: str) -> Dict:
         """add note to contact"""
         data = {
             "contactId": contact_id,
             "body": body
         }
-        return self._request("POST", "/contacts/notes", data)
+        return await self._request("POST", "/contacts/notes", data)
+
+
+class GHLClient:
+    """
+    sync wrapper for gohighlevel api - for scripts and scheduled jobs
+    runs the async client on a background loop, async code should
+    use async_ghl directly
+    """
+    
+    def __init__(self):
+        self._async = AsyncGHLClient()
+    
+    def _request(self, method: str, endpoint: str, data: Dict = None) -> Dict:
+        """make api request"""
+        # timed by the async client's span - run_sync carries the contextvars across
+        return run_sync(self._async._request(method, endpoint, data))
+    
+    def close(self):
+        run_sync(self._async.aclose())
+    
+    # contacts
+    def get_contact(self, contact_id: str) -> Dict:
+        """get contact by id"""
+        return run_sync(self._async.get_contact(contact_id))
+    
+    def search_contacts(self, query: str) -> List[Dict]:
+        """search contacts by email or phone"""
+        return run_sync(self._async.search_contacts(query))
+    
+    def create_contact(self, data: Dict) -> Dict:
+        """create new contact"""
+        return run_sync(self._async.create_contact(data))
+    
+    def update_contact(self, contact_id: str, data: Dict) -> Dict:
+        """update existing contact"""
+        return run_sync(self._async.update_contact(contact_id, data))
+    
+    # sms
+    def send_sms(self, contact_id: str, message: str) -> Dict:
+        """send sms to contact"""
+        return run_sync(self._async.send_sms(contact_id, message))
+    
+    # pipeline
+    def move_to_stage(self, contact_id: str, pipeline_id: str, 
+                      stage_id: str) -> Dict:
+        """move contact to pipeline stage"""
+        return run_sync(self._async.move_to_stage(contact_id, pipeline_id, stage_id))
+    
+    # tasks
+    def create_task(self, contact_id: str, title: str, 
+                    due_date: str = None) -> Dict:
+        """create task for contact"""
+        return run_sync(self._async.create_task(contact_id, title, due_date))
+    
+    # notes
+    def add_note(self, contact_id: str, body: str) -> Dict:
+        """add note to contact"""
+        return run_sync(self._async.add_note(contact_id, body))
 
 
-# singleton instance
+# singleton instances
 ghl = GHLClient()
+async_ghl = AsyncGHLClient()
@@ -0,0 +1,76 @@
+"""
+integrations/http.py - shared async http client setup
+one pooled keep-alive client per integration
+"""
+
+import asyncio
+import importlib.util
+import os
+import threading
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import httpx
+
+
+def http2_available() -> bool:
+    """http/2 needs the optional h2 package (pip install httpx[http2])"""
+    return importlib.util.find_spec("h2") is not None
+
+
+def build_async_client(headers: dict, max_connections: int = 20,
+                       max_keepalive: int = 10, timeout: float = 10.0) -> "httpx.AsyncClient":
+    """
+    pooled async client - connections are kept alive and reused
+    
+    args:
+        headers: default headers (auth etc)
+        max_connections: hard cap on open connections
+        max_keepalive: idle connections kept around for reuse
+        timeout: seconds for connect/read/write/pool waits
+    """
+    # imported here so a worker that never calls out doesn't load it
+    import httpx
+    return httpx.AsyncClient(
+        headers=headers,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+        ),
+        timeout=httpx.Timeout(timeout),
+        http2=http2_available(),
+    )
+
+
+# background loop that lets sync code call the async clients
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def background_loop() -> asyncio.AbstractEventLoop:
+    """event loop running in a daemon thread, started on first use"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="integrations-loop", daemon=True).start()
+        return _loop
+
+
+def _forget_loop():
+    """the loop thread doesn't survive a fork - children start their own"""
+    global _loop, _loop_lock
+    _loop = None
+    _loop_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_loop)
+
+
+def run_sync(coro):
+    """
+    run a coroutine on the background loop and wait for the result
+    works from plain sync code and from inside a running event loop
+    """
+    return asyncio.run_coroutine_threadsafe(coro, background_loop()).result()
@@ -0,0 +1,182 @@
+"""
+integrations/llm_dispatch.py - admission control for llm calls
+bounded concurrency with priority lanes (calls > chat/sms > email),
+exponential backoff with jitter on 429/5xx, and coalescing of identical
+in-flight prompts
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Tuple
+
+from config import settings
+from .cache import SingleFlight
+from .ratelimit import backoff_delay, parse_retry_after
+
+
+# lower goes first - a caller on the phone can't wait behind email triage
+PRIORITIES = {"call": 0, "chat": 1, "sms": 1, "email": 2}
+DEFAULT_PRIORITY = "chat"
+
+
+def retryable(error: Exception) -> bool:
+    """rate limits, overloads and network blips - not bad requests"""
+    import openai  # only reached on errors, and the sdk is slow to import
+    if isinstance(error, openai.APIConnectionError):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+def retry_after(error: Exception) -> float:
+    response = getattr(error, "response", None)
+    if response is None:
+        return 0.0
+    return parse_retry_after(response.headers.get("retry-after")) or 0.0
+
+
+class LaneStats:
+    __slots__ = ("submitted", "waiting", "wait_total", "wait_max")
+    
+    def __init__(self):
+        self.submitted = 0
+        self.waiting = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "submitted": self.submitted,
+            "waiting": self.waiting,
+            "wait_avg_ms": round(self.wait_total / self.submitted * 1000, 2) if self.submitted else 0.0,
+            "wait_max_ms": round(self.wait_max * 1000, 2),
+        }
+
+
+class LLMDispatcher:
+    """
+    args:
+        max_concurrent: llm calls allowed in flight at once
+        max_retries: retries after the first attempt for retryable errors
+        backoff_base/backoff_cap: seconds for the jittered exponential backoff
+    """
+    
+    def __init__(self, max_concurrent: int = None, max_retries: int = None,
+                 backoff_base: float = None, backoff_cap: float = None,
+                 is_retryable: Callable[[Exception], bool] = retryable):
+        self.max_concurrent = max_concurrent or settings.LLM_MAX_CONCURRENCY
+        self.max_retries = settings.LLM_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_base = backoff_base or settings.LLM_BACKOFF_BASE
+        self.backoff_cap = backoff_cap or settings.LLM_BACKOFF_CAP
+        self.is_retryable = is_retryable
+        self.flight = SingleFlight()
+        self.in_flight = 0
+        self.retries = 0
+        self.failures = 0
+        self.lanes: Dict[str, LaneStats] = {}
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+    
+    def _lane(self, priority: str) -> LaneStats:
+        if priority not in self.lanes:
+            self.lanes[priority] = LaneStats()
+        return self.lanes[priority]
+    
+    async def _acquire(self, priority: str):
+        lane = self._lane(priority)
+        start = time.monotonic()
+        if self.in_flight < self.max_concurrent and not self._waiters:
+            self.in_flight += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (PRIORITIES.get(priority, 1), next(self._seq), future))
+            lane.waiting += 1
+            try:
+                await future  # the releasing call hands its slot over
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    self._release()  # got a slot just as we were cancelled
+                raise
+            finally:
+                lane.waiting -= 1
+        waited = time.monotonic() - start
+        lane.submitted += 1
+        lane.wait_total += waited
+        lane.wait_max = max(lane.wait_max, waited)
+    
+    def _release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.in_flight -= 1
+    
+    async def _start(self, fn: Callable[[], Awaitable[Any]], priority: str) -> Any:
+        """run fn with retries - returns still holding the slot"""
+        attempt = 0
+        while True:
+            await self._acquire(priority)
+            try:
+                return await fn()
+            except BaseException as e:
+                self._release()
+                if not isinstance(e, Exception):
+                    raise
+                if attempt >= self.max_retries or not self.is_retryable(e):
+                    self.failures += 1
+                    raise
+                delay = max(backoff_delay(attempt, self.backoff_base, self.backoff_cap), retry_after(e))
+            # back off without holding a slot
+            attempt += 1
+            self.retries += 1
+            await asyncio.sleep(delay)
+    
+    async def _run(self, fn: Callable[[], Awaitable[Any]], priority: str) -> Any:
+        result = await self._start(fn, priority)
+        self._release()
+        return result
+    
+    @asynccontextmanager
+    async def holding(self, fn: Callable[[], Awaitable[Any]],
+                      priority: str = DEFAULT_PRIORITY) -> AsyncIterator[Any]:
+        """
+        like submit, but the slot is kept until the block exits
+        for streams, where the call isn't over when fn returns
+        """
+        result = await self._start(fn, priority)
+        try:
+            yield result
+        finally:
+            self._release()
+    
+    async def submit(self, fn: Callable[[], Awaitable[Any]], priority: str = DEFAULT_PRIORITY,
+                     key: Hashable = None) -> Any:
+        """
+        run fn once a slot is free, retrying retryable errors
+        calls sharing a key while one is in flight get that call's result
+        """
+        if key is None:
+            return await self._run(fn, priority)
+        return await self.flight.do(key, lambda: self._run(fn, priority))
+    
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "max_concurrent": self.max_concurrent,
+            "queue_depth": self.queue_depth(),
+            "retries": self.retries,
+            "failures": self.failures,
+            "coalesced": self.flight.coalesced,
+            "lanes": {name: lane.to_dict() for name, lane in self.lanes.items()},
+        }
+
+
+llm_dispatcher = LLMDispatcher()
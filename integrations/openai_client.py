@@ -1,23 +1,70 @@
 """
 integrations/openai_client.py - openai wrapper
-handles api calls with retry logic
+handles api calls with retry logic (see llm_dispatch)
 """
 
-from openai import AsyncOpenAI
-from typing import List, Dict
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 import asyncio
+import hashlib
+import re
 
 from config import settings
+from tracing import traced
+from .completion_cache import CompletionCache, cache_key
+from .llm_dispatch import DEFAULT_PRIORITY, llm_dispatcher
 
 
-# init client
-client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+# created on first real call - the sdk takes ~150ms to import and mock
+# mode / workers that never call openai shouldn't pay for it
+client = None
+completion_cache = CompletionCache() if settings.COMPLETION_CACHE_ENABLED else None
 
 
+def get_client():
+    """the AsyncOpenAI client - retries are handled by llm_dispatcher, not the sdk"""
+    global client
+    if client is None:
+        from openai import AsyncOpenAI
+        client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL or None,
+                             max_retries=0)
+    return client
+
+
+async def _complete(messages: List[Dict[str, str]], model: str, temperature: float,
+                    max_tokens: int, priority: str, key: str = None) -> Tuple[str, Optional[Tuple[int, int]]]:
+    """call the api - returns (text, (prompt_tokens, completion_tokens)), usage is None on error"""
+    async def create():
+        return await get_client().chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+    
+    try:
+        # queued by priority, retried with backoff, identical prompts shared
+        response = await llm_dispatcher.submit(create, priority, key)
+    except Exception as e:
+        print(f"openai error: {e}")
+        return f"Error: could not get AI response - {str(e)}", None
+    
+    usage = response.usage
+    tokens = (usage.prompt_tokens, usage.completion_tokens) if usage else (0, 0)
+    return response.choices[0].message.content, tokens
+
+
+def _mock_reply(messages: List[Dict[str, str]]) -> str:
+    user_msg = messages[-1].get("content", "") if messages else ""
+    return f"[MOCK] Received: {user_msg[:50]}... I understand your question and would help with that."
+
+
+@traced("llm")
 async def get_completion(messages: List[Dict[str, str]], 
                          model: str = "gpt-4o-mini",
                          temperature: float = 0.7,
-                         max_tokens: int = 500) -> str:
+                         max_tokens: int = 500,
+                         cache: bool = True,
+                         priority: str = DEFAULT_PRIORITY) -> str:
     """
     get a completion from openai
     
@@ -26,43 +73,100 @@ async def get_completion(messages: List[Dict[str, str]],
         model: which model to use
         temperature: creativity level
         max_tokens: response limit
+        cache: False to always hit the api
+        priority: "call", "chat"/"sms" or "email" - who waits when busy
     
     returns:
         the ai response text
     """
     # mock mode for testing
     if settings.MOCK_MODE:
-        user_msg = messages[-1].get("content", "") if messages else ""
-        return f"[MOCK] Received: {user_msg[:50]}... I understand your question and would help with that."
+        return _mock_reply(messages)
     
-    try:
-        response = await client.chat.completions.create(
+    if not cache:
+        text, _ = await _complete(messages, model, temperature, max_tokens, priority)
+        return text
+    
+    key = cache_key(messages, model, temperature, max_tokens)
+    use_cache = completion_cache is not None and completion_cache.accepts(messages, temperature)
+    if use_cache:
+        cached = completion_cache.get(key, model)
+        if cached is not None:
+            return cached
+    
+    text, usage = await _complete(messages, model, temperature, max_tokens, priority, key)
+    # errors aren't cached, and neither is anything that came back with phi in it
+    if use_cache and usage is not None and completion_cache.safe(text):
+        completion_cache.put(key, text, *usage)
+    return text
+
+
+async def get_completion_stream(messages: List[Dict[str, str]],
+                                model: str = "gpt-4o-mini",
+                                temperature: float = 0.7,
+                                max_tokens: int = 500,
+                                cache: bool = True,
+                                priority: str = DEFAULT_PRIORITY) -> AsyncIterator[str]:
+    """
+    stream a completion as text deltas - same args as get_completion
+    a cache hit comes back as one piece, and a finished stream is cached
+    like a normal completion
+    """
+    if settings.MOCK_MODE:
+        for word in re.findall(r"\S+\s*", _mock_reply(messages)):
+            yield word
+        return
+    
+    key = cache_key(messages, model, temperature, max_tokens)
+    use_cache = cache and completion_cache is not None and completion_cache.accepts(messages, temperature)
+    if use_cache:
+        cached = completion_cache.get(key, model)
+        if cached is not None:
+            yield cached
+            return
+    
+    async def create():
+        return await get_client().chat.completions.create(
             model=model,
             messages=messages,
             temperature=temperature,
-            max_tokens=max_tokens
+            max_tokens=max_tokens,
+            stream=True
         )
-        return response.choices[0].message.content
+    
+    parts = []
+    try:
+        # the slot is held until the stream is fully read
+        async with llm_dispatcher.holding(create, priority) as stream:
+            try:
+                async for chunk in stream:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+            finally:
+                await stream.response.aclose()
     except Exception as e:
-        # log error and retry once
         print(f"openai error: {e}")
-        await asyncio.sleep(1)
-        
-        try:
-            response = await client.chat.completions.create(
-                model=model,
-                messages=messages,
-                temperature=temperature,
-                max_tokens=max_tokens
-            )
-            return response.choices[0].message.content
-        except Exception as e2:
-            return f"Error: could not get AI response - {str(e2)}"
+        if not parts:
+            yield f"Error: could not get AI response - {str(e)}"
+        return
+    
+    text = "".join(parts)
+    if use_cache and completion_cache.safe(text):
+        # streams don't report usage here - rough 4 chars/token estimate
+        prompt_chars = sum(len(m.get("content") or "") for m in messages)
+        completion_cache.put(key, text, prompt_chars // 4, len(text) // 4)
 
 
 async def get_embedding(text: str) -> List[float]:
     """get embedding vector for text"""
-    response = await client.embeddings.create(
+    # mock mode - stable fake vector so callers still work offline
+    if settings.MOCK_MODE:
+        digest = hashlib.sha256(text.encode()).digest()
+        return [b / 255 for b in digest]
+    
+    response = await get_client().embeddings.create(
         model="text-embedding-3-small",
         input=text
     )
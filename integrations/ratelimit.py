@@ -0,0 +1,98 @@
+"""
+integrations/ratelimit.py - token bucket rate limiting for outbound apis
+"""
+
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Callable, Dict, Hashable, Optional
+
+
+class TokenBucket:
+    """
+    classic token bucket - `rate` tokens per second, up to `capacity` banked
+    
+    safe to share between threads and event loops, waiting is done
+    by the caller's own loop
+    """
+    
+    def __init__(self, rate: float, capacity: float = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self.clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+    
+    def reserve(self, tokens: float = 1.0) -> float:
+        """take tokens if available - returns 0, or seconds to wait before retrying"""
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+    
+    async def acquire(self, tokens: float = 1.0):
+        """wait until tokens are available, then take them"""
+        while True:
+            wait = self.reserve(tokens)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+    
+    def drain(self):
+        """empty the bucket - used when the server says we're over the limit"""
+        with self._lock:
+            self._tokens = 0.0
+            self._updated = self.clock()
+
+
+class KeyedRateLimiter:
+    """one token bucket per key (e.g. per location, per endpoint)"""
+    
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity
+        self._buckets: Dict[Hashable, TokenBucket] = {}
+        self._lock = threading.Lock()
+    
+    def bucket(self, key: Hashable) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.capacity)
+            return bucket
+    
+    async def acquire(self, key: Hashable):
+        await self.bucket(key).acquire()
+
+
+# longest we ever wait before a retry, whatever the server asks for
+MAX_BACKOFF = 30.0
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = MAX_BACKOFF) -> float:
+    """exponential backoff with full jitter"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After header - either seconds or an http date"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+        return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
@@ -3,11 +3,12 @@ main.py - fastapi entry point
 mounts all the routers for the pharmacy system
 """
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 
 from config import settings
+from server import worker_state
 
 # create app
 app = FastAPI(
@@ -25,20 +26,68 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# per-route request/span timing - added last so it's outermost and times everything
+if settings.TRACING_ENABLED:
+    from tracing import TracingMiddleware
+    app.add_middleware(TracingMiddleware)
+
+
+# startup - background writers
+@app.on_event("startup")
+def startup():
+    from brain.audit import start_writer
+    from brain.counters import action_counters
+    # already loaded when the launcher preloaded before forking
+    if not action_counters.loaded:
+        action_counters.load()
+    if settings.AUDIT_WRITE_MODE == "buffered":
+        start_writer()
+    worker_state.ready = True
+    worker_state.draining = False
+
+
+# shutdown - stop background workers cleanly
+@app.on_event("shutdown")
+async def shutdown():
+    from brain.audit import stop_writer
+    from brain.counters import action_counters
+    from integrations.airtable import async_airtable
+    from integrations.ghl import async_ghl
+    from phi.deidentify import shutdown_pool
+    from automations.sms_queue import drain_dispatchers
+    from automations.intake import session_store
+    worker_state.ready = False
+    worker_state.draining = True
+    # queued texts go out before the clients they use are closed
+    await drain_dispatchers(settings.SERVER_GRACEFUL_TIMEOUT)
+    await async_airtable.aclose()
+    await async_ghl.aclose()
+    stop_writer()
+    action_counters.checkpoint()
+    session_store.close()
+    shutdown_pool()
+
 
 # health check
 @app.get("/health")
-def health():
-    return {"status": "ok", "debug": settings.DEBUG}
+def health(response: Response):
+    # 503 until startup finishes and once draining starts, so balancers skip us
+    if worker_state.ready:
+        status = "ok"
+    else:
+        status = "draining" if worker_state.draining else "starting"
+        response.status_code = 503
+    return {"status": status, "debug": settings.DEBUG, **worker_state.snapshot()}
 
 
 # mount routers
-from handlers import chat, sms, email, voice, analytics
+from handlers import chat, sms, email, voice, analytics, metrics
 app.include_router(chat.router, prefix="/api/chat", tags=["chat"])
 app.include_router(sms.router, prefix="/api/sms", tags=["sms"])
 app.include_router(email.router, prefix="/api/email", tags=["email"])
 app.include_router(voice.router, prefix="/api/voice", tags=["voice"])
 app.include_router(analytics.router, prefix="/api/analytics", tags=["analytics"])
+app.include_router(metrics.router, prefix="/api/metrics", tags=["metrics"])
 
 
 # mount dashboard static files
@@ -46,5 +95,23 @@ app.mount("/dashboard", StaticFiles(directory="dashboard", html=True), name="das
 
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="run the pharmacy api")
+    parser.add_argument("--workers", type=int, default=settings.SERVER_WORKERS,
+                        help="forked worker processes (0 = single dev server with reload)")
+    parser.add_argument("--host", default=settings.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=settings.SERVER_PORT)
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print import and init time breakdowns, then exit")
+    args = parser.parse_args()
+    
+    if args.profile_startup:
+        from server import profile_startup
+        profile_startup()
+    elif args.workers > 0:
+        from server import serve
+        serve(args.workers, args.host, args.port)
+    else:
+        import uvicorn
+        uvicorn.run("main:app", host=args.host, port=args.port, reload=True)
@@ -3,11 +3,18 @@ phi/deidentify.py - strips patient identifiers before AI processing
 replaces real data with tokens like [NAME_1], [PHONE_1], etc
 """
 
+import asyncio
+import multiprocessing
+import os
 import re
 import uuid
-from typing import Dict, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Sequence, Tuple, Union
 from datetime import datetime
 
+from config import settings
+from tracing import traced
 from .models import DeidentifiedData
 
 
@@ -26,11 +33,56 @@ COMMON_NAMES = [
     r'\b(Mr\.|Mrs\.|Ms\.|Dr\.)\s+[A-Z][a-z]+\s+[A-Z][a-z]+\b',
 ]
 
+# group name in the combined scanner -> token type
+# extra pii literals get the "extra" group and are typed by their key
+_GROUP_TYPES = {pii_type: pii_type.upper() for pii_type in PATTERNS}
+_GROUP_TYPES.update({f"name{i}": "NAME" for i in range(len(COMMON_NAMES))})
 
+
+def _patterns_regex() -> str:
+    """
+    one named group per phi pattern, in the same priority order as before
+    the leading \\b is hoisted out so the engine only tries the
+    alternatives at word boundaries instead of at every character
+    """
+    bounded, other = [], []
+    groups = [(pii_type, f"(?i:{pattern})", pattern) for pii_type, pattern in PATTERNS.items()]
+    groups += [(f"name{i}", pattern, pattern) for i, pattern in enumerate(COMMON_NAMES)]
+    for group, body, pattern in groups:
+        if pattern.startswith(r"\b"):
+            body = body.replace(r"\b", "", 1)
+            bounded.append(f"(?P<{group}>{body})")
+        else:
+            other.append(f"(?P<{group}>{body})")
+    parts = [r"\b(?:" + "|".join(bounded) + ")"] if bounded else []
+    return "|".join(parts + other)
+
+
+# compiled once at import - covers every request without extra pii
+_BASE_SCANNER = re.compile(_patterns_regex())
+_QUICK_CHECK = re.compile("|".join(f"(?:{p})" for p in PATTERNS.values()), re.IGNORECASE)
+
+
+@lru_cache(maxsize=256)
+def _compile_scanner(literals: Tuple[str, ...]) -> "re.Pattern":
+    """
+    scanner with known pii values in front of the patterns
+    cached so the same patient's values only compile once
+    """
+    if not literals:
+        return _BASE_SCANNER
+    extra = "|".join(re.escape(v) for v in literals)
+    return re.compile(f"(?P<extra>{extra})|" + _patterns_regex())
+
+
+@traced("deidentify")
 def deidentify(text: str, extra_pii: Dict[str, str] = None) -> DeidentifiedData:
     """
     strip PHI from text
     
+    finds every match in a single left-to-right pass over the text
+    and builds the clean text with one join
+    
     args:
         text: raw text that might have patient info
         extra_pii: known values to replace (like patient name from db)
@@ -39,42 +91,48 @@ def deidentify(text: str, extra_pii: Dict[str, str] = None) -> DeidentifiedData:
         DeidentifiedData with clean text and token map
     """
     token_map = {}
-    clean_text = text
     counter = {}
+    # value -> token used in the text, repeats reuse the first token
+    value_tokens = {}
     
-    # first replace any known PII we pass in
+    # longest first so "John Smith" wins over "John" at the same spot
+    extra_pii = {k: v for k, v in (extra_pii or {}).items() if v}
+    literals = tuple(sorted(set(extra_pii.values()), key=len, reverse=True))
+    matches = list(_compile_scanner(literals).finditer(text))
+    
+    # known PII is numbered first, in the order it was passed in
     if extra_pii:
+        found = {m.group() for m in matches if m.lastgroup == "extra"}
         for key, value in extra_pii.items():
-            if value and value in clean_text:
+            if value in found and value not in value_tokens:
                 token_type = key.upper()
                 counter[token_type] = counter.get(token_type, 0) + 1
                 token = f"[{token_type}_{counter[token_type]}]"
                 token_map[token] = value
-                clean_text = clean_text.replace(value, token)
+                value_tokens[value] = token
     
-    # run pattern matching
-    for pii_type, pattern in PATTERNS.items():
-        matches = re.findall(pattern, clean_text, re.IGNORECASE)
-        for match in matches:
-            token_type = pii_type.upper()
-            counter[token_type] = counter.get(token_type, 0) + 1
-            token = f"[{token_type}_{counter[token_type]}]"
-            token_map[token] = match
-            clean_text = clean_text.replace(match, token)
+    # then pattern matches, numbered per type in text order
+    for m in matches:
+        if m.lastgroup == "extra":
+            continue
+        value = m.group()
+        token_type = _GROUP_TYPES[m.lastgroup]
+        counter[token_type] = counter.get(token_type, 0) + 1
+        token = f"[{token_type}_{counter[token_type]}]"
+        token_map[token] = value
+        value_tokens.setdefault(value, token)
     
-    # check for name patterns
-    for pattern in COMMON_NAMES:
-        matches = re.findall(pattern, clean_text)
-        for match in matches:
-            counter["NAME"] = counter.get("NAME", 0) + 1
-            token = f"[NAME_{counter['NAME']}]"
-            # match is tuple from regex groups, get full match
-            full_match = match if isinstance(match, str) else match[0]
-            token_map[token] = full_match
-            clean_text = clean_text.replace(full_match, token)
+    # stitch the output together in one go
+    pieces = []
+    pos = 0
+    for m in matches:
+        pieces.append(text[pos:m.start()])
+        pieces.append(value_tokens[m.group()])
+        pos = m.end()
+    pieces.append(text[pos:])
     
     return DeidentifiedData(
-        text=clean_text,
+        text="".join(pieces),
         token_map=token_map,
         created_at=datetime.now()
     )
@@ -85,7 +143,112 @@ def quick_check(text: str) -> bool:
     quick check if text might contain PHI
     use this before running full deidentify
     """
-    for pattern in PATTERNS.values():
-        if re.search(pattern, text, re.IGNORECASE):
-            return True
-    return False
+    return _QUICK_CHECK.search(text) is not None
+
+
+# process pool for big batches - created on first use
+_pool = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """lazily start the worker pool (spawn so we never fork a threaded server)"""
+    global _pool
+    if _pool is None:
+        workers = settings.PHI_BATCH_WORKERS or os.cpu_count() or 1
+        _pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+
+def _forget_pool():
+    """a forked worker can't use the parent's pool - it makes its own"""
+    global _pool
+    _pool = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_pool)
+
+
+def shutdown_pool():
+    """stop the batch worker pool - call on app shutdown"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True)
+        _pool = None
+
+
+def _deidentify_chunk(items: List[Tuple[str, Dict[str, str]]]) -> List[DeidentifiedData]:
+    """worker entry point - runs one chunk of the batch"""
+    return [deidentify(text, extra) for text, extra in items]
+
+
+def _batch_items(texts: Sequence[str],
+                 extra_pii: Union[Dict[str, str], Sequence[Dict[str, str]], None]) -> list:
+    """pair each text with its extra pii (one dict for all, or one per text)"""
+    if extra_pii is None or isinstance(extra_pii, dict):
+        return [(text, extra_pii) for text in texts]
+    if len(extra_pii) != len(texts):
+        raise ValueError("extra_pii list must have one entry per text")
+    return list(zip(texts, extra_pii))
+
+
+def _chunks(items: list) -> List[list]:
+    """split into a few chunks per worker so pickling cost is amortized"""
+    workers = settings.PHI_BATCH_WORKERS or os.cpu_count() or 1
+    size = max(1, -(-len(items) // (workers * 4)))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def deidentify_many(texts: Sequence[str],
+                    extra_pii: Union[Dict[str, str], Sequence[Dict[str, str]], None] = None,
+                    inline_max: int = None) -> List[DeidentifiedData]:
+    """
+    deidentify a batch of texts
+    
+    args:
+        texts: raw texts
+        extra_pii: one dict used for every text, or a list with one dict per text
+        inline_max: batches up to this size run in-process
+                    (defaults to settings.PHI_BATCH_INLINE_MAX)
+    
+    returns:
+        one DeidentifiedData per input, in input order
+    """
+    items = _batch_items(texts, extra_pii)
+    if inline_max is None:
+        inline_max = settings.PHI_BATCH_INLINE_MAX
+    
+    if len(items) <= inline_max:
+        return _deidentify_chunk(items)
+    
+    results = []
+    # map keeps chunk order so output lines up with input
+    for chunk_result in _get_pool().map(_deidentify_chunk, _chunks(items)):
+        results.extend(chunk_result)
+    return results
+
+
+async def deidentify_many_async(texts: Sequence[str],
+                                extra_pii: Union[Dict[str, str], Sequence[Dict[str, str]], None] = None,
+                                inline_max: int = None) -> List[DeidentifiedData]:
+    """
+    same as deidentify_many but awaitable from the event loop
+    big batches run in the process pool so the loop stays free
+    """
+    items = _batch_items(texts, extra_pii)
+    if inline_max is None:
+        inline_max = settings.PHI_BATCH_INLINE_MAX
+    
+    if len(items) <= inline_max:
+        return _deidentify_chunk(items)
+    
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+    chunk_results = await asyncio.gather(*[
+        loop.run_in_executor(pool, _deidentify_chunk, chunk)
+        for chunk in _chunks(items)
+    ])
+    return [data for chunk in chunk_results for data in chunk]
@@ -3,9 +3,110 @@ phi/reidentify.py - puts the real data back after AI processing
 maps tokens back to original values
 """
 
-from typing import Dict
+import re
+from typing import Dict, Iterable
 
+from tracing import traced
 
+
+# any [TYPE_N] token deidentify can produce
+TOKEN_PATTERN = re.compile(r"\[([^\[\]]+)_(\d+)\]")
+
+# up to this many tokens, a few C-level str.replace calls beat
+# a regex pass with a python callback per match
+REPLACE_LOOP_MAX = 16
+
+
+class TokenIndex:
+    """
+    lookup tables for one token map
+    built once so every restore is a single pass over the text
+    """
+    
+    def __init__(self, token_map: Dict[str, str]):
+        self.token_map = token_map
+        self._by_type = None
+    
+    @property
+    def by_type(self) -> Dict[str, list]:
+        """type -> tokens, so filtering by type is a set lookup (built on first use)"""
+        if self._by_type is None:
+            self._by_type = {}
+            for token in self.token_map:
+                token_type = token[1:-1].rsplit("_", 1)[0]
+                self._by_type.setdefault(token_type, []).append(token)
+        return self._by_type
+    
+    def restore(self, text: str, allowed_types: Iterable[str] = None) -> str:
+        """
+        replace every known token
+        
+        args:
+            text: text with tokens like [NAME_1]
+            allowed_types: only restore these types (None = all)
+        """
+        if not self.token_map or "[" not in text:
+            return text
+        
+        if allowed_types is None:
+            lookup = self.token_map
+        else:
+            lookup = {
+                token: self.token_map[token]
+                for token_type in set(allowed_types)
+                for token in self.by_type.get(token_type, ())
+            }
+        
+        # the closing bracket means [NAME_1] never matches inside [NAME_10]
+        # so replace order doesn't matter
+        if len(lookup) <= REPLACE_LOOP_MAX:
+            for token, original in lookup.items():
+                text = text.replace(token, original)
+            return text
+        
+        def swap(m):
+            token = m.group(0)
+            return lookup.get(token, token)
+        
+        return TOKEN_PATTERN.sub(swap, text)
+
+
+class StreamingReidentifier:
+    """
+    restore tokens in text that arrives in chunks
+    a token can be split across chunks ("[NAM" + "E_1]"), so anything
+    from an unclosed "[" that could still become a token is held back
+    until the next chunk (or flush) decides it
+    """
+    
+    def __init__(self, token_map: Dict[str, str], allowed_types: Iterable[str] = None):
+        self.index = TokenIndex(token_map)
+        self.allowed_types = allowed_types
+        self.max_token = max(map(len, token_map), default=0)
+        self._pending = ""
+    
+    def feed(self, chunk: str) -> str:
+        """add a chunk, returns the text that's safe to send now"""
+        if not self.max_token:
+            return chunk
+        
+        text = self._pending + chunk
+        cut = text.rfind("[")
+        # an open bracket that's still short enough to be a token
+        if cut != -1 and "]" not in text[cut:] and len(text) - cut < self.max_token:
+            self._pending = text[cut:]
+            text = text[:cut]
+        else:
+            self._pending = ""
+        return self.index.restore(text, self.allowed_types)
+    
+    def flush(self) -> str:
+        """whatever is still held back at the end of the stream"""
+        text, self._pending = self._pending, ""
+        return self.index.restore(text, self.allowed_types)
+
+
+@traced("reidentify")
 def reidentify(text: str, token_map: Dict[str, str]) -> str:
     """
     replace tokens with original PHI values
@@ -17,19 +118,11 @@ def reidentify(text: str, token_map: Dict[str, str]) -> str:
     returns:
         text with real patient data restored
     """
-    result = text
-    
-    # sort by token length desc so we replace longer tokens first
-    # prevents [NAME_10] getting partial replaced by [NAME_1]
-    sorted_tokens = sorted(token_map.keys(), key=len, reverse=True)
-    
-    for token in sorted_tokens:
-        original = token_map[token]
-        result = result.replace(token, original)
-    
-    return result
+    # whole tokens are matched, so [NAME_10] can't be hit by [NAME_1]
+    return TokenIndex(token_map).restore(text)
 
 
+@traced("reidentify")
 def partial_reidentify(text: str, token_map: Dict[str, str], 
                        allowed_types: list = None) -> str:
     """
@@ -44,12 +137,4 @@ def partial_reidentify(text: str, token_map: Dict[str, str],
     if not allowed_types:
         return text
     
-    result = text
-    
-    for token, original in token_map.items():
-        # token looks like [TYPE_N], extract type
-        token_type = token.split("_")[0].replace("[", "")
-        if token_type in allowed_types:
-            result = result.replace(token, original)
-    
-    return result
+    return TokenIndex(token_map).restore(text, allowed_types)
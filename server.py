@@ -0,0 +1,302 @@
+"""
+server.py - production launcher
+loads and warms the app once, then forks workers that share one
+listening socket, so regex/json heavy requests use every core
+
+usage:
+    python main.py --workers 4
+"""
+
+import gc
+import importlib
+import logging
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+from config import settings
+
+
+logger = logging.getLogger("server")
+
+
+class WorkerState:
+    """what /health reports about this process"""
+    
+    def __init__(self):
+        self.worker_id = 0  # 0 = single process (dev), 1..n under the launcher
+        self.workers = 1
+        self.pid = os.getpid()
+        self.ready = False
+        self.draining = False
+        self.preloaded = False
+        self.started_at = time.time()
+    
+    def snapshot(self) -> Dict:
+        return {
+            "worker_id": self.worker_id,
+            "workers": self.workers,
+            "pid": self.pid,
+            "ready": self.ready,
+            "draining": self.draining,
+            "preloaded": self.preloaded,
+            "uptime": round(time.time() - self.started_at, 1),
+        }
+
+
+worker_state = WorkerState()
+
+
+def warmups() -> List[Tuple[str, Callable]]:
+    """
+    work that's otherwise done lazily on first use
+    (name, fn) - the launcher runs these before forking, --profile-startup times them
+    """
+    def audit_counters():
+        # the audit log tail is parsed once, not once per worker
+        from brain.counters import action_counters
+        action_counters.load()
+    
+    def phi_patterns():
+        from phi.deidentify import deidentify
+        deidentify("John Smith, DOB 01/02/1980, 555-123-4567, john@example.com, RX1234567")
+    
+    def intent_matcher():
+        from brain.router import detect_intent
+        detect_intent("can I get a refill on my prescription")
+    
+    def email_model():
+        from brain.classifier import email_classifier
+        email_classifier()
+    
+    return [
+        ("audit counters", audit_counters),
+        ("phi patterns", phi_patterns),
+        ("intent matcher", intent_matcher),
+        ("email model + numpy", email_model),
+        # sdk modules only - clients are made per worker on first call
+        ("openai sdk import", lambda: importlib.import_module("openai")),
+        ("httpx import", lambda: importlib.import_module("httpx")),
+    ]
+
+
+def preload():
+    """
+    import and warm everything worth sharing before the fork
+    forked workers get these pages copy-on-write instead of each
+    building their own. nothing here may start threads or open clients
+    """
+    from main import app
+    for _, warm in warmups():
+        warm()
+    
+    # keep the gc from touching (and so copying) the preloaded objects
+    gc.collect()
+    if hasattr(gc, "freeze"):
+        gc.freeze()
+    worker_state.preloaded = True
+    return app
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    """one listening socket, inherited by every worker"""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def worker_server(app, **config):
+    """uvicorn server that marks the worker as draining when told to stop"""
+    import uvicorn
+    
+    class WorkerServer(uvicorn.Server):
+        parent_pid = os.getppid()
+        drain_started = None
+        
+        def handle_exit(self, sig, frame):
+            worker_state.ready = False
+            worker_state.draining = True
+            if self.drain_started is None and settings.SERVER_DRAIN_DELAY > 0:
+                # keep serving (as not ready) so load balancers move away first
+                self.drain_started = time.monotonic()
+                return
+            super().handle_exit(sig, frame)
+        
+        async def on_tick(self, counter: int) -> bool:
+            if self.drain_started is not None and not self.should_exit:
+                if time.monotonic() - self.drain_started >= settings.SERVER_DRAIN_DELAY:
+                    self.should_exit = True
+            # launcher is gone - don't linger as an orphan
+            if worker_state.worker_id and os.getppid() != self.parent_pid:
+                self.should_exit = True
+            return await super().on_tick(counter)
+    
+    return WorkerServer(uvicorn.Config(app, **config))
+
+
+def run_worker(worker_id: int, workers: int, app, sock: socket.socket):
+    """body of a forked worker - never returns"""
+    code = 0
+    try:
+        worker_state.worker_id = worker_id
+        worker_state.workers = workers
+        worker_state.pid = os.getpid()
+        worker_state.started_at = time.time()
+        # the launcher's handlers don't apply here, uvicorn installs its own
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        server = worker_server(
+            app,
+            log_level=settings.LOG_LEVEL.lower(),
+            timeout_graceful_shutdown=settings.SERVER_GRACEFUL_TIMEOUT,
+        )
+        server.run(sockets=[sock])
+    except BaseException:
+        logger.exception("worker %s crashed", worker_id)
+        code = 1
+    finally:
+        # skip the launcher's atexit hooks - shutdown already flushed ours
+        os._exit(code)
+
+
+def serve(workers: int = None, host: str = None, port: int = None):
+    """
+    preload, bind, fork n workers and babysit them
+    SIGTERM/SIGINT drain every worker (in-flight requests finish, then the
+    app shutdown flushes audit entries and sms queues). crashed workers
+    are replaced
+    """
+    logging.basicConfig(level=settings.LOG_LEVEL.upper())
+    workers = workers or settings.SERVER_WORKERS or os.cpu_count() or 1
+    host = host or settings.SERVER_HOST
+    port = port or settings.SERVER_PORT
+    
+    app = preload()
+    sock = bind_socket(host, port)
+    logger.info("listening on %s:%s with %s workers", host, port, workers)
+    
+    children: Dict[int, tuple] = {}  # pid -> (worker id, started)
+    stopping = []
+    
+    def spawn(worker_id: int):
+        pid = os.fork()
+        if pid == 0:
+            run_worker(worker_id, workers, app, sock)
+        children[pid] = (worker_id, time.monotonic())
+    
+    def on_signal(sig, frame):
+        stopping.append(sig)
+    
+    signal.signal(signal.SIGTERM, on_signal)
+    signal.signal(signal.SIGINT, on_signal)
+    
+    for worker_id in range(1, workers + 1):
+        spawn(worker_id)
+    
+    while not stopping:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            pid = 0
+        if not pid:
+            time.sleep(0.2)
+            continue
+        worker_id, started = children.pop(pid)
+        if stopping:
+            break
+        logger.warning("worker %s (pid %s) exited with %s - restarting", worker_id, pid, status)
+        if time.monotonic() - started < 1:
+            time.sleep(1)  # don't spin on a worker that dies at startup
+        spawn(worker_id)
+    
+    # drain - one SIGTERM each, uvicorn finishes in-flight work then shuts down
+    logger.info("stopping %s workers", len(children))
+    for pid in children:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    
+    deadline = time.monotonic() + settings.SERVER_DRAIN_DELAY + settings.SERVER_GRACEFUL_TIMEOUT + 10
+    while children and time.monotonic() < deadline:
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid:
+            children.pop(pid, None)
+        else:
+            time.sleep(0.1)
+    
+    for pid in children:
+        logger.error("worker pid %s didn't stop in time - killing", pid)
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    sock.close()
+
+
+def import_times(module: str = "main") -> List[Tuple[str, float, float, int]]:
+    """
+    cold import of a module in a fresh interpreter (python -X importtime)
+    returns (name, self ms, cumulative ms, depth) in the order python reports them
+    """
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000, depth))
+    return rows
+
+
+def profile_startup(module: str = "main", top: int = 12):
+    """print where a cold worker start goes - imports, then first-use init"""
+    rows = import_times(module)
+    end = next(i for i, row in enumerate(rows) if row[0] == module and row[3] == 0)
+    start = max((i for i in range(end) if rows[i][3] == 0), default=-1) + 1
+    subtree = rows[start:end]
+    
+    print(f"import {module}: {rows[end][2]:.1f} ms (cold, fresh interpreter)")
+    print(f"\n  {'direct imports':<34} {'ms':>8}")
+    for name, _, cumulative, _ in sorted((r for r in subtree if r[3] == 1), key=lambda r: -r[2])[:top]:
+        print(f"  {name:<34} {cumulative:>8.1f}")
+    
+    by_package: Dict[str, float] = {}
+    for name, self_ms, _, _ in subtree:
+        root = name.split(".")[0]
+        by_package[root] = by_package.get(root, 0.0) + self_ms
+    print(f"\n  {'by package (self time)':<34} {'ms':>8}")
+    for root, ms in sorted(by_package.items(), key=lambda kv: -kv[1])[:top]:
+        print(f"  {root:<34} {ms:>8.1f}")
+    
+    from integrations.openai_client import get_client
+    from integrations.airtable import async_airtable
+    from integrations.ghl import async_ghl
+    steps = warmups() + [
+        ("openai client", get_client),
+        ("airtable + ghl http clients", lambda: (async_airtable.client, async_ghl.client)),
+    ]
+    print(f"\n  {'first-use init':<34} {'ms':>8}")
+    total = 0.0
+    for name, fn in steps:
+        t = time.perf_counter()
+        fn()
+        ms = (time.perf_counter() - t) * 1000
+        total += ms
+        print(f"  {name:<34} {ms:>8.1f}")
+    print(f"  {'total':<34} {total:>8.1f}")
@@ -0,0 +1,91 @@
+"""
+tests/phi_reference.py - frozen copies of the original phi implementations
+the oracle for the equivalence tests, and the baseline the phi benchmarks
+compare against. do not "fix" these - they are supposed to stay slow
+"""
+
+import random
+import re
+from datetime import datetime
+from typing import Dict
+
+from phi.deidentify import PATTERNS, COMMON_NAMES
+from phi.models import DeidentifiedData
+
+
+def deidentify_reference(text: str, extra_pii: Dict[str, str] = None) -> DeidentifiedData:
+    """original deidentify - one findall + str.replace per pattern and match"""
+    token_map = {}
+    clean_text = text
+    counter = {}
+    
+    if extra_pii:
+        for key, value in extra_pii.items():
+            if value and value in clean_text:
+                token_type = key.upper()
+                counter[token_type] = counter.get(token_type, 0) + 1
+                token = f"[{token_type}_{counter[token_type]}]"
+                token_map[token] = value
+                clean_text = clean_text.replace(value, token)
+    
+    for pii_type, pattern in PATTERNS.items():
+        matches = re.findall(pattern, clean_text, re.IGNORECASE)
+        for match in matches:
+            token_type = pii_type.upper()
+            counter[token_type] = counter.get(token_type, 0) + 1
+            token = f"[{token_type}_{counter[token_type]}]"
+            token_map[token] = match
+            clean_text = clean_text.replace(match, token)
+    
+    for pattern in COMMON_NAMES:
+        matches = re.findall(pattern, clean_text)
+        for match in matches:
+            counter["NAME"] = counter.get("NAME", 0) + 1
+            token = f"[NAME_{counter['NAME']}]"
+            full_match = match if isinstance(match, str) else match[0]
+            token_map[token] = full_match
+            clean_text = clean_text.replace(full_match, token)
+    
+    return DeidentifiedData(text=clean_text, token_map=token_map, created_at=datetime.now())
+
+
+def reidentify_reference(text: str, token_map: Dict[str, str]) -> str:
+    """original reidentify - sort tokens then one str.replace per token"""
+    result = text
+    sorted_tokens = sorted(token_map.keys(), key=len, reverse=True)
+    for token in sorted_tokens:
+        result = result.replace(token, token_map[token])
+    return result
+
+
+def partial_reidentify_reference(text: str, token_map: Dict[str, str],
+                                 allowed_types: list = None) -> str:
+    """original partial_reidentify - splits every token to get its type"""
+    if not allowed_types:
+        return text
+    result = text
+    for token, original in token_map.items():
+        token_type = token.split("_")[0].replace("[", "")
+        if token_type in allowed_types:
+            result = result.replace(token, original)
+    return result
+
+
+TYPES = ["NAME", "PHONE", "EMAIL", "DOB", "SSN", "ADDRESS"]
+
+
+def make_case(n_tokens: int, size: int, seed: int = 7):
+    """a response of about `size` chars that references n_tokens tokens"""
+    rnd = random.Random(seed)
+    token_map = {}
+    for i in range(n_tokens):
+        token_type = TYPES[i % len(TYPES)]
+        token_map[f"[{token_type}_{i // len(TYPES) + 1}]"] = f"value-{i}"
+    tokens = list(token_map)
+    words = []
+    total = 0
+    while total < size:
+        word = rnd.choice(tokens) if rnd.random() < 0.1 else rnd.choice(["the", "refill", "is", "ready", "today"])
+        words.append(word)
+        total += len(word) + 1
+    return " ".join(words), token_map
@@ -0,0 +1,367 @@
+"""
+tests/stubs.py - local stub servers for the external apis
+used by tests and the benchmarks instead of the real services
+"""
+
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+
+class StubServer:
+    """
+    threaded http server on a free localhost port
+    
+    handler(method, path, query, body) -> (status, json_body[, headers])
+    latency adds a fixed delay (seconds) to every response
+    """
+    
+    def __init__(self, handler: Callable, latency: float = 0.0):
+        self.handler = handler
+        self.latency = latency
+        self.requests: List[Tuple[str, str]] = []
+        self._server = None
+        self._thread = None
+    
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    def start(self) -> "StubServer":
+        stub = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            
+            def _handle(self):
+                parsed = urlparse(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                body = json.loads(raw) if raw else None
+                query = {k: v if k.endswith("[]") else v[0] for k, v in parse_qs(parsed.query).items()}
+                stub.requests.append((self.command, parsed.path))
+                
+                if stub.latency:
+                    time.sleep(stub.latency)
+                result = stub.handler(self.command, parsed.path, query, body)
+                status, payload = result[0], result[1]
+                headers = result[2] if len(result) > 2 else {}
+                
+                if callable(payload):
+                    # streaming body - payload(write) writes chunks itself
+                    self.send_response(status)
+                    for key, value in headers.items():
+                        self.send_header(key, value)
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    
+                    def write(chunk: bytes):
+                        self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+                        self.wfile.flush()
+                    
+                    payload(write)
+                    self.wfile.write(b"0\r\n\r\n")
+                    return
+                
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+            
+            do_GET = do_POST = do_PATCH = do_PUT = do_DELETE = _handle
+            
+            def log_message(self, *args):
+                pass
+        
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+    
+    def __enter__(self):
+        return self.start()
+    
+    def __exit__(self, *exc):
+        self.stop()
+
+
+# airtable
+
+def _split_args(s: str) -> List[str]:
+    """split formula args on top-level commas"""
+    args, depth, quote, current = [], 0, None, ""
+    for ch in s:
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in "'\"":
+            quote = ch
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            args.append(current.strip())
+            current = ""
+            continue
+        current += ch
+    if current.strip():
+        args.append(current.strip())
+    return args
+
+
+def _value(token: str, record: Dict):
+    token = token.strip()
+    if token == "TRUE()":
+        return True
+    if token == "FALSE()":
+        return False
+    if token == "RECORD_ID()":
+        return record["id"]
+    if token[:1] in "'\"":
+        return token[1:-1]
+    if token.startswith("{"):
+        return record["fields"].get(token[1:-1])
+    try:
+        return float(token)
+    except ValueError:
+        return token
+
+
+def match_formula(formula: str, record: Dict) -> bool:
+    """tiny airtable formula evaluator - AND/OR/FIND/=/> and RECORD_ID()"""
+    formula = formula.strip()
+    for fn in ("AND", "OR"):
+        if formula.startswith(fn + "("):
+            parts = [match_formula(p, record) for p in _split_args(formula[len(fn) + 1:-1])]
+            return all(parts) if fn == "AND" else any(parts)
+    if formula.startswith("FIND("):
+        needle, field = _split_args(formula[5:-1])
+        return str(_value(needle, record)) in str(_value(field, record) or "")
+    m = re.match(r"(.+?)\s*(=|>|<)\s*(.+)", formula)
+    if m:
+        left, op, right = _value(m.group(1), record), m.group(2), _value(m.group(3), record)
+        if isinstance(right, float) and left is not None:
+            try:
+                left = float(left)
+            except (TypeError, ValueError):
+                return False
+        if op == "=":
+            return left == right
+        if left is None:
+            return False
+        return left > right if op == ">" else left < right
+    return False
+
+
+class AirtableStub:
+    """in-memory airtable - /v0/{base}/{table}[/{id}]"""
+    
+    BATCH_LIMIT = 10
+    
+    def __init__(self):
+        self.tables: Dict[str, Dict[str, Dict]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _invalid(fields: Dict) -> bool:
+        """tests mark a record as one airtable would reject"""
+        return bool(fields.get("_invalid"))
+    
+    def add(self, table: str, fields: Dict) -> Dict:
+        with self._lock:
+            self._next_id += 1
+            record = {"id": f"rec{self._next_id:06d}", "fields": dict(fields)}
+            self.tables.setdefault(table, {})[record["id"]] = record
+            return record
+    
+    def __call__(self, method: str, path: str, query: Dict, body: Optional[Dict]):
+        parts = path.strip("/").split("/")
+        table = parts[2]
+        record_id = parts[3] if len(parts) > 3 else None
+        rows = self.tables.setdefault(table, {})
+        
+        if method == "GET" and record_id:
+            if record_id not in rows:
+                return 404, {"error": {"type": "NOT_FOUND"}}
+            return 200, rows[record_id]
+        
+        if method == "GET":
+            records = list(rows.values())
+            if query.get("filterByFormula"):
+                records = [r for r in records if match_formula(query["filterByFormula"], r)]
+            if query.get("maxRecords"):
+                records = records[:int(query["maxRecords"])]
+            if query.get("fields[]"):
+                wanted = query["fields[]"]
+                records = [{"id": r["id"], "fields": {k: v for k, v in r["fields"].items() if k in wanted}}
+                           for r in records]
+            # pages of pageSize (max 100), offset is an opaque cursor
+            start = int(query.get("offset", 0))
+            page_size = min(int(query.get("pageSize", 100)), 100)
+            page = {"records": records[start:start + page_size]}
+            if start + page_size < len(records):
+                page["offset"] = str(start + page_size)
+            return 200, page
+        
+        # batch endpoints - all or nothing, like the real api
+        if method in ("POST", "PATCH") and body and "records" in body:
+            records = body["records"]
+            if len(records) > self.BATCH_LIMIT:
+                return 422, {"error": {"type": "INVALID_RECORDS"}}
+            if any(self._invalid(r["fields"]) for r in records) or \
+                    any(r.get("id") and r["id"] not in rows for r in records):
+                return 422, {"error": {"type": "INVALID_VALUE_FOR_COLUMN"}}
+            if method == "POST":
+                return 200, {"records": [self.add(table, r["fields"]) for r in records]}
+            for r in records:
+                rows[r["id"]]["fields"].update(r["fields"])
+            return 200, {"records": [rows[r["id"]] for r in records]}
+        
+        if method == "DELETE" and not record_id:
+            ids = query.get("records[]", [])
+            if len(ids) > self.BATCH_LIMIT or any(i not in rows for i in ids):
+                return 404, {"error": {"type": "NOT_FOUND"}}
+            for i in ids:
+                del rows[i]
+            return 200, {"records": [{"id": i, "deleted": True} for i in ids]}
+        
+        if method == "POST":
+            if self._invalid(body["fields"]):
+                return 422, {"error": {"type": "INVALID_VALUE_FOR_COLUMN"}}
+            return 200, self.add(table, body["fields"])
+        
+        if method == "PATCH":
+            if record_id not in rows:
+                return 404, {"error": {"type": "NOT_FOUND"}}
+            if self._invalid(body["fields"]):
+                return 422, {"error": {"type": "INVALID_VALUE_FOR_COLUMN"}}
+            rows[record_id]["fields"].update(body["fields"])
+            return 200, rows[record_id]
+        
+        if method == "DELETE":
+            if rows.pop(record_id, None) is None:
+                return 404, {"error": {"type": "NOT_FOUND"}}
+            return 200, {"id": record_id, "deleted": True}
+        
+        return 405, {"error": "method not allowed"}
+
+
+# gohighlevel
+
+class GHLStub:
+    """
+    in-memory gohighlevel - contacts, messages, tasks, notes
+    throttle_next makes the next n requests answer 429 with retry_after
+    """
+    
+    def __init__(self, retry_after: str = "0.05"):
+        self.contacts: Dict[str, Dict] = {}
+        self.messages: List[Dict] = []
+        self.tasks: List[Dict] = []
+        self.notes: List[Dict] = []
+        self.throttle_next = 0
+        self.retry_after = retry_after
+        self._lock = threading.Lock()
+    
+    def __call__(self, method: str, path: str, query: Dict, body: Optional[Dict]):
+        with self._lock:
+            if self.throttle_next > 0:
+                self.throttle_next -= 1
+                headers = {"Retry-After": self.retry_after} if self.retry_after else {}
+                return 429, {"error": "rate limited"}, headers
+            
+            path = path[path.index("/", 1):] if path.startswith("/v1") else path
+            if path == "/conversations/messages" and method == "POST":
+                self.messages.append(body)
+                return 200, {"messageId": f"msg{len(self.messages)}", "conversationId": "conv1"}
+            if path == "/tasks/" and method == "POST":
+                self.tasks.append(body)
+                return 200, {"id": f"task{len(self.tasks)}"}
+            if path == "/contacts/notes" and method == "POST":
+                self.notes.append(body)
+                return 200, {"id": f"note{len(self.notes)}"}
+            if path == "/contacts/" and method == "GET":
+                q = query.get("query", "")
+                found = [c for c in self.contacts.values() if q and q in (c.get("email", ""), c.get("phone", ""))]
+                return 200, {"contacts": found}
+            if path == "/contacts/" and method == "POST":
+                contact = dict(body, id=f"contact{len(self.contacts) + 1}")
+                self.contacts[contact["id"]] = contact
+                return 200, {"contact": contact}
+            if path.startswith("/contacts/"):
+                contact_id = path.split("/")[2]
+                if contact_id not in self.contacts:
+                    return 404, {"error": "not found"}
+                if method == "PUT":
+                    self.contacts[contact_id].update(body)
+                return 200, {"contact": self.contacts[contact_id]}
+            return 404, {"error": "not found"}
+
+
+# openai
+
+class OpenAIStub:
+    """
+    /v1/chat/completions that replies with a fixed text
+    streams it word by word when asked - first_token_delay then
+    token_delay per word, like a real model generating
+    """
+    
+    def __init__(self, reply: str = "Your refill is ready for pickup today.",
+                 first_token_delay: float = 0.0, token_delay: float = 0.0):
+        self.reply = reply
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.prompts: List[List[Dict]] = []
+    
+    def pieces(self) -> List[str]:
+        return re.findall(r"\S+\s*", self.reply)
+    
+    def __call__(self, method: str, path: str, query: Dict, body: Optional[Dict]):
+        if not path.endswith("/chat/completions"):
+            return 404, {"error": {"message": "not found"}}
+        self.prompts.append(body["messages"])
+        model = body.get("model", "gpt-4o-mini")
+        
+        if not body.get("stream"):
+            time.sleep(self.first_token_delay + self.token_delay * len(self.pieces()))
+            return 200, {
+                "id": "chatcmpl-stub", "object": "chat.completion", "created": 0, "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": self.reply}}],
+                "usage": {"prompt_tokens": 50, "completion_tokens": len(self.pieces()), "total_tokens": 50 + len(self.pieces())},
+            }
+        
+        def chunk(delta: Dict, finish: str = None) -> bytes:
+            data = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": 0, "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish}]}
+            return f"data: {json.dumps(data)}\n\n".encode()
+        
+        def stream(write):
+            time.sleep(self.first_token_delay)
+            write(chunk({"role": "assistant", "content": ""}))
+            for piece in self.pieces():
+                write(chunk({"content": piece}))
+                time.sleep(self.token_delay)
+            write(chunk({}, "stop"))
+            write(b"data: [DONE]\n\n")
+        
+        return 200, stream, {"Content-Type": "text/event-stream"}
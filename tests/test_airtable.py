@@ -0,0 +1,329 @@
+"""
+tests/test_airtable.py - airtable clients against a local stub server
+"""
+
+import asyncio
+
+import pytest
+from config import settings
+from integrations.airtable import AirtableClient, AsyncAirtableClient, PatientCache, patient_cache
+from integrations.cache import MISSING, TTLCache
+from tests.stubs import AirtableStub, StubServer
+
+
+@pytest.fixture(autouse=True)
+def fresh_patient_cache():
+    patient_cache.clear()
+    yield
+    patient_cache.clear()
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    data = AirtableStub()
+    with StubServer(data) as server:
+        monkeypatch.setattr(settings, "MOCK_MODE", False)
+        monkeypatch.setattr(settings, "AIRTABLE_BASE_URL", f"{server.url}/v0")
+        monkeypatch.setattr(settings, "AIRTABLE_BASE_ID", "appTest")
+        monkeypatch.setattr(settings, "AIRTABLE_API_KEY", "keyTest")
+        data.server = server
+        yield data
+
+
+def run(coro_fn):
+    """run against a fresh async client, closing its pool afterwards"""
+    async def go():
+        client = AsyncAirtableClient()
+        try:
+            return await coro_fn(client)
+        finally:
+            await client.aclose()
+    return asyncio.run(go())
+
+
+class TestAsyncAirtable:
+    def test_crud(self, stub):
+        async def go(client):
+            created = await client.create_record("Patients", {"Name": "Jane", "Phone": "5551234567"})
+            fetched = await client.get_record("Patients", created["id"])
+            updated = await client.update_record("Patients", created["id"], {"Status": "Active"})
+            deleted = await client.delete_record("Patients", created["id"])
+            missing = await client.get_record("Patients", created["id"])
+            return created, fetched, updated, deleted, missing
+        
+        created, fetched, updated, deleted, missing = run(go)
+        assert fetched["fields"]["Name"] == "Jane"
+        assert updated["fields"]["Status"] == "Active"
+        assert deleted["deleted"] is True
+        assert "error" in missing
+    
+    def test_find_patient_by_phone(self, stub):
+        stub.add("Patients", {"Name": "Jane", "Phone": "5551234567"})
+        
+        patient = run(lambda c: c.find_patient_by_phone("(555) 123-4567"))
+        nobody = run(lambda c: c.find_patient_by_phone("555-000-0000"))
+        assert patient["fields"]["Name"] == "Jane"
+        assert nobody is None
+    
+    def test_concurrent_requests_share_pool(self, stub):
+        for i in range(20):
+            stub.add("Prescriptions", {"PatientId": f"p{i % 2}"})
+        
+        async def go(client):
+            return await asyncio.gather(*[client.get_prescriptions(f"p{i % 2}") for i in range(20)])
+        
+        results = run(go)
+        assert all(len(r) == 10 for r in results)
+        assert len(stub.server.requests) == 20
+    
+    def test_matches_sync_client(self, stub):
+        stub.add("Patients", {"Name": "Jane", "Phone": "5551234567"})
+        
+        sync_result = AirtableClient().find_patient_by_phone("5551234567")
+        async_result = run(lambda c: c.find_patient_by_phone("5551234567"))
+        assert sync_result == async_result
+    
+    def test_mock_mode(self, monkeypatch):
+        monkeypatch.setattr(settings, "MOCK_MODE", True)
+        
+        result = run(lambda c: c.get_record("Patients", "rec1"))
+        assert result == AirtableClient().get_record("Patients", "rec1")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache:
+    def test_lru_eviction(self):
+        cache = TTLCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        
+        assert cache.get("b") is MISSING
+        assert cache.get("a") == 1
+        assert cache.stats()["evictions"] == 1
+    
+    def test_expiry(self):
+        clock = FakeClock()
+        cache = TTLCache(ttl=10, clock=clock)
+        cache.set("a", 1)
+        cache.set("b", 2, ttl=1)
+        clock.now = 5
+        
+        assert cache.get("a") == 1
+        assert cache.get("b") is MISSING
+        assert cache.stats()["hits"] == 1
+
+
+class TestPatientCache:
+    def test_repeat_lookup_hits_cache(self, stub):
+        stub.add("Patients", {"Name": "Jane", "Phone": "5551234567"})
+        client = AirtableClient()
+        hits = patient_cache.stats()["hits"]
+        
+        first = client.find_patient_by_phone("555-123-4567")
+        second = client.find_patient_by_phone("(555) 123 4567")
+        assert first == second
+        assert len(stub.server.requests) == 1
+        assert patient_cache.stats()["hits"] == hits + 1
+    
+    def test_negative_cached_until_patient_created(self, stub):
+        client = AirtableClient()
+        
+        assert client.find_patient_by_phone("5559990000") is None
+        assert client.find_patient_by_phone("5559990000") is None
+        assert len(stub.server.requests) == 1
+        
+        client.create_record("Patients", {"Name": "New", "Phone": "5559990000"})
+        assert client.find_patient_by_phone("5559990000")["fields"]["Name"] == "New"
+    
+    def test_negative_ttl_is_shorter(self):
+        clock = FakeClock()
+        patient_cache.cache.clock = clock
+        try:
+            patient_cache.put("5550001111", None)
+            patient_cache.put("5552223333", {"id": "rec1"})
+            clock.now = patient_cache.negative_ttl + 1
+            
+            assert patient_cache.get("5550001111") is MISSING
+            assert patient_cache.get("5552223333") == {"id": "rec1"}
+        finally:
+            patient_cache.cache.clock = TTLCache().clock
+    
+    def test_update_invalidates(self, stub):
+        record = stub.add("Patients", {"Name": "Jane", "Phone": "5551234567"})
+        client = AirtableClient()
+        client.find_patient_by_phone("5551234567")
+        
+        client.update_record("Patients", record["id"], {"Name": "Janet"})
+        assert client.find_patient_by_phone("5551234567")["fields"]["Name"] == "Janet"
+    
+    def test_invalidation_state_bounded_by_cache(self):
+        cache = PatientCache(maxsize=2)
+        for i in range(100):
+            cache.put(f"555000{i:04d}", {"id": f"rec{i}"})
+        
+        assert len(cache.cache) == 2
+        assert [k for k, v in vars(cache).items() if isinstance(v, dict)] == []
+        cache.on_write("rec99")
+        assert cache.get("5550000099") is MISSING
+        assert cache.get("5550000098") == {"id": "rec98"}
+    
+    def test_concurrent_lookups_coalesced(self, stub):
+        stub.add("Patients", {"Name": "Jane", "Phone": "5551234567"})
+        stub.server.latency = 0.1
+        
+        async def go(client):
+            return await asyncio.gather(*[client.find_patient_by_phone("5551234567") for _ in range(10)])
+        
+        coalesced = patient_cache.stats()["coalesced"]
+        results = run(go)
+        assert all(r["fields"]["Name"] == "Jane" for r in results)
+        assert len(stub.server.requests) == 1
+        assert patient_cache.stats()["coalesced"] == coalesced + 9
+    
+    def test_errors_not_cached(self, stub):
+        stub.server.handler = lambda *args: (500, {"error": "boom"})
+        client = AirtableClient()
+        
+        assert client.find_patient_by_phone("5551234567") is None
+        assert patient_cache.get("5551234567") is MISSING
+
+
+class TestBulkWrites:
+    def test_create_chunks_into_batches(self, stub):
+        results = AirtableClient().create_records("Interactions", [{"n": i} for i in range(25)])
+        
+        assert [r["fields"]["n"] for r in results] == list(range(25))
+        assert len(stub.server.requests) == 3
+    
+    def test_per_record_errors(self, stub):
+        items = [{"n": i} for i in range(12)]
+        items[3]["_invalid"] = True
+        
+        results = run(lambda c: c.create_records("Interactions", items))
+        
+        assert "error" in results[3]
+        assert [r["fields"]["n"] for i, r in enumerate(results) if i != 3] == [i for i in range(12) if i != 3]
+        assert len(stub.tables["Interactions"]) == 11
+    
+    def test_rejected_batch_keeps_status(self, stub):
+        items = [{"n": i} for i in range(3)]
+        items[1]["_invalid"] = True
+        
+        results = AirtableClient().create_records("Interactions", items)
+        
+        assert results[1]["status"] == 422
+        # one rejected batch, then each record on its own
+        assert len(stub.server.requests) == 4
+    
+    @pytest.mark.parametrize("status", [429, 503])
+    def test_failed_batch_not_resent(self, stub, status):
+        stub.server.handler = lambda *args: (status, {"error": {"type": "NOPE"}})
+        items = [{"n": i} for i in range(12)]
+        
+        sync_results = AirtableClient().create_records("Interactions", items)
+        async_results = run(lambda c: c.create_records("Interactions", items))
+        
+        for results in (sync_results, async_results):
+            assert len(results) == 12
+            assert all(r["status"] == status for r in results)
+        # two batches per client, no per-record retries
+        assert len(stub.server.requests) == 4
+    
+    def test_update_and_delete(self, stub):
+        ids = [stub.add("Patients", {"n": i})["id"] for i in range(15)]
+        
+        async def go(client):
+            updated = await client.update_records("Patients", [{"id": i, "fields": {"Status": "Done"}} for i in ids])
+            deleted = await client.delete_records("Patients", ids[:11] + ["recMissing"])
+            return updated, deleted
+        
+        updated, deleted = run(go)
+        assert all(r["fields"]["Status"] == "Done" for r in updated)
+        assert all(r.get("deleted") for r in deleted[:11])
+        assert "error" in deleted[11]
+        assert list(stub.tables["Patients"]) == ids[11:]
+    
+    def test_mock_mode(self, monkeypatch):
+        monkeypatch.setattr(settings, "MOCK_MODE", True)
+        
+        assert len(AirtableClient().log_interactions([{"a": 1}] * 3)) == 3
+
+
+class TestPagination:
+    def test_iter_follows_offset(self, stub):
+        for i in range(250):
+            stub.add("Patients", {"n": i, "Notes": "x" * 10})
+        
+        records = list(AirtableClient().iter_records("Patients", fields=["n"]))
+        
+        assert [r["fields"]["n"] for r in records] == list(range(250))
+        assert all("Notes" not in r["fields"] for r in records)
+        assert len(stub.server.requests) == 3
+    
+    def test_async_iter_with_filter(self, stub):
+        for i in range(120):
+            stub.add("Patients", {"n": i, "Active": i % 2 == 0})
+        
+        async def go(client):
+            return [r async for r in client.iter_records("Patients", "{Active} = TRUE()", page_size=25)]
+        
+        records = run(go)
+        assert len(records) == 60
+        assert len(stub.server.requests) == 3
+    
+    def test_stops_early(self, stub):
+        for i in range(300):
+            stub.add("Patients", {"n": i})
+        
+        it = AirtableClient().iter_records("Patients", prefetch=False)
+        first = [next(it) for _ in range(10)]
+        it.close()
+        
+        assert len(first) == 10
+        assert len(stub.server.requests) == 1
+    
+    def test_get_records_respects_max(self, stub):
+        for i in range(150):
+            stub.add("Patients", {"n": i})
+        
+        assert len(AirtableClient().get_records("Patients", max_records=120)) == 120
+        assert len(run(lambda c: c.get_records("Patients"))) == 100
+
+
+class TestBulkReads:
+    def test_get_records_by_id_chunks(self, stub):
+        ids = [stub.add("Patients", {"FirstName": f"p{i}"})["id"] for i in range(120)]
+        client = AirtableClient()
+        
+        found = client.get_patients(ids + ids[:5] + ["recMissing"])
+        
+        assert set(found) == set(ids)
+        assert found[ids[7]]["fields"]["FirstName"] == "p7"
+        # 121 distinct ids -> 3 lookups of up to 50
+        assert client.requests_made == 3
+    
+    def test_async_matches_sync(self, stub):
+        ids = [stub.add("Patients", {"FirstName": f"p{i}", "Phone": "1"})["id"] for i in range(60)]
+        
+        async def go(client):
+            found = await client.get_patients(ids, fields=["FirstName"])
+            return found, client.requests_made
+        
+        found, calls = run(go)
+        assert found == AirtableClient().get_patients(ids, fields=["FirstName"])
+        assert calls == 2
+        assert "Phone" not in found[ids[0]]["fields"]
+    
+    def test_empty(self, stub):
+        client = AirtableClient()
+        assert client.get_patients([None, ""]) == {}
+        assert client.requests_made == 0
@@ -0,0 +1,239 @@
+"""
+tests/test_audit.py - tests for the segmented audit store
+"""
+
+import asyncio
+import json
+import multiprocessing
+import os
+import threading
+import time
+from datetime import datetime
+
+import pytest
+from brain import audit
+from brain.audit import AuditStore, AuditWriter
+from handlers import chat
+from phi.models import AuditEntry
+
+
+def make_entry(action, session_id, day=17, hour=9):
+    return AuditEntry(
+        timestamp=datetime(2026, 10, day, hour, 0, 0),
+        action=action,
+        session_id=session_id,
+        details="test"
+    )
+
+
+def fork_writer(store, wid):
+    for i in range(100):
+        store.append(make_entry("chat_received", f"w{wid}"))
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = AuditStore(root=str(tmp_path / "audit"), legacy_file=str(tmp_path / "audit_log.jsonl"))
+    yield store
+    store.close()
+
+
+class TestAuditStore:
+    def test_segments_by_day(self, store):
+        store.append(make_entry("chat_received", "s1", day=16))
+        store.append(make_entry("chat_received", "s2", day=17))
+        
+        assert store.days() == ["2026-10-16", "2026-10-17"]
+        assert [e.session_id for e in store.read_day(datetime(2026, 10, 17).date())] == ["s2"]
+    
+    def test_line_format_unchanged(self, store):
+        entry = make_entry("sms_sent", "s1")
+        store.append(entry)
+        
+        with open(store.segment_path("2026-10-17")) as f:
+            assert f.read() == entry.model_dump_json() + "\n"
+    
+    def test_session_lookup_across_days(self, store):
+        store.append_many([
+            make_entry("chat_received", "s1", day=16),
+            make_entry("chat_received", "other", day=16),
+            make_entry("chat_responded", "s1", day=17),
+        ])
+        
+        logs = store.read_session("s1")
+        assert [e.action for e in logs] == ["chat_received", "chat_responded"]
+        assert store.read_session("missing") == []
+    
+    def test_action_lookup_and_counts(self, store):
+        store.append_many([make_entry("sms_sent", f"s{i}") for i in range(3)] + [make_entry("chat_received", "c")])
+        day = datetime(2026, 10, 17).date()
+        
+        assert len(store.read_action("sms_sent", day)) == 3
+        assert store.count_actions(day) == {"sms_sent": 3, "chat_received": 1}
+    
+    def test_index_picks_up_new_appends(self, store):
+        store.append(make_entry("chat_received", "s1"))
+        assert len(store.read_session("s1")) == 1
+        
+        store.append(make_entry("chat_responded", "s1"))
+        assert len(store.read_session("s1")) == 2
+    
+    def test_missing_index_is_rebuilt(self, store):
+        store.append_many([make_entry("chat_received", "s1"), make_entry("chat_responded", "s1")])
+        os.remove(store.index_path("2026-10-17"))
+        
+        fresh = AuditStore(root=store.root, legacy_file="")
+        assert [e.action for e in fresh.read_session("s1")] == ["chat_received", "chat_responded"]
+        assert os.path.exists(store.index_path("2026-10-17"))
+        fresh.close()
+    
+    def test_legacy_log_migrated(self, tmp_path):
+        legacy = tmp_path / "audit_log.jsonl"
+        lines = [make_entry("chat_received", "old", day=1).model_dump_json(),
+                 "not json",
+                 make_entry("sms_sent", "old", day=2).model_dump_json()]
+        legacy.write_text("\n".join(lines) + "\n")
+        
+        store = AuditStore(root=str(tmp_path / "audit"), legacy_file=str(legacy))
+        
+        assert store.days() == ["2026-10-01", "2026-10-02"]
+        assert len(store.read_session("old")) == 2
+        assert not legacy.exists()
+        assert (tmp_path / "audit_log.jsonl.migrated").exists()
+        store.close()
+    
+    def test_concurrent_migration_copies_once(self, tmp_path):
+        legacy = tmp_path / "audit_log.jsonl"
+        legacy.write_text("".join(make_entry("chat_received", f"s{i}", day=1).model_dump_json() + "\n"
+                                  for i in range(2000)))
+        stores = [AuditStore(root=str(tmp_path / "audit"), legacy_file=str(legacy)) for _ in range(2)]
+        start = threading.Barrier(2)
+        errors = []
+        
+        def migrate(store):
+            start.wait()
+            try:
+                store.days()
+            except Exception as e:
+                errors.append(e)
+        
+        threads = [threading.Thread(target=migrate, args=(s,)) for s in stores]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        
+        assert errors == []
+        assert len(stores[0].read_day(datetime(2026, 10, 1).date())) == 2000
+        for store in stores:
+            store.close()
+    
+    def test_handles_kept_open(self, store):
+        store.append(make_entry("chat_received", "s1"))
+        files, lock_file = store._files["2026-10-17"], store._lock_file
+        store.append_many([make_entry("chat_responded", "s1")] * 3)
+        
+        assert store._files["2026-10-17"] == files and store._lock_file is lock_file
+        assert len(store.read_session("s1")) == 4
+        
+        # as if we were a forked child - nothing inherited gets reused
+        store._pid = -1
+        store.append(make_entry("chat_responded", "s1"))
+        assert store._lock_file is not lock_file and store._files["2026-10-17"] != files
+        assert files[0].closed and lock_file.closed
+    
+    @pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+    def test_forked_writers_reopen_handles(self, store):
+        store.append(make_entry("chat_received", "parent"))  # handles open before the fork
+        ctx = multiprocessing.get_context("fork")
+        procs = [ctx.Process(target=fork_writer, args=(store, w)) for w in range(3)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        
+        assert all(p.exitcode == 0 for p in procs)
+        fresh = AuditStore(root=store.root, legacy_file="")
+        day = datetime(2026, 10, 17).date()
+        assert len(fresh.read_day(day)) == 301
+        # every line indexed at the right offset, none interleaved
+        assert sum(fresh.count_actions(day).values()) == 301
+        assert len(fresh.read_session("w2")) == 100
+        fresh.close()
+
+
+class TestLogAction:
+    def test_log_and_read_back(self, store, monkeypatch):
+        monkeypatch.setattr(audit, "audit_store", store)
+        
+        entry = audit.log_action("chat_received", "abc", "hello")
+        
+        assert audit.get_session_logs("abc")[0].details == "hello"
+        assert len(audit.get_logs_by_date(entry.timestamp)) == 1
+        assert len(audit.get_logs_by_action("chat_received")) == 1
+    
+    def test_history_endpoint_reads_off_the_loop(self, store, monkeypatch):
+        def slow_logs(session_id):
+            time.sleep(0.2)  # a flush waiting on the writer thread
+            return store.read_session(session_id)
+        
+        monkeypatch.setattr(audit, "get_session_logs", slow_logs)
+        ticks = []
+        
+        async def ticker():
+            for _ in range(5):
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.02)
+        
+        async def go():
+            return await asyncio.gather(ticker(), chat.get_chat_history("abc"))
+        
+        _, history = asyncio.run(go())
+        assert history == {"session_id": "abc", "logs": []}
+        assert max(b - a for a, b in zip(ticks, ticks[1:])) < 0.1
+
+
+class TestAuditWriter:
+    def test_clean_stop_loses_nothing(self, store):
+        writer = AuditWriter(store, max_batch=50, max_latency_ms=1000)
+        writer.start()
+        
+        def produce(n):
+            for i in range(250):
+                writer.submit(make_entry("chat_received", f"t{n}-{i}"))
+        
+        threads = [threading.Thread(target=produce, args=(n,)) for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        writer.stop()
+        
+        assert not writer.running
+        assert len(store.read_day(datetime(2026, 10, 17).date())) == 1000
+        # group commits, not one write per entry
+        assert writer.commits <= 1000 // 50 + 4
+    
+    def test_flush_commits_immediately(self, store):
+        writer = AuditWriter(store, max_batch=1000, max_latency_ms=60_000)
+        writer.start()
+        try:
+            writer.submit(make_entry("chat_received", "s1"))
+            assert writer.flush(timeout=2)
+            assert len(store.read_session("s1")) == 1
+        finally:
+            writer.stop()
+    
+    def test_log_action_buffered_mode(self, store, monkeypatch):
+        monkeypatch.setattr(audit, "audit_store", store)
+        audit.start_writer(store)
+        try:
+            for i in range(10):
+                audit.log_action("sms_sent", "buffered")
+            # reads flush first, so they see their own writes
+            assert len(audit.get_session_logs("buffered")) == 10
+        finally:
+            audit.stop_writer()
+        
+        audit.log_action("sms_sent", "buffered")
+        assert len(audit.get_session_logs("buffered")) == 11
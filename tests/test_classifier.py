@@ -0,0 +1,132 @@
+"""
+tests/test_classifier.py - local email intent model
+"""
+
+import asyncio
+import json
+import os
+
+import numpy as np
+import pytest
+from config import settings
+from brain.classifier import (HashedNgrams, IntentClassifier, labelled_emails, record_training_example,
+                              train_email_classifier)
+from handlers import email as email_handler
+from handlers.email import EMAIL_INTENTS, EmailPayload
+from benchmarks.bench_classifier import make_emails
+
+
+@pytest.fixture(scope="module")
+def model():
+    texts, labels = make_emails(1500, seed=1)
+    return IntentClassifier(EMAIL_INTENTS, dims=2 ** 16).fit(texts, labels)
+
+
+class TestHashedNgrams:
+    def test_phi_tokens_share_a_feature(self):
+        v = HashedNgrams(dims=1024)
+        assert v.features("hi [NAME_1]") == v.features("hi [NAME_7]")
+    
+    def test_unit_norm(self):
+        ids, vals = HashedNgrams().transform_one("please refill my cream")
+        assert len(ids) == len(set(ids.tolist()))
+        assert np.linalg.norm(vals) == pytest.approx(1.0)
+
+
+class TestIntentClassifier:
+    def test_accuracy(self, model):
+        texts, labels = make_emails(500, seed=9)
+        preds = model.predict(texts)
+        accuracy = np.mean([p == label for (p, _), label in zip(preds, labels)])
+        assert accuracy > 0.95
+    
+    def test_batch_matches_single(self, model):
+        texts, _ = make_emails(20, seed=3)
+        batch = model.predict(texts + [""])
+        for text, (label, conf) in zip(texts + [""], batch):
+            one = model.predict_one(text)
+            assert one[0] == label and one[1] == pytest.approx(conf, abs=1e-5)
+        assert model.predict([]) == []
+    
+    def test_save_load_roundtrip(self, model, tmp_path):
+        path = str(tmp_path / "model.npz")
+        model.save(path)
+        loaded = IntentClassifier.load(path)
+        texts, _ = make_emails(50, seed=4)
+        assert loaded.labels == model.labels
+        assert np.allclose(loaded.predict_proba(texts), model.predict_proba(texts), atol=1e-6)
+
+
+class TestTraining:
+    def test_examples_round_trip(self, tmp_path):
+        path = str(tmp_path / "training.jsonl")
+        record_training_example("charged twice", "billing", path)
+        record_training_example("refill please", "refill_request", path)
+        with open(path, "a") as f:
+            f.write('{"intent": "billing", "te')  # torn write
+        assert labelled_emails(path) == (["charged twice", "refill please"], ["billing", "refill_request"])
+        assert os.stat(path).st_mode & 0o077 == 0
+    
+    def test_missing_file_is_empty(self, tmp_path):
+        assert labelled_emails(str(tmp_path / "nope.jsonl")) == ([], [])
+    
+    def test_train_from_examples(self, tmp_path):
+        dataset = str(tmp_path / "training.jsonl")
+        path = str(tmp_path / "email.npz")
+        assert train_email_classifier(EMAIL_INTENTS, dataset, min_examples=10, path=path) is None
+        
+        for text, label in zip(*make_emails(300, seed=5)):
+            record_training_example(text, label, dataset)
+        model = train_email_classifier(EMAIL_INTENTS, dataset, min_examples=10, path=path)
+        assert model.trained_on == 300
+        assert IntentClassifier.load(path).predict_one("please refill my semaglutide")[0] == "refill_request"
+
+
+class TestTriage:
+    def run_triage(self, monkeypatch, tmp_path, model, body, training=False):
+        path = str(tmp_path / "email.npz")
+        monkeypatch.setattr(settings, "EMAIL_TRAINING_ENABLED", training)
+        monkeypatch.setattr(settings, "EMAIL_TRAINING_PATH", str(tmp_path / "training.jsonl"))
+        if model is not None:
+            model.save(path)
+        monkeypatch.setattr(settings, "EMAIL_CLASSIFIER_PATH", path)
+        llm_calls = []
+        
+        async def fake_llm(text):
+            llm_calls.append(text)
+            return {"intent": "general", "confidence": 0.6, "priority": "low", "summary": "llm"}
+        
+        logged = []
+        monkeypatch.setattr(email_handler, "classify_with_llm", fake_llm)
+        monkeypatch.setattr(email_handler, "log_action", lambda *args: logged.append(args))
+        payload = EmailPayload(from_email="pat@example.com", subject="refill", body=body)
+        result = asyncio.run(email_handler.triage_email(payload))
+        details = json.loads(logged[-1][2])
+        return result, llm_calls, details
+    
+    def test_confident_emails_skip_llm(self, monkeypatch, tmp_path, model):
+        result, llm_calls, details = self.run_triage(
+            monkeypatch, tmp_path, model, "Hi, I need a refill of semaglutide. Thank you!")
+        assert result.intent == "refill_request"
+        assert not llm_calls
+        assert details["source"] == "local"
+    
+    def test_falls_back_without_model(self, monkeypatch, tmp_path):
+        result, llm_calls, details = self.run_triage(monkeypatch, tmp_path, None, "hello there")
+        assert result.intent == "general" and len(llm_calls) == 1
+        assert details["source"] == "llm"
+    
+    def test_email_text_never_in_audit(self, monkeypatch, tmp_path):
+        _, _, details = self.run_triage(monkeypatch, tmp_path, None, "I take sertraline", training=True)
+        assert set(details) == {"intent", "priority", "confidence", "source"}
+        # opted in, so it lands in the training file instead
+        assert labelled_emails(str(tmp_path / "training.jsonl"))[1] == ["general"]
+    
+    def test_training_is_opt_in(self, monkeypatch, tmp_path):
+        self.run_triage(monkeypatch, tmp_path, None, "hello there")
+        assert not (tmp_path / "training.jsonl").exists()
+    
+    def test_unsure_goes_to_llm(self, monkeypatch, tmp_path, model):
+        monkeypatch.setattr(settings, "EMAIL_CLASSIFIER_THRESHOLD", 1.01)
+        _, llm_calls, _ = self.run_triage(monkeypatch, tmp_path, model, "I need a refill of semaglutide")
+        assert len(llm_calls) == 1
@@ -0,0 +1,156 @@
+"""
+tests/test_completion_cache.py - openai completion cache
+"""
+
+import asyncio
+import multiprocessing
+import os
+from types import SimpleNamespace
+
+import pytest
+from config import settings
+from integrations import openai_client
+from integrations.completion_cache import CompletionCache, cache_key, cost
+
+
+class FakeCompletions:
+    def __init__(self, reply="We're open 9-6 weekdays.", fail=False, delay=0.0):
+        self.reply = reply
+        self.fail = fail
+        self.delay = delay
+        self.calls = 0
+    
+    async def create(self, model, messages, temperature, max_tokens):
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("bad request")
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=self.reply))],
+            usage=SimpleNamespace(prompt_tokens=1000, completion_tokens=200),
+        )
+
+
+@pytest.fixture
+def api(monkeypatch, tmp_path):
+    fake = FakeCompletions()
+    monkeypatch.setattr(settings, "MOCK_MODE", False)
+    monkeypatch.setattr(openai_client, "client", SimpleNamespace(chat=SimpleNamespace(completions=fake)))
+    monkeypatch.setattr(openai_client, "completion_cache", CompletionCache(path=""))
+    return fake
+
+
+def ask(text, **kwargs):
+    messages = [{"role": "system", "content": "pharmacy"}, {"role": "user", "content": text}]
+    return asyncio.run(openai_client.get_completion(messages, **kwargs))
+
+
+def fork_worker(cache, wid):
+    # the inherited cache, as a prefork worker would use it
+    for i in range(20):
+        cache.put(f"w{wid}-{i}", "text")
+    cache.disk.close()
+
+
+class TestCompletionCache:
+    def test_repeat_prompt_served_from_cache(self, api):
+        assert ask("what are your hours?") == api.reply
+        assert ask("what are your hours?") == api.reply
+        assert api.calls == 1
+        
+        stats = openai_client.completion_cache.stats()
+        assert stats["hits"] == 1 and stats["misses"] == 1 and stats["hit_rate"] == 0.5
+        assert stats["tokens_saved"] == 1200
+        assert stats["dollars_saved"] == pytest.approx(cost("gpt-4o-mini", 1000, 200))
+    
+    def test_key_covers_params(self, api):
+        ask("hours?")
+        ask("hours?", max_tokens=100)
+        ask("hours?", model="gpt-4o")
+        ask("hours?", temperature=0.2)
+        assert api.calls == 4
+        assert cache_key([], "a", 0.1, 5) != cache_key([], "a", 0.1, 6)
+    
+    def test_high_temperature_and_flag_bypass(self, api):
+        ask("hours?", temperature=1.0)
+        ask("hours?", temperature=1.0)
+        ask("hours?", cache=False)
+        ask("hours?", cache=False)
+        assert api.calls == 4
+        assert openai_client.completion_cache.stats()["bypassed"] == 2
+    
+    def test_raw_phi_never_cached(self, api):
+        ask("call me at 555-123-4567")
+        ask("call me at 555-123-4567")
+        assert api.calls == 2
+        assert openai_client.completion_cache.stats()["skipped_phi"] == 2
+        assert len(openai_client.completion_cache.memory) == 0
+        
+        # tokens are fine, but not a reply that leaks phi
+        api.reply = "Sure, emailing jane@example.com"
+        ask("hi [NAME_1]")
+        ask("hi [NAME_1]")
+        assert api.calls == 4
+    
+    def test_errors_not_cached(self, api):
+        api.fail = True
+        assert ask("hours?").startswith("Error:")
+        api.fail = False
+        assert ask("hours?") == api.reply
+        assert ask("hours?") == api.reply
+        assert api.calls == 2
+    
+    def test_concurrent_identical_prompts_coalesced(self, api):
+        api.delay = 0.05
+        messages = [{"role": "user", "content": "refill steps?"}]
+        
+        async def go():
+            return await asyncio.gather(*[openai_client.get_completion(messages) for _ in range(5)])
+        
+        assert asyncio.run(go()) == [api.reply] * 5
+        assert api.calls == 1
+    
+    def test_disk_tier_survives_restart(self, tmp_path):
+        path = str(tmp_path / "completions.db")
+        first = CompletionCache(path=path)
+        first.put("k", "cached text", 10, 5)
+        first.disk.close()
+        
+        second = CompletionCache(path=path)
+        assert second.get("k", "gpt-4o-mini") == "cached text"
+        assert second.stats()["disk_hits"] == 1
+        # promoted into memory
+        assert second.get("k", "gpt-4o-mini") == "cached text"
+        assert second.stats()["disk_hits"] == 1
+    
+    def test_disk_entries_expire(self, tmp_path):
+        cache = CompletionCache(path=str(tmp_path / "c.db"), ttl=-1)
+        cache.put("k", "old")
+        cache.memory.clear()
+        assert cache.get("k", "gpt-4o-mini") is None
+        assert len(cache.disk) == 0
+    
+    def test_disk_connection_opened_lazily(self, tmp_path):
+        path = tmp_path / "lazy.db"
+        cache = CompletionCache(path=str(path))
+        assert not path.exists()
+        cache.put("k", "text")
+        assert path.exists()
+        cache.disk.close()
+    
+    @pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+    def test_disk_tier_across_forked_workers(self, tmp_path):
+        cache = CompletionCache(path=str(tmp_path / "shared.db"))
+        cache.put("parent", "text")  # parent connection is open before the fork
+        ctx = multiprocessing.get_context("fork")
+        procs = [ctx.Process(target=fork_worker, args=(cache, w)) for w in range(3)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        assert all(p.exitcode == 0 for p in procs)
+        assert len(cache.disk) == 61
+        cache.memory.clear()
+        assert cache.get("w2-19", "gpt-4o-mini") == "text"
+        cache.disk.close()
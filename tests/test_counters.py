@@ -0,0 +1,105 @@
+"""
+tests/test_counters.py - tests for live analytics counters
+"""
+
+import asyncio
+import time
+from datetime import datetime
+
+import pytest
+from brain.audit import AuditStore
+from brain.counters import ActionCounters
+from handlers import analytics
+from phi.models import AuditEntry
+
+
+DAY = datetime(2026, 10, 17)
+
+
+def make_entry(action, session_id="s"):
+    return AuditEntry(timestamp=DAY, action=action, session_id=session_id)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = AuditStore(root=str(tmp_path / "audit"), legacy_file="")
+    yield store
+    store.close()
+
+
+class TestActionCounters:
+    def test_counts_and_categories(self, store):
+        counters = ActionCounters(store)
+        store.append_many([make_entry("chat_received"), make_entry("chat_escalated"),
+                           make_entry("sms_sent"), make_entry("call_transfer")])
+        
+        snap = counters.snapshot(DAY.date())
+        assert snap["total"] == 4
+        assert snap["actions"]["chat_received"] == 1
+        assert snap["categories"]["chats"] == 2
+        assert snap["categories"]["escalated"] == 2
+    
+    def test_live_updates_after_first_read(self, store):
+        counters = ActionCounters(store)
+        store.append(make_entry("sms_sent"))
+        assert counters.snapshot(DAY.date())["total"] == 1
+        
+        store.append_many([make_entry("refill_reminder_sent"), make_entry("refill_confirmed")])
+        snap = counters.snapshot(DAY.date())
+        assert snap["total"] == 3
+        assert snap["categories"]["refill_reminders"] == 1
+        assert snap["categories"]["refill_confirmed"] == 1
+    
+    def test_checkpoint_plus_tail(self, store):
+        counters = ActionCounters(store)
+        store.append_many([make_entry("chat_received")] * 3)
+        counters.snapshot(DAY.date())
+        counters.checkpoint()
+        
+        # written by "another process" after the checkpoint
+        other = AuditStore(root=store.root, legacy_file="")
+        other.append_many([make_entry("email_received")] * 2)
+        other.close()
+        
+        restored = ActionCounters(store)
+        restored.load()
+        snap = restored.snapshot(DAY.date())
+        assert snap["actions"] == {"chat_received": 3, "email_received": 2}
+        assert snap["categories"]["emails"] == 2
+    
+    def test_empty_day(self, store):
+        assert ActionCounters(store).snapshot(DAY.date())["total"] == 0
+
+
+class TestAnalyticsEndpoints:
+    def test_daily_stats(self, store, monkeypatch):
+        counters = ActionCounters(store)
+        monkeypatch.setattr(analytics, "action_counters", counters)
+        now = datetime.now()
+        store.append_many([
+            AuditEntry(timestamp=now, action=a, session_id="s")
+            for a in ["chat_received", "sms_received", "call_started", "email_received", "chat_escalated"]
+        ])
+        
+        daily = asyncio.run(analytics.get_daily_stats())
+        rate = asyncio.run(analytics.get_automation_rate())
+        
+        assert daily["chats"] == 2
+        assert daily["total_interactions"] == 5
+        assert rate == {"rate": 80.0, "total": 5, "automated": 4, "escalated": 1}
+    
+    def test_flush_does_not_block_the_loop(self, store, monkeypatch):
+        monkeypatch.setattr(analytics, "action_counters", ActionCounters(store))
+        monkeypatch.setattr(analytics, "flush", lambda: time.sleep(0.2))
+        ticks = []
+        
+        async def ticker():
+            for _ in range(5):
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.02)
+        
+        async def go():
+            await asyncio.gather(ticker(), analytics.get_daily_stats())
+        
+        asyncio.run(go())
+        assert max(b - a for a, b in zip(ticks, ticks[1:])) < 0.1
@@ -0,0 +1,153 @@
+"""
+tests/test_ghl.py - gohighlevel clients against a local stub server
+"""
+
+import asyncio
+import time
+
+import pytest
+from config import settings
+from integrations.ghl import AsyncGHLClient, GHLClient, endpoint_key
+from integrations.ratelimit import TokenBucket, parse_retry_after
+from tests.stubs import GHLStub, StubServer
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    data = GHLStub()
+    with StubServer(data) as server:
+        monkeypatch.setattr(settings, "MOCK_MODE", False)
+        monkeypatch.setattr(settings, "GHL_BASE_URL", f"{server.url}/v1")
+        monkeypatch.setattr(settings, "GHL_API_KEY", "test-key")
+        data.server = server
+        yield data
+
+
+def run(coro_fn, **kwargs):
+    async def go():
+        client = AsyncGHLClient(**kwargs)
+        try:
+            return await coro_fn(client)
+        finally:
+            await client.aclose()
+    return asyncio.run(go())
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBucket:
+    def test_burst_then_wait(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, capacity=3, clock=clock)
+        
+        assert [bucket.reserve() for _ in range(3)] == [0, 0, 0]
+        assert bucket.reserve() == pytest.approx(0.5)
+        clock.now = 0.5
+        assert bucket.reserve() == 0
+    
+    def test_async_acquire_paces_calls(self):
+        bucket = TokenBucket(rate=50, capacity=1)
+        
+        async def go():
+            start = time.monotonic()
+            for _ in range(6):
+                await bucket.acquire()
+            return time.monotonic() - start
+        
+        assert asyncio.run(go()) >= 0.09
+    
+    def test_parse_retry_after(self):
+        assert parse_retry_after("2") == 2.0
+        assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+        assert parse_retry_after(None) is None
+    
+    def test_endpoint_key(self):
+        assert endpoint_key("/contacts/abc123") == "/contacts"
+        assert endpoint_key("/conversations/messages") == "/conversations"
+
+
+class TestAsyncGHL:
+    def test_send_sms_and_tasks(self, stub):
+        async def go(client):
+            return await asyncio.gather(
+                client.send_sms("c1", "hello"),
+                client.create_task("c1", "call back"),
+                client.add_note("c1", "note"),
+            )
+        
+        sms, task, note = run(go, location_id="loc-a")
+        assert sms["messageId"] == "msg1"
+        assert stub.messages[0] == {"type": "SMS", "contactId": "c1", "message": "hello"}
+        assert task["id"] == "task1"
+        assert len(stub.notes) == 1
+    
+    def test_retries_429_with_retry_after(self, stub):
+        stub.throttle_next = 2
+        
+        async def go(client):
+            start = time.monotonic()
+            result = await client.send_sms("c1", "hi")
+            return result, time.monotonic() - start, client.rate_limited
+        
+        result, elapsed, limited = run(go, location_id="loc-b")
+        assert result["messageId"] == "msg1"
+        assert limited == 2
+        assert elapsed >= 0.1
+    
+    def test_retry_after_is_capped(self, stub, monkeypatch):
+        monkeypatch.setattr("integrations.ghl.MAX_BACKOFF", 0.05)
+        stub.retry_after = "86400"
+        stub.throttle_next = 1
+        
+        async def go(client):
+            start = time.monotonic()
+            result = await asyncio.wait_for(client.send_sms("c1", "hi"), timeout=5)
+            return result, time.monotonic() - start
+        
+        result, elapsed = run(go, location_id="loc-e")
+        assert result["messageId"] == "msg1"
+        assert elapsed < 1
+    
+    def test_gives_up_after_max_retries(self, stub, monkeypatch):
+        monkeypatch.setattr(settings, "GHL_MAX_RETRIES", 1)
+        stub.throttle_next = 5
+        
+        result = run(lambda c: c.send_sms("c1", "hi"), location_id="loc-c")
+        assert "error" in result
+    
+    def test_search_contacts(self, stub):
+        stub.contacts["contact1"] = {"id": "contact1", "email": "a@b.com"}
+        
+        assert run(lambda c: c.search_contacts("a@b.com"), location_id="loc-d")[0]["id"] == "contact1"
+
+
+class TestSyncWrapper:
+    def test_sync_calls_go_through_async_client(self, stub):
+        client = GHLClient()
+        try:
+            assert client.send_sms("c1", "hello")["messageId"] == "msg1"
+            assert client.create_task("c1", "t")["id"] == "task1"
+        finally:
+            client.close()
+    
+    def test_sync_usable_inside_event_loop(self, stub):
+        client = GHLClient()
+        
+        async def go():
+            return client.add_note("c1", "from async code")
+        
+        try:
+            assert asyncio.run(go())["id"] == "note1"
+        finally:
+            client.close()
+    
+    def test_mock_mode(self, monkeypatch):
+        monkeypatch.setattr(settings, "MOCK_MODE", True)
+        
+        assert GHLClient().send_sms("c1", "hi")["status"] == "ok"
@@ -0,0 +1,146 @@
+"""
+tests/test_llm_dispatch.py - llm admission control
+"""
+
+import asyncio
+
+import httpx
+import openai
+import pytest
+from integrations import llm_dispatch
+from integrations.llm_dispatch import LLMDispatcher, retryable
+
+
+def api_error(status, headers=None):
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(status, request=request, headers=headers or {})
+    cls = openai.RateLimitError if status == 429 else openai.APIStatusError
+    return cls("boom", response=response, body=None)
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    delays = []
+    monkeypatch.setattr(llm_dispatch, "backoff_delay", lambda attempt, base, cap: delays.append(attempt) or 0.001)
+    return delays
+
+
+class TestLLMDispatcher:
+    def test_concurrency_bounded(self):
+        d = LLMDispatcher(max_concurrent=3)
+        peak = {"now": 0, "max": 0}
+        
+        async def call():
+            peak["now"] += 1
+            peak["max"] = max(peak["max"], peak["now"])
+            await asyncio.sleep(0.01)
+            peak["now"] -= 1
+            return "ok"
+        
+        async def go():
+            return await asyncio.gather(*[d.submit(call) for _ in range(12)])
+        
+        assert asyncio.run(go()) == ["ok"] * 12
+        assert peak["max"] == 3
+        assert d.stats()["in_flight"] == 0
+        assert d.stats()["lanes"]["chat"]["submitted"] == 12
+    
+    def test_priority_order(self):
+        d = LLMDispatcher(max_concurrent=1)
+        order = []
+        
+        def call(name):
+            async def run():
+                order.append(name)
+                await asyncio.sleep(0.005)
+            return run
+        
+        async def go():
+            first = asyncio.create_task(d.submit(call("first"), "chat"))
+            await asyncio.sleep(0)
+            tasks = [asyncio.create_task(d.submit(call(f"{p}{i}"), p))
+                     for i, p in enumerate(["email", "chat", "email", "call"])]
+            await asyncio.sleep(0.001)
+            depth = d.queue_depth()
+            await asyncio.gather(first, *tasks)
+            return depth
+        
+        assert asyncio.run(go()) == 4
+        assert order == ["first", "call3", "chat1", "email0", "email2"]
+        assert d.stats()["lanes"]["email"]["wait_max_ms"] > d.stats()["lanes"]["call"]["wait_max_ms"]
+    
+    def test_retries_rate_limits_with_backoff(self, fast_backoff):
+        d = LLMDispatcher(max_concurrent=2, max_retries=4)
+        attempts = []
+        
+        async def call():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise api_error(429)
+            return "ok"
+        
+        assert asyncio.run(d.submit(call)) == "ok"
+        assert fast_backoff == [0, 1]
+        assert d.stats()["retries"] == 2
+    
+    def test_gives_up_and_skips_bad_requests(self):
+        d = LLMDispatcher(max_retries=2)
+        attempts = []
+        
+        async def overloaded():
+            attempts.append("503")
+            raise api_error(503)
+        
+        async def bad():
+            attempts.append("400")
+            raise api_error(400)
+        
+        with pytest.raises(openai.APIStatusError):
+            asyncio.run(d.submit(overloaded))
+        with pytest.raises(openai.APIStatusError):
+            asyncio.run(d.submit(bad))
+        assert attempts == ["503"] * 3 + ["400"]
+        assert d.stats()["failures"] == 2 and d.stats()["in_flight"] == 0
+    
+    def test_identical_prompts_coalesced(self):
+        d = LLMDispatcher()
+        calls = []
+        
+        async def call():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "answer"
+        
+        async def go():
+            same = [d.submit(call, key="k") for _ in range(5)]
+            return await asyncio.gather(*same, d.submit(call, key="other"))
+        
+        assert asyncio.run(go()) == ["answer"] * 6
+        assert len(calls) == 2
+        assert d.stats()["coalesced"] == 4
+    
+    def test_cancelled_waiter_frees_nothing(self):
+        d = LLMDispatcher(max_concurrent=1)
+        
+        async def slow():
+            await asyncio.sleep(0.02)
+            return "done"
+        
+        async def go():
+            running = asyncio.create_task(d.submit(slow))
+            await asyncio.sleep(0)
+            waiting = asyncio.create_task(d.submit(slow))
+            await asyncio.sleep(0.001)
+            waiting.cancel()
+            result = await running
+            after = await d.submit(slow)
+            return result, after
+        
+        assert asyncio.run(go()) == ("done", "done")
+        assert d.stats()["in_flight"] == 0
+    
+    def test_retryable(self):
+        assert retryable(api_error(429)) and retryable(api_error(500))
+        assert not retryable(api_error(400)) and not retryable(ValueError())
+        request = httpx.Request("POST", "https://api.openai.com")
+        assert retryable(openai.APIConnectionError(request=request))
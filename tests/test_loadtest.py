@@ -0,0 +1,90 @@
+"""
+tests/test_loadtest.py - load test traffic, stats and the regression check
+"""
+
+import json
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+from benchmarks import loadtest
+from config import settings
+from main import app
+
+
+def result(p95: float, errors: int = 0, commit: str = "abc1234") -> dict:
+    stats = loadtest.summarize([p95 / 1000] * 20, errors, 1.0)
+    return {
+        "meta": {"commit": commit, "started": "2026-01-01T00:00:00", "mode": "mock"},
+        "overall": stats,
+        "endpoints": {"chat": stats},
+    }
+
+
+class TestTraffic:
+    def test_every_endpoint_payload_is_accepted(self, monkeypatch):
+        monkeypatch.setattr(settings, "MOCK_MODE", True)
+        client = TestClient(app)
+        rng = random.Random(7)
+        for name, build in loadtest.ENDPOINTS.items():
+            for _ in range(10):
+                method, path, body = build(rng)
+                r = client.request(method, path, json=body)
+                assert r.status_code == 200, (name, body, r.text)
+    
+    def test_parse_mix(self):
+        assert loadtest.parse_mix("chat=3, sms=1") == {"chat": 3.0, "sms": 1.0}
+        assert loadtest.parse_mix("email") == {"email": 1.0}
+        with pytest.raises(ValueError):
+            loadtest.parse_mix("chat=1,fax=2")
+        with pytest.raises(ValueError):
+            loadtest.parse_mix("chat=0")
+
+
+class TestStats:
+    def test_summarize(self):
+        stats = loadtest.summarize([i / 1000 for i in range(1, 101)], errors=5, elapsed=2.0)
+        assert stats["requests"] == 105 and stats["errors"] == 5
+        assert stats["rps"] == 52.5
+        assert stats["p50_ms"] == 51.0 and stats["p99_ms"] == 100.0 and stats["max_ms"] == 100.0
+    
+    def test_summarize_nothing(self):
+        assert loadtest.summarize([], 0, 1.0)["p95_ms"] == 0.0
+    
+    def test_recorder_skips_warmup_and_counts_errors(self):
+        recorder = loadtest.Recorder()
+        recorder.add("chat", 0.01, 200)
+        recorder.recording = True
+        recorder.add("chat", 0.02, 200)
+        recorder.add("chat", 0.5, 503)
+        recorder.add("sms", None, "ConnectError")
+        report = recorder.report(1.0)
+        assert report["endpoints"]["chat"]["requests"] == 2
+        assert report["endpoints"]["chat"]["errors"] == 1
+        assert report["endpoints"]["chat"]["statuses"] == {"200": 1, "503": 1}
+        assert report["endpoints"]["sms"]["errors"] == 1
+        assert "email" not in report["endpoints"]
+        assert report["overall"]["requests"] == 3
+    
+    def test_compare_flags_p95_regressions(self, capsys):
+        assert loadtest.compare(result(10.0), result(10.5), threshold_pct=10) == []
+        assert loadtest.compare(result(10.0), result(12.0), threshold_pct=10) == ["chat"]
+        assert loadtest.compare(result(10.0), result(10.0, errors=1), threshold_pct=10) == ["chat"]
+        assert "chat" in capsys.readouterr().out
+    
+    def test_save_round_trips(self, tmp_path):
+        path = loadtest.save(result(10.0), str(tmp_path / "run.json"))
+        with open(path) as f:
+            assert json.load(f)["endpoints"]["chat"]["p95_ms"] == 10.0
+
+
+class TestRun:
+    def test_short_run_against_the_stubs(self):
+        out = loadtest.run("stubs", duration=1.0, warmup=0.2, concurrency=4,
+                           latency_ms=1, llm_latency_ms=5)
+        assert out["meta"]["mode"] == "stubs" and out["meta"]["settings"]["MOCK_MODE"] is False
+        assert out["overall"]["requests"] > 0 and out["overall"]["errors"] == 0
+        assert set(out["endpoints"]) <= set(loadtest.ENDPOINTS)
+        # the app really called the stubs, traced per route
+        assert any(key.endswith(" ghl") for key in out["server"]["route_spans"])
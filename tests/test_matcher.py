@@ -0,0 +1,72 @@
+"""
+tests/test_matcher.py - one-pass keyword matcher and intent scoring
+"""
+
+import random
+
+import pytest
+from brain.matcher import KeywordMatcher, trie_regex
+from brain.router import INTENT_KEYWORDS, Intent, detect_intent, score_intents
+from handlers.chat import QUICK_REPLIES, quick_reply_matcher
+from handlers.voice import PATIENT_KEYWORDS, PROVIDER_KEYWORDS, detect_caller_type
+from benchmarks.bench_matcher import make_corpus
+from benchmarks.reference import detect_caller_type_reference, detect_intent_reference
+
+
+class TestKeywordMatcher:
+    def test_finds_overlapping_and_nested(self):
+        m = KeywordMatcher({"a": ["need more", "more of", "new", "new patient"], "b": ["renew"]})
+        found = m.keywords("I NEED MORE OF it - renew patient")
+        assert set(found) == {"need more", "more of", "renew", "new", "new patient"}
+    
+    def test_same_as_brute_force(self):
+        rnd = random.Random(4)
+        alphabet = "abc "
+        for _ in range(200):
+            keywords = {"".join(rnd.choice(alphabet) for _ in range(rnd.randint(1, 4))) for _ in range(8)}
+            keywords = [kw for kw in keywords if kw.strip()]
+            m = KeywordMatcher({"x": keywords})
+            text = "".join(rnd.choice(alphabet) for _ in range(30))
+            assert set(m.keywords(text)) == {kw for kw in keywords if kw in text}
+    
+    def test_labels_in_table_order(self):
+        m = KeywordMatcher({"provider": ["doctor"], "patient": ["refill", "doctor"]})
+        assert list(m.matches("refill for my doctor")) == ["provider", "patient"]
+        assert m.matches("refill for my doctor")["patient"] == ["refill", "doctor"]
+        assert m.first("refill please") == "patient"
+        assert m.first("nothing here", "unknown") == "unknown"
+    
+    def test_trie_regex(self):
+        assert trie_regex(["new", "new patient", "never"]) == r"ne(?:ver|w(?:\ patient)?)"
+        assert KeywordMatcher({}).keywords("anything") == []
+
+
+class TestDetectIntent:
+    def test_scores_all_matches(self):
+        # the old loop stopped at "ready" (rx status) - refill has two keywords
+        intent, conf = detect_intent("I'm running out, is my refill ready?")
+        assert intent == Intent.REFILL_REQUEST
+        assert conf == pytest.approx(0.8)
+        scores = score_intents("I'm running out, is my refill ready?")
+        assert scores == {Intent.RX_STATUS: 0.5, Intent.REFILL_REQUEST: 1.4}
+    
+    def test_ties_go_to_table_order(self):
+        # "status" (rx) vs "refill" (refill request) - both 0.7
+        assert detect_intent("refill status")[0] == Intent.RX_STATUS
+    
+    def test_single_intent_matches_old_behaviour(self):
+        for text in make_corpus(2000):
+            hits = score_intents(text)
+            if len(hits) == 1:
+                old_intent, _ = detect_intent_reference(text, INTENT_KEYWORDS)
+                assert detect_intent(text)[0] == old_intent
+
+
+class TestHandlerTables:
+    def test_caller_type_unchanged(self):
+        for text in make_corpus(2000):
+            assert detect_caller_type(text) == detect_caller_type_reference(text, PROVIDER_KEYWORDS, PATIENT_KEYWORDS)
+    
+    def test_quick_reply_priority(self):
+        assert quick_reply_matcher.first("where's your location and hours?") == "hours"
+        assert list(QUICK_REPLIES)[0] == "hours"
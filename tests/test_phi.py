@@ -3,8 +3,11 @@ tests/test_phi.py - tests for phi module
 """
 
 import pytest
-from phi.deidentify import deidentify, quick_check
+import asyncio
+
+from phi.deidentify import deidentify, deidentify_many, deidentify_many_async, quick_check, shutdown_pool
 from phi.reidentify import reidentify, partial_reidentify
+from tests.phi_reference import deidentify_reference, make_case, partial_reidentify_reference, reidentify_reference
 
 
 class TestDeidentify:
@@ -51,6 +54,17 @@ class TestDeidentify:
         assert "John Smith" not in result.text
         assert "[NAME_1]" in result.text
     
+    def test_title_name_fully_masked(self):
+        result = deidentify("Please tell Mrs. Jane Doe it is ready")
+        
+        assert "Jane Doe" not in result.text
+        assert result.token_map["[NAME_1]"] == "Mrs. Jane Doe"
+    
+    def test_repeated_value_same_token(self):
+        result = deidentify("call 555-123-4567 or 555-123-4567, or 555-999-0000")
+        
+        assert result.text == "call [PHONE_1] or [PHONE_1], or [PHONE_3]"
+    
     def test_quick_check_positive(self):
         assert quick_check("Call 555-123-4567") == True
     
@@ -58,6 +72,57 @@ class TestDeidentify:
         assert quick_check("Hello world") == False
 
 
+class TestScannerEquivalence:
+    """single-pass scanner must match the original on non-overlapping input"""
+    
+    CASES = [
+        ("Call me at 555-123-4567 or email test@email.com", None),
+        ("RX1234567 and rx7654321 for dob 1/2/1980, ssn 123-45-6789", None),
+        ("Jane Doe (555.123.4567) wants RX1234567 refilled", {"name": "Jane Doe", "phone": "555.123.4567"}),
+        ("Hello John Smith, your 12/25/1990 record", {"name": "John Smith", "dob": None}),
+        ("a@b.co then 555-111-2222 then c@d.org then 555-333-4444", None),
+        ("nothing sensitive here", {"name": "Nobody"}),
+    ]
+    
+    @pytest.mark.parametrize("text,extra", CASES)
+    def test_matches_reference(self, text, extra):
+        new = deidentify(text, extra)
+        ref = deidentify_reference(text, extra)
+        
+        assert new.text == ref.text
+        assert new.token_map == ref.token_map
+
+
+class TestDeidentifyMany:
+    TEXTS = [f"patient {i} at 555-{i:03d}-{i:04d} wants RX{i:07d}" for i in range(40)]
+    
+    def test_inline_matches_single_calls(self):
+        results = deidentify_many(self.TEXTS[:5], {"name": "Jane Doe"})
+        
+        assert [r.text for r in results] == [deidentify(t, {"name": "Jane Doe"}).text for t in self.TEXTS[:5]]
+    
+    def test_per_text_extra_pii(self):
+        results = deidentify_many(["hi Ann", "hi Bob"], [{"name": "Ann"}, {"name": "Bob"}])
+        
+        assert results[0].token_map == {"[NAME_1]": "Ann"}
+        assert results[1].token_map == {"[NAME_1]": "Bob"}
+    
+    def test_extra_pii_length_mismatch(self):
+        with pytest.raises(ValueError):
+            deidentify_many(["a", "b"], [{"name": "Ann"}])
+    
+    def test_pool_preserves_order(self):
+        try:
+            pooled = deidentify_many(self.TEXTS, inline_max=0)
+            pooled_async = asyncio.run(deidentify_many_async(self.TEXTS, inline_max=0))
+        finally:
+            shutdown_pool()
+        
+        expected = [deidentify(t) for t in self.TEXTS]
+        assert [r.text for r in pooled] == [r.text for r in expected]
+        assert [r.token_map for r in pooled_async] == [r.token_map for r in expected]
+
+
 class TestReidentify:
     def test_reidentify_simple(self):
         token_map = {"[PHONE_1]": "555-123-4567"}
@@ -86,6 +151,28 @@ class TestReidentify:
         result = partial_reidentify(text, token_map, ["NAME"])
         assert "[NAME_1]" not in result
         assert "[PHONE_1]" in result  # phone stays masked
+    
+    def test_partial_multi_word_type(self):
+        token_map = {"[RX_NUM_1]": "RX1234567", "[PHONE_1]": "555-123-4567"}
+        
+        result = partial_reidentify("[RX_NUM_1] for [PHONE_1]", token_map, ["RX_NUM"])
+        assert result == "RX1234567 for [PHONE_1]"
+    
+    def test_double_digit_tokens(self):
+        token_map = {f"[NAME_{i}]": f"person{i}" for i in range(1, 21)}
+        
+        assert reidentify("[NAME_1] and [NAME_10] and [NAME_20]", token_map) == "person1 and person10 and person20"
+    
+    def test_unknown_tokens_left_alone(self):
+        assert reidentify("hi [NAME_2] [note]", {"[NAME_1]": "John"}) == "hi [NAME_2] [note]"
+    
+    @pytest.mark.parametrize("n_tokens,size", [(3, 200), (12, 2_000), (60, 8_000)])
+    def test_matches_reference(self, n_tokens, size):
+        text, token_map = make_case(n_tokens, size)
+        
+        assert reidentify(text, token_map) == reidentify_reference(text, token_map)
+        assert partial_reidentify(text, token_map, ["NAME", "EMAIL"]) == \
+            partial_reidentify_reference(text, token_map, ["NAME", "EMAIL"])
 
 
 class TestRoundTrip:
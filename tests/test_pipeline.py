@@ -0,0 +1,136 @@
+"""
+tests/test_pipeline.py - dependency-aware step runner and email triage
+"""
+
+import asyncio
+import time
+
+import pytest
+from config import settings
+from brain.pipeline import Pipeline
+from handlers import email as email_handler
+from handlers.email import EmailPayload
+
+
+def sleeper(value, delay=0.05, log=None):
+    async def step(*args):
+        if log is not None:
+            log.append(("start", value, args))
+        await asyncio.sleep(delay)
+        return value
+    return step
+
+
+class TestPipeline:
+    def test_independent_steps_overlap(self):
+        p = Pipeline().step("a", sleeper(1)).step("b", sleeper(2)).step("c", sleeper(3))
+        start = time.perf_counter()
+        results = asyncio.run(p.run())
+        assert results == {"a": 1, "b": 2, "c": 3}
+        assert time.perf_counter() - start < 0.12
+    
+    def test_deps_get_results_in_order(self):
+        log = []
+        p = (Pipeline()
+             .step("a", sleeper("A", 0.02))
+             .step("b", sleeper("B", 0.04))
+             .step("c", sleeper("C", 0.01, log), "b", "a"))
+        asyncio.run(p.run())
+        assert log == [("start", "C", ("B", "A"))]
+        assert p.started["c"] >= 40
+        assert set(p.report()["steps_ms"]) == {"a", "b", "c"}
+    
+    def test_unknown_or_duplicate_steps(self):
+        p = Pipeline().step("a", sleeper(1))
+        with pytest.raises(ValueError):
+            p.step("b", sleeper(2), "missing")
+        with pytest.raises(ValueError):
+            p.step("a", sleeper(2))
+    
+    def test_failure_cancels_the_rest(self):
+        finished = []
+        
+        async def boom():
+            raise RuntimeError("nope")
+        
+        async def slow():
+            await asyncio.sleep(1)
+            finished.append(True)
+        
+        p = Pipeline().step("boom", boom).step("slow", slow).step("after", sleeper(1), "boom")
+        start = time.perf_counter()
+        with pytest.raises(RuntimeError):
+            asyncio.run(p.run())
+        assert not finished and time.perf_counter() - start < 0.5
+
+
+class FakeGHL:
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.calls = []
+    
+    async def call(self, name, result):
+        self.calls.append(name)
+        await asyncio.sleep(self.delay)
+        return result
+    
+    async def search_contacts(self, query):
+        return await self.call("search", [{"id": "c1"}])
+    
+    async def create_task(self, contact_id, title):
+        return await self.call("task", {"id": "t1"})
+    
+    async def add_note(self, contact_id, body):
+        return await self.call("note", {"id": "n1"})
+
+
+@pytest.fixture
+def triage(monkeypatch):
+    ghl = FakeGHL()
+    
+    async def fake_llm(text):
+        await asyncio.sleep(0.05)
+        return {"intent": "refill_request", "confidence": 0.9, "priority": "medium", "summary": "refill"}
+    
+    async def fake_draft(email, intent, safe_body):
+        await asyncio.sleep(0.05)
+        return "draft"
+    
+    monkeypatch.setattr(email_handler, "async_ghl", ghl)
+    monkeypatch.setattr(email_handler, "email_classifier", lambda: None)
+    monkeypatch.setattr(email_handler, "classify_with_llm", fake_llm)
+    monkeypatch.setattr(email_handler, "generate_draft_response", fake_draft)
+    monkeypatch.setattr(email_handler, "log_action", lambda *args: None)
+    
+    def run():
+        payload = EmailPayload(from_email="pat@example.com", subject="refill", body="need a refill")
+        return asyncio.run(email_handler.triage_email(payload))
+    
+    return run, ghl
+
+
+class TestTriagePipeline:
+    def test_result_and_concurrency(self, triage, monkeypatch):
+        monkeypatch.setattr(settings, "DEBUG", False)
+        run, ghl = triage
+        start = time.perf_counter()
+        result = run()
+        elapsed = time.perf_counter() - start
+        
+        assert result.intent == "refill_request"
+        assert result.contact_id == "c1"
+        assert result.tasks_created == ["t1"]
+        assert result.draft_response == "draft"
+        assert result.metadata is None
+        assert sorted(ghl.calls) == ["note", "search", "task"]
+        # classify + search together, then draft + task + note together
+        assert elapsed < 0.2
+    
+    def test_debug_timings(self, triage, monkeypatch):
+        monkeypatch.setattr(settings, "DEBUG", True)
+        run, _ = triage
+        timings = run().metadata["timings"]
+        assert set(timings["steps_ms"]) == {"classify", "contact", "draft", "task", "note"}
+        assert timings["started_ms"]["contact"] < 20
+        assert timings["started_ms"]["task"] >= 40
+        assert timings["total_ms"] >= 100
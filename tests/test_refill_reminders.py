@@ -0,0 +1,83 @@
+"""
+tests/test_refill_reminders.py - reminder planning against the airtable stub
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from config import settings
+from automations import refill_reminders
+from automations.refill_reminders import plan_reminders, reminders_formula
+from integrations.airtable import AirtableClient
+from tests.stubs import AirtableStub, StubServer, match_formula
+
+
+TODAY = datetime(2024, 3, 30)
+
+
+def fill_date(days):
+    return (TODAY - timedelta(days=days)).strftime("%Y-%m-%d")
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    data = AirtableStub()
+    with StubServer(data) as server:
+        monkeypatch.setattr(settings, "MOCK_MODE", False)
+        monkeypatch.setattr(settings, "AIRTABLE_BASE_URL", f"{server.url}/v0")
+        monkeypatch.setattr(settings, "AIRTABLE_BASE_ID", "appTest")
+        monkeypatch.setattr(settings, "AIRTABLE_API_KEY", "keyTest")
+        monkeypatch.setattr(refill_reminders, "airtable", AirtableClient())
+        data.server = server
+        yield data
+
+
+def add_rx(stub, patient_id, med, days, supply=30, compound=True):
+    stub.add("Prescriptions", {
+        "PatientId": patient_id, "MedicationName": med, "FillDate": fill_date(days),
+        "DaysSupply": supply, "IsCompound": compound,
+    })
+
+
+class TestPlanReminders:
+    def test_windows_and_join(self, stub):
+        p1 = stub.add("Patients", {"GHLContactId": "c1"})["id"]
+        p2 = stub.add("Patients", {"GHLContactId": "c2"})["id"]
+        p3 = stub.add("Patients", {})["id"]  # no ghl contact yet
+        add_rx(stub, p1, "Semaglutide", 35)
+        add_rx(stub, p1, "B12", 21)
+        add_rx(stub, p2, "Tirzepatide", 26)
+        add_rx(stub, p3, "NAD+", 21)
+        add_rx(stub, p2, "Not due", 22)
+        add_rx(stub, p2, "Not compound", 21, compound=False)
+        add_rx(stub, p2, "Ninety day", 21, supply=90)
+        add_rx(stub, "recGone", "Orphan", 21)
+        
+        plan = plan_reminders(TODAY)
+        
+        got = [(r.patient_id, r.contact_id, r.medication, r.reminder_type) for r in plan.reminders]
+        assert got == [
+            (p1, "c1", "B12", "day21"),
+            (p2, "c2", "Tirzepatide", "day26"),
+            (p1, "c1", "Semaglutide", "day35"),
+        ]
+        assert plan.prescriptions == 5
+    
+    def test_calls_scale_with_pages_not_prescriptions(self, stub):
+        patients = [stub.add("Patients", {"GHLContactId": f"c{i}"})["id"] for i in range(40)]
+        for i in range(150):
+            add_rx(stub, patients[i % 40], f"med{i}", (21, 26, 35)[i % 3])
+        
+        plan = plan_reminders(TODAY)
+        
+        assert len(plan.reminders) == 150
+        # 2 prescription pages + 1 patient lookup (the old loop made 3 + 150)
+        assert plan.upstream_calls == 3
+        assert len(stub.server.requests) == 3
+    
+    def test_formula_covers_all_windows(self):
+        formula = reminders_formula([fill_date(21), fill_date(26)])
+        record = {"id": "rec1", "fields": {"DaysSupply": 30, "IsCompound": True, "FillDate": fill_date(26)}}
+        assert match_formula(formula, record)
+        record["fields"]["FillDate"] = fill_date(35)
+        assert not match_formula(formula, record)
@@ -0,0 +1,207 @@
+"""
+tests/test_semantic_cache.py - semantic answer cache with a fake embedder
+"""
+
+import asyncio
+import re
+import zlib
+
+import numpy as np
+import pytest
+from config import settings
+from brain import reasoning, semantic_cache as semantic
+from brain.reasoning import ReasoningEngine
+from brain.semantic_cache import SemanticCache
+from handlers.email import EmailPayload, generate_draft_response
+
+
+DIM = 64
+
+
+async def fake_embed(text):
+    """deterministic bag of words - shared words mean similar vectors"""
+    vector = [0.0] * DIM
+    for word in re.findall(r"[a-z]+", text.lower()):
+        vector[zlib.crc32(word.encode()) % DIM] += 1.0
+    return vector
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return SemanticCache(embedder=fake_embed, directory=str(tmp_path), threshold=0.9)
+
+
+def remember(cache, question, answer, context="chat"):
+    async def go():
+        hit, vector = await cache.lookup(question, context)
+        assert hit is None
+        return cache.store(context, vector, question, answer)
+    return asyncio.run(go())
+
+
+def lookup(cache, question, context="chat"):
+    return asyncio.run(cache.lookup(question, context))[0]
+
+
+class TestSemanticCache:
+    def test_similar_question_hits(self, cache):
+        remember(cache, "what are your hours on saturday", "9 to 1 on saturdays")
+        
+        assert lookup(cache, "What are your hours on Saturday?") == "9 to 1 on saturdays"
+        assert lookup(cache, "do you compound semaglutide") is None
+        assert cache.stats()["hits"] == 1
+    
+    def test_contexts_are_separate(self, cache):
+        remember(cache, "what are your hours", "9 to 6", context="chat")
+        assert lookup(cache, "what are your hours", context="email") is None
+    
+    def test_reloads_from_memmap(self, cache, tmp_path):
+        remember(cache, "where are you located", "123 main st")
+        
+        fresh = SemanticCache(embedder=fake_embed, directory=str(tmp_path), threshold=0.9)
+        assert lookup(fresh, "where are you located") == "123 main st"
+        assert isinstance(fresh.index("chat").matrix, np.memmap)
+    
+    def test_grows_past_initial_capacity(self, cache, monkeypatch):
+        monkeypatch.setattr(semantic, "INITIAL_CAPACITY", 4)
+        for i in range(10):
+            remember(cache, f"question number {'x' * (i + 1)} about {chr(97 + i) * 3}", f"answer {i}")
+        
+        index = cache.index("chat")
+        assert index.size == 10 and index.matrix.shape[0] >= 10
+        assert lookup(cache, "question number xxx about ccc") == "answer 2"
+    
+    def test_phi_never_stored(self, cache):
+        assert not remember(cache, "call me at 555-123-4567", "sure")
+        assert not remember(cache, "what is my refill status", "your doctor emailed bob@example.com")
+        assert cache.index("chat").size == 0
+        assert cache.stats()["skipped_phi"] == 2
+        assert not cache.cacheable("refill for [NAME_1]", {"[NAME_1]": "Jane"})
+    
+    def test_tokens_and_untitled_names_not_cacheable(self, cache):
+        # already de-identified upstream, so the token map is empty
+        assert not cache.cacheable("Hi [NAME_1], your [RX_NUM_1] is ready", {})
+        assert not cache.cacheable("this is jane, is my cream ready")
+        assert not cache.cacheable("my name is Jane Doe.")
+        assert cache.cacheable("what are your weekday hours")
+        # a generic question with a personal answer isn't kept either
+        assert not remember(cache, "is my cream ready", "Hi Jane, your cream is ready")
+        assert cache.index("chat").size == 0
+
+
+class TestReasoningEngine:
+    def test_process_uses_cache(self, cache, monkeypatch):
+        calls = []
+        
+        async def completion(messages, **kwargs):
+            calls.append(messages)
+            return "We're open 9 to 6 on weekdays."
+        
+        monkeypatch.setattr(settings, "SEMANTIC_CACHE_ENABLED", True)
+        monkeypatch.setattr(semantic, "semantic_cache", cache)
+        monkeypatch.setattr(reasoning, "get_completion", completion)
+        engine = ReasoningEngine("chat")
+        
+        first = asyncio.run(engine.process("what are your weekday hours"))
+        second = asyncio.run(engine.process("What are your weekday hours?"))
+        
+        assert len(calls) == 1
+        assert not first["cached"] and second["cached"]
+        assert second["response"] == first["response"]
+    
+    def test_phi_questions_skip_cache(self, cache, monkeypatch):
+        calls = []
+        
+        async def completion(messages, **kwargs):
+            calls.append(messages)
+            return "Hi [NAME_1], your refill is ready."
+        
+        monkeypatch.setattr(settings, "SEMANTIC_CACHE_ENABLED", True)
+        monkeypatch.setattr(semantic, "semantic_cache", cache)
+        monkeypatch.setattr(reasoning, "get_completion", completion)
+        engine = ReasoningEngine("chat")
+        
+        for name in ("Jane Doe", "John Roe"):
+            result = asyncio.run(engine.process(f"I'm {name}, is my refill ready", {"name": name}))
+            assert result["response"] == f"Hi {name}, your refill is ready."
+        
+        assert len(calls) == 2
+        assert cache.stats()["hits"] + cache.stats()["misses"] == 0
+    
+    
+    def test_untitled_name_skips_cache(self, cache, monkeypatch):
+        calls = []
+        
+        async def completion(messages, **kwargs):
+            calls.append(messages)
+            return "Your cream is ready for pickup."
+        
+        monkeypatch.setattr(settings, "SEMANTIC_CACHE_ENABLED", True)
+        monkeypatch.setattr(semantic, "semantic_cache", cache)
+        monkeypatch.setattr(reasoning, "get_completion", completion)
+        engine = ReasoningEngine("chat")
+        
+        for name in ("jane", "mary"):
+            assert not asyncio.run(engine.process(f"this is {name}, is my cream ready"))["cached"]
+        asyncio.run(engine.process("is my cream ready", {"name": "Jane Doe"}))
+        
+        assert len(calls) == 3
+        assert cache.index("chat").size == 0
+    
+    def test_email_drafts_never_cached(self, cache, monkeypatch):
+        calls = []
+        
+        async def completion(messages, **kwargs):
+            calls.append(messages)
+            return "We'll have your estradiol cream ready tomorrow."
+        
+        monkeypatch.setattr(settings, "SEMANTIC_CACHE_ENABLED", True)
+        monkeypatch.setattr(semantic, "semantic_cache", cache)
+        monkeypatch.setattr(reasoning, "get_completion", completion)
+        email = EmailPayload(from_email="x@example.com", subject="refill", body="")
+        body = "Hi, this is [NAME_1]. Can I get a refill of my estradiol cream? [RX_NUM_1]"
+        
+        for _ in range(2):
+            asyncio.run(generate_draft_response(email, "refill_request", body))
+        
+        assert len(calls) == 2
+        assert cache.stats()["hits"] + cache.stats()["misses"] == 0
+        assert cache.index("email").size == 0
+
+
+class TestSharedIndex:
+    def test_two_writers_keep_rows_aligned(self, tmp_path):
+        # like two prefork workers with the same directory
+        a = SemanticCache(embedder=fake_embed, directory=str(tmp_path), threshold=0.9)
+        b = SemanticCache(embedder=fake_embed, directory=str(tmp_path), threshold=0.9)
+        lookup(a, "warm up")
+        lookup(b, "warm up")
+        remember(a, "what are your hours", "9 to 6")
+        b.store("chat", asyncio.run(b.lookup("is there parking", "chat"))[1], "is there parking", "out back")
+        
+        fresh = SemanticCache(embedder=fake_embed, directory=str(tmp_path), threshold=0.9)
+        for cache in (a, b, fresh):
+            assert lookup(cache, "what are your hours") == "9 to 6"
+            assert lookup(cache, "is there parking") == "out back"
+        assert fresh.index("chat").size == 2
+    
+    def test_writer_sees_regrown_matrix(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(semantic, "INITIAL_CAPACITY", 2)
+        a = SemanticCache(embedder=fake_embed, directory=str(tmp_path), threshold=0.9)
+        b = SemanticCache(embedder=fake_embed, directory=str(tmp_path), threshold=0.9)
+        for i, cache in enumerate([a, b, a, b, b, a]):
+            question = f"question {'x' * (i + 1)} about {chr(97 + i) * 3}"
+            cache.store("chat", asyncio.run(cache.lookup(question, "chat"))[1], question, f"answer {i}")
+        for cache in (a, b):
+            assert lookup(cache, "question xxxx about ddd") == "answer 3"
+    
+    def test_torn_tail_is_dropped_on_next_write(self, tmp_path):
+        cache = SemanticCache(embedder=fake_embed, directory=str(tmp_path), threshold=0.9)
+        remember(cache, "what are your hours", "9 to 6")
+        with open(tmp_path / "chat" / "entries.jsonl", "a") as f:
+            f.write('{"question": "half wri')
+        other = SemanticCache(embedder=fake_embed, directory=str(tmp_path), threshold=0.9)
+        remember(other, "is there parking", "out back")
+        fresh = SemanticCache(embedder=fake_embed, directory=str(tmp_path), threshold=0.9)
+        assert lookup(fresh, "is there parking") == "out back"
+        assert fresh.index("chat").size == 2
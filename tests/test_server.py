@@ -0,0 +1,149 @@
+"""
+tests/test_server.py - production launcher, health and shutdown drain
+"""
+
+import asyncio
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import pytest
+from fastapi.testclient import TestClient
+from config import settings
+from automations.sms_queue import SMSDispatcher, drain_dispatchers
+from main import app
+from server import worker_state
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def get_health(port):
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=2) as r:
+            return json.loads(r.read())
+    except OSError:
+        return None
+
+
+class TestHealth:
+    def test_ready_after_startup(self):
+        with TestClient(app) as client:
+            r = client.get("/health")
+            assert r.status_code == 200
+            body = r.json()
+            assert body["status"] == "ok" and body["ready"] is True
+            assert body["worker_id"] == 0 and body["pid"] == os.getpid()
+        assert worker_state.draining
+    
+    def test_not_ready_is_503(self, monkeypatch):
+        monkeypatch.setattr(worker_state, "ready", False)
+        monkeypatch.setattr(worker_state, "draining", True)
+        r = TestClient(app).get("/health")
+        assert r.status_code == 503 and r.json()["status"] == "draining"
+
+
+class SlowClient:
+    def __init__(self):
+        self.sent = []
+    
+    async def send_sms(self, contact_id, message):
+        await asyncio.sleep(0.01)
+        self.sent.append(contact_id)
+        return {"id": "m1"}
+
+
+class TestDrain:
+    def test_drains_queued_sms(self, tmp_path):
+        client = SlowClient()
+        
+        async def go():
+            d = SMSDispatcher(client=client, workers=2, rate_per_second=1000,
+                              per_contact_interval=0, log_dir=str(tmp_path))
+            for i in range(10):
+                await d.enqueue(f"c{i}", "hi", f"k{i}")
+            assert await drain_dispatchers(5) == 1
+            assert await drain_dispatchers(5) == 0
+        
+        asyncio.run(go())
+        assert len(client.sent) == 10
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+class TestLauncher:
+    def test_workers_restart_and_drain(self, tmp_path):
+        port = free_port()
+        env = dict(os.environ, MOCK_MODE="true", SERVER_GRACEFUL_TIMEOUT="5",
+                   INTAKE_SESSION_PATH=str(tmp_path / "sessions.db"))
+        proc = subprocess.Popen(
+            [sys.executable, "main.py", "--workers", "2", "--host", "127.0.0.1", "--port", str(port)],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            seen = {}
+            deadline = time.monotonic() + 30
+            while len(seen) < 2 and time.monotonic() < deadline:
+                body = get_health(port)
+                if body:
+                    assert body["preloaded"] and body["workers"] == 2
+                    seen[body["worker_id"]] = body["pid"]
+                else:
+                    time.sleep(0.2)
+            assert set(seen) == {1, 2}
+            
+            # a dead worker comes back with the same id
+            os.kill(seen[1], signal.SIGKILL)
+            deadline = time.monotonic() + 15
+            replaced = None
+            while replaced is None and time.monotonic() < deadline:
+                body = get_health(port)
+                if body and body["worker_id"] == 1 and body["pid"] != seen[1]:
+                    replaced = body["pid"]
+                time.sleep(0.05)
+            assert replaced
+            
+            proc.send_signal(signal.SIGTERM)
+            assert proc.wait(timeout=20) == 0
+            for pid in (seen[2], replaced):
+                with pytest.raises(OSError):
+                    os.kill(pid, 0)
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+
+
+class TestStartup:
+    def test_heavy_modules_load_on_first_use(self):
+        script = (
+            "import sys, main; "
+            "print(','.join(m for m in ('openai', 'requests', 'numpy', 'httpx') if m in sys.modules))"
+        )
+        out = subprocess.run([sys.executable, "-W", "ignore", "-c", script], cwd=ROOT,
+                             capture_output=True, text=True, env=dict(os.environ, MOCK_MODE="true"))
+        assert out.returncode == 0 and out.stdout.strip() == ""
+    
+    def test_mock_completions_never_build_a_client(self, monkeypatch):
+        from integrations import openai_client
+        monkeypatch.setattr(openai_client, "client", None)
+        monkeypatch.setattr(settings, "MOCK_MODE", True)
+        asyncio.run(openai_client.get_completion([{"role": "user", "content": "hi"}], cache=False))
+        assert openai_client.client is None
+    
+    def test_import_times(self):
+        from server import import_times
+        rows = import_times("config")
+        names = [r[0] for r in rows]
+        assert "config" in names
+        name, self_ms, cumulative, depth = rows[names.index("config")]
+        assert depth == 0 and cumulative >= self_ms >= 0
@@ -0,0 +1,198 @@
+"""
+tests/test_sessions.py - intake session stores and the intake flow on top
+"""
+
+import multiprocessing
+import os
+import time
+
+import pytest
+from automations import intake
+from automations.sessions import (
+    IntakeSession, IntakeStep, MemorySessionStore, SQLiteSessionStore, SessionStore, build_session_store,
+)
+
+
+def make(i, step=IntakeStep.STARTED):
+    return IntakeSession(f"s{i}", f"c{i}", step, {"initial_query": "hi"})
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+
+class TestIntakeSession:
+    def test_slots(self):
+        session = make(1)
+        assert not hasattr(session, "__dict__")
+        with pytest.raises(AttributeError):
+            session.extra = 1
+        assert session == make(1) and session != make(2)
+
+
+class TestMemorySessionStore:
+    def test_put_get_delete(self):
+        store = MemorySessionStore(ttl=60)
+        store.put(make(1))
+        assert store.get("c1") == make(1)
+        assert "c1" in store and "c2" not in store
+        assert store.delete("c1") and not store.delete("c1")
+        assert len(store) == 0
+    
+    def test_expiry_and_refresh(self):
+        clock = FakeClock()
+        store = MemorySessionStore(ttl=60, sweep_interval=3600, clock=clock)
+        store.put(make(1))
+        store.put(make(2))
+        clock.now += 50
+        store.put(store.get("c1"))  # a reply refreshes the ttl
+        clock.now += 20
+        assert store.get("c2") is None
+        assert store.get("c1") is not None
+        assert store.expired == 1
+    
+    def test_sweep_stops_at_first_live_session(self):
+        clock = FakeClock()
+        store = MemorySessionStore(ttl=60, sweep_interval=3600, clock=clock)
+        for i in range(5):
+            store.put(make(i))
+            clock.now += 10
+        clock.now += 35  # first three are past 60s
+        assert store.sweep() == 3
+        assert len(store) == 2
+    
+    def test_puts_sweep_on_interval(self):
+        clock = FakeClock()
+        store = MemorySessionStore(ttl=10, sweep_interval=30, clock=clock)
+        for i in range(3):
+            store.put(make(i))
+        clock.now += 31
+        store.put(make(9))
+        assert len(store) == 1
+
+
+def fork_worker(path, wid):
+    store = SQLiteSessionStore(path)
+    for i in range(wid * 50, (wid + 1) * 50):
+        store.put(make(i))
+    store.close()
+
+
+@pytest.fixture
+def sqlite_store(tmp_path):
+    stores = []
+    
+    def make_store(**kwargs):
+        stores.append(SQLiteSessionStore(str(tmp_path / "sessions.db"), **kwargs))
+        return stores[-1]
+    
+    yield make_store
+    # left to the gc, closing checkpoints the wal in the middle of some later test
+    for store in stores:
+        store.close()
+
+
+class TestSQLiteSessionStore:
+    def test_roundtrip_and_restart(self, sqlite_store):
+        store = sqlite_store(ttl=60)
+        session = make(1, IntakeStep.DOB_COLLECTED)
+        session.data["name"] = "Jane Doe"
+        store.put(session)
+        store.close()
+        
+        reopened = sqlite_store(ttl=60)
+        assert reopened.get("c1") == session
+        assert reopened.get("c1").current_step is IntakeStep.DOB_COLLECTED
+        assert reopened.delete("c1") and reopened.get("c1") is None
+    
+    def test_expiry(self, sqlite_store):
+        store = sqlite_store(ttl=0.2, sweep_interval=3600)
+        store.put(make(1))
+        assert len(store) == 1
+        time.sleep(0.25)
+        assert store.get("c1") is None and len(store) == 0
+        assert store.sweep() == 1
+    
+    @pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+    def test_shared_across_processes(self, sqlite_store):
+        store = sqlite_store()
+        path = store.path
+        store.put(make(999))  # parent connection is open before the fork
+        ctx = multiprocessing.get_context("fork")
+        procs = [ctx.Process(target=fork_worker, args=(path, w)) for w in range(3)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        assert all(p.exitcode == 0 for p in procs)
+        assert len(store) == 151
+        assert store.get("c120") == make(120)
+    
+    def test_build(self):
+        assert isinstance(build_session_store("memory"), MemorySessionStore)
+        assert isinstance(build_session_store("sqlite"), SQLiteSessionStore)
+        with pytest.raises(ValueError):
+            build_session_store("redis")
+    
+    def test_backends_must_implement_everything(self):
+        class GetOnly(SessionStore):
+            def get(self, contact_id):
+                return None
+        
+        with pytest.raises(TypeError):
+            SessionStore()
+        with pytest.raises(TypeError):
+            GetOnly()
+
+
+class FakeRecords:
+    def __init__(self):
+        self.calls = []
+    
+    def __getattr__(self, name):
+        def call(*args):
+            self.calls.append((name, args))
+            return {"id": "rec1"}
+        return call
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def flow(request, monkeypatch, tmp_path):
+    if request.param == "memory":
+        store = MemorySessionStore(ttl=60)
+    else:
+        store = SQLiteSessionStore(str(tmp_path / "sessions.db"), ttl=60)
+    records = FakeRecords()
+    monkeypatch.setattr(intake, "session_store", store)
+    monkeypatch.setattr(intake, "airtable", records)
+    monkeypatch.setattr(intake, "ghl", records)
+    monkeypatch.setattr(intake, "log_action", lambda *args: None)
+    yield store, records
+    store.close()
+
+
+class TestIntakeFlow:
+    def test_full_flow(self, flow):
+        store, records = flow
+        assert "full name" in intake.process_intake_response("c1", "I want a compound")
+        assert intake.is_intake_active("c1")
+        assert "Thanks Jane" in intake.process_intake_response("c1", "Jane Doe")
+        assert "prescribing doctor" in intake.process_intake_response("c1", "01/02/1980")
+        assert store.get("c1").data["dob"] == "01/02/1980"
+        assert "doctor's name" in intake.process_intake_response("c1", "yes")
+        assert "Thanks Jane" in intake.process_intake_response("c1", "Dr. Smith at City Clinic")
+        
+        assert not intake.is_intake_active("c1")
+        created = [args for name, args in records.calls if name == "create_record"]
+        assert created[0][1]["ProviderName"] == "Dr. Smith at City Clinic"
+    
+    def test_cancel(self, flow):
+        store, _ = flow
+        intake.start_intake("c2", "hi")
+        intake.cancel_intake("c2")
+        assert "c2" not in store
+        intake.cancel_intake("c2")  # no-op
@@ -0,0 +1,260 @@
+"""
+tests/test_sms_queue.py - outbound sms dispatcher
+"""
+
+import asyncio
+import json
+import time
+
+import pytest
+from config import settings
+from automations import refill_reminders, sms_queue
+from automations.refill_reminders import ReminderPlan, RefillReminder, reminder_key
+from automations.sms_queue import SentKeys, SMSDispatcher
+from integrations.ghl import AsyncGHLClient
+from tests.stubs import GHLStub, StubServer
+
+
+class FakeSMS:
+    """records sends, fails the first `fail_first` attempts per contact"""
+    
+    def __init__(self, fail_first: int = 0, latency: float = 0.0):
+        self.fail_first = fail_first
+        self.latency = latency
+        self.sent = []
+        self.attempts = {}
+        self.times = {}
+    
+    async def send_sms(self, contact_id, message):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        n = self.attempts[contact_id] = self.attempts.get(contact_id, 0) + 1
+        self.times.setdefault(contact_id, []).append(time.monotonic())
+        if n <= self.fail_first:
+            return {"error": "boom"}
+        self.sent.append((contact_id, message))
+        return {"messageId": f"msg{len(self.sent)}"}
+
+
+def dispatcher(client, tmp_path, **kwargs):
+    kwargs.setdefault("rate_per_second", 1000)
+    kwargs.setdefault("per_contact_interval", 0)
+    return SMSDispatcher(client=client, log_dir=str(tmp_path), **kwargs)
+
+
+class TestSMSDispatcher:
+    def test_sends_everything_concurrently(self, tmp_path):
+        client = FakeSMS(latency=0.05)
+        
+        async def go():
+            d = dispatcher(client, tmp_path, workers=10)
+            start = time.monotonic()
+            futures = [await d.enqueue(f"c{i}", "hi", f"k{i}") for i in range(20)]
+            results = await asyncio.gather(*futures)
+            await d.stop()
+            return results, time.monotonic() - start, d
+        
+        results, elapsed, d = asyncio.run(go())
+        assert all(results)
+        assert len(client.sent) == 20
+        assert elapsed < 0.5  # 20 x 50ms serially would be 1s
+        assert d.stats["sent"] == 20
+        assert d.latency_percentiles()["p50"] > 0
+    
+    def test_idempotency_survives_restart(self, tmp_path):
+        client = FakeSMS()
+        
+        async def go():
+            d = dispatcher(client, tmp_path)
+            first = await d.enqueue("c1", "hi", "refill:p1:2024-01-01")
+            again = await d.enqueue("c1", "hi", "refill:p1:2024-01-01")
+            await first
+            await d.stop()
+            
+            # fresh dispatcher reads the sent keys back from disk
+            d2 = dispatcher(client, tmp_path)
+            rerun = await d2.enqueue("c1", "hi", "refill:p1:2024-01-01")
+            await d2.stop()
+            return again, rerun, d2
+        
+        again, rerun, d2 = asyncio.run(go())
+        assert again is None and rerun is None
+        assert len(client.sent) == 1
+        assert d2.stats["duplicates"] == 1
+    
+    def test_old_sent_keys_compacted(self, tmp_path):
+        path = tmp_path / "sms_sent_keys.jsonl"
+        old = time.time() - 40 * 86400
+        path.write_text(
+            "".join(json.dumps({"key": f"refill:p{i}:2024-01-01", "ts": old}) + "\n" for i in range(50))
+            + json.dumps({"key": "refill:p1:2026-10-17", "ts": time.time()}) + "\n"
+            + "not json\n"
+        )
+        
+        keys = SentKeys(str(path), retention_days=30)
+        
+        assert len(keys) == 1 and "refill:p1:2026-10-17" in keys
+        assert "refill:p1:2024-01-01" not in keys
+        assert len(path.read_text().splitlines()) == 1
+        keys.add("refill:p2:2026-10-17")
+        assert len(SentKeys(str(path), retention_days=30)) == 2
+    
+    def test_retries_then_succeeds(self, tmp_path, monkeypatch):
+        monkeypatch.setattr("automations.sms_queue.backoff_delay", lambda attempt: 0.01)
+        client = FakeSMS(fail_first=2)
+        
+        async def go():
+            d = dispatcher(client, tmp_path, max_retries=3)
+            ok = await (await d.enqueue("c1", "hi", "k1"))
+            await d.stop()
+            return ok, d
+        
+        ok, d = asyncio.run(go())
+        assert ok
+        assert client.attempts["c1"] == 3
+        assert d.stats["retried"] == 2
+    
+    def test_dead_letter_after_max_retries(self, tmp_path, monkeypatch):
+        monkeypatch.setattr("automations.sms_queue.backoff_delay", lambda attempt: 0.01)
+        client = FakeSMS(fail_first=10)
+        
+        async def go():
+            d = dispatcher(client, tmp_path, max_retries=2)
+            future = await d.enqueue("c1", "hi", "k1")
+            await d.join()
+            # failed keys can be queued again later
+            retry = await d.enqueue("c1", "hi", "k1")
+            await d.stop()
+            return await future, retry, d
+        
+        ok, retry, d = asyncio.run(go())
+        assert not ok and retry is not None
+        assert client.attempts["c1"] == 6
+        lines = (tmp_path / "sms_dead_letter.jsonl").read_text().splitlines()
+        entry = json.loads(lines[0])
+        assert entry["key"] == "k1" and entry["attempts"] == 3 and entry["error"] == "boom"
+        assert "message" not in entry  # phi stays out of the log
+    
+    def test_on_sent_failure_keeps_worker_alive(self, tmp_path):
+        client = FakeSMS()
+        
+        def broken():
+            raise OSError("disk full")
+        
+        async def go():
+            d = dispatcher(client, tmp_path, workers=1)
+            first = await d.enqueue("c1", "hi", "k1", on_sent=broken)
+            second = await d.enqueue("c2", "hi", "k2", on_sent=broken)
+            results = await asyncio.wait_for(asyncio.gather(first, second), 2)
+            await d.stop()
+            return results, d
+        
+        results, d = asyncio.run(go())
+        assert results == [True, True]
+        assert len(client.sent) == 2 and not d._pending
+    
+    def test_dead_letter_failure_still_resolves(self, tmp_path, monkeypatch):
+        client = FakeSMS(fail_first=10)
+        d = dispatcher(client, tmp_path, workers=1, max_retries=0)
+        d.dead_letter_path = str(tmp_path)  # a directory - the write fails
+        
+        async def go():
+            first = await d.enqueue("c1", "hi", "k1")
+            second = await d.enqueue("c2", "hi", "k2")
+            results = await asyncio.wait_for(asyncio.gather(first, second), 2)
+            await d.stop()
+            return results
+        
+        assert asyncio.run(go()) == [False, False]
+        assert not d._pending
+    
+    def test_per_contact_interval(self, tmp_path):
+        client = FakeSMS()
+        
+        async def go():
+            d = dispatcher(client, tmp_path, workers=4, per_contact_interval=0.1)
+            futures = [await d.enqueue("same", f"m{i}", f"k{i}") for i in range(3)]
+            futures.append(await d.enqueue("other", "m", "k-other"))
+            await asyncio.gather(*futures)
+            await d.stop()
+        
+        asyncio.run(go())
+        times = client.times["same"]
+        gaps = [b - a for a, b in zip(times, times[1:])]
+        assert all(g >= 0.09 for g in gaps)
+        # other contacts aren't held up
+        assert client.times["other"][0] - times[0] < 0.05
+    
+    def test_against_ghl_stub(self, tmp_path, monkeypatch):
+        data = GHLStub()
+        with StubServer(data) as server:
+            monkeypatch.setattr(settings, "MOCK_MODE", False)
+            monkeypatch.setattr(settings, "GHL_BASE_URL", f"{server.url}/v1")
+            monkeypatch.setattr(settings, "GHL_API_KEY", "test-key")
+            data.throttle_next = 1
+            
+            async def go():
+                client = AsyncGHLClient()
+                d = dispatcher(client, tmp_path)
+                futures = [await d.enqueue(f"c{i}", "hi", f"k{i}") for i in range(5)]
+                results = await asyncio.gather(*futures)
+                await d.stop()
+                await client.aclose()
+                return results
+            
+            assert all(asyncio.run(go()))
+        assert sorted(m["contactId"] for m in data.messages) == [f"c{i}" for i in range(5)]
+
+
+class TestDailyReminders:
+    def test_rerun_does_not_double_text(self, tmp_path, monkeypatch):
+        due = [
+            RefillReminder("p1", "c1", "Semaglutide", 21, "day21"),
+            RefillReminder("p1", "c1", "B12", 21, "day21"),
+            RefillReminder("p2", "c2", "Tirzepatide", 26, "day26"),
+        ]
+        monkeypatch.setattr(refill_reminders, "plan_reminders", lambda: ReminderPlan(due, 3, 2, 2))
+        logged = []
+        monkeypatch.setattr(refill_reminders, "log_action", lambda *args: logged.append(args))
+        client = FakeSMS()
+        
+        async def go():
+            d = dispatcher(client, tmp_path)
+            first = await refill_reminders.run_daily_reminders_async(d)
+            second = await refill_reminders.run_daily_reminders_async(d)
+            await d.stop()
+            return first, second
+        
+        first, second = asyncio.run(go())
+        assert first["sent"] == 2 and first["patients"] == 2 and first["total_meds"] == 3
+        assert second["sent"] == 0 and second["skipped"] == 2
+        assert len(client.sent) == 2
+        assert "Semaglutide and B12" in dict(client.sent)["c1"]
+        assert sorted(a[0] for a in logged) == ["refill_reminder_consolidated", "refill_reminder_sent"]
+    
+    def test_own_dispatcher_stopped_on_error(self, tmp_path, monkeypatch):
+        due = [RefillReminder("p1", "c1", "B12", 21, "day21"), RefillReminder("p2", "c2", "B12", 21, "day21")]
+        monkeypatch.setattr(refill_reminders, "plan_reminders", lambda: ReminderPlan(due, 2, 2, 2))
+        monkeypatch.setattr(refill_reminders, "log_action", lambda *args: None)
+        created = []
+        
+        def make_dispatcher():
+            created.append(dispatcher(FakeSMS(), tmp_path))
+            return created[-1]
+        
+        def build(reminders):
+            if reminders[0].patient_id == "p2":
+                raise RuntimeError("bad template")
+            return "time for a refill", "refill_reminder_sent", "B12"
+        
+        monkeypatch.setattr(refill_reminders, "SMSDispatcher", make_dispatcher)
+        monkeypatch.setattr(refill_reminders, "consolidated_message", build)
+        
+        with pytest.raises(RuntimeError):
+            asyncio.run(refill_reminders.run_daily_reminders_async())
+        assert created[0]._tasks == [] and created[0] not in sms_queue._running
+        assert len(created[0].sent_keys) == 1  # what was queued still went out
+    
+    def test_reminder_key(self):
+        rs = [RefillReminder("p1", "c1", "A", 26, "day26"), RefillReminder("p1", "c1", "B", 21, "day21")]
+        assert reminder_key("p1", rs, "2024-03-01") == "refill:p1:2024-03-01:day21+day26"
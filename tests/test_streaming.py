@@ -0,0 +1,137 @@
+"""
+tests/test_streaming.py - streamed completions, reidentify and the sse endpoint
+"""
+
+import asyncio
+import json
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+from openai import AsyncOpenAI
+
+from config import settings
+from integrations import openai_client
+from integrations.completion_cache import CompletionCache
+from phi.reidentify import StreamingReidentifier, reidentify
+from tests.stubs import OpenAIStub, StubServer
+
+
+TOKEN_MAP = {"[NAME_1]": "Jane Doe", "[NAME_10]": "Bob Roe", "[PHONE_1]": "555-123-4567"}
+
+
+def split_randomly(text, rnd):
+    pieces, i = [], 0
+    while i < len(text):
+        n = rnd.randint(1, 6)
+        pieces.append(text[i:i + n])
+        i += n
+    return pieces
+
+
+class TestStreamingReidentifier:
+    def test_every_split_matches_one_shot(self):
+        text = "Hi [NAME_1], I'll call [PHONE_1]. [NAME_10] says hi [x] [UNKNOWN_2] [NAME_1]"
+        expected = reidentify(text, TOKEN_MAP)
+        
+        for cut in range(len(text) + 1):
+            r = StreamingReidentifier(TOKEN_MAP)
+            assert r.feed(text[:cut]) + r.feed(text[cut:]) + r.flush() == expected
+        
+        rnd = random.Random(3)
+        for _ in range(200):
+            r = StreamingReidentifier(TOKEN_MAP)
+            out = "".join(r.feed(p) for p in split_randomly(text, rnd)) + r.flush()
+            assert out == expected
+    
+    def test_holds_only_what_could_be_a_token(self):
+        r = StreamingReidentifier(TOKEN_MAP)
+        assert r.feed("Hi [NA") == "Hi "
+        assert r.feed("ME_1] there") == "Jane Doe there"
+        # longer than any token - can't be one, don't hold it
+        assert r.feed("[this is just a bracket") == "[this is just a bracket"
+        assert r.feed(" [") == " "
+        assert r.flush() == "["
+    
+    def test_no_tokens_passes_through(self):
+        r = StreamingReidentifier({})
+        assert r.feed("[NAME_1") == "[NAME_1"
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    data = OpenAIStub(reply="Hi [NAME_1], your refill is ready.")
+    with StubServer(data) as server:
+        monkeypatch.setattr(settings, "MOCK_MODE", False)
+        monkeypatch.setattr(openai_client, "client", AsyncOpenAI(
+            api_key="test-key", base_url=f"{server.url}/v1", max_retries=0))
+        monkeypatch.setattr(openai_client, "completion_cache", CompletionCache(path=""))
+        yield data
+
+
+async def collect(agen):
+    return [piece async for piece in agen]
+
+
+class TestCompletionStream:
+    def test_streams_deltas(self, stub):
+        messages = [{"role": "user", "content": "is my refill ready"}]
+        pieces = asyncio.run(collect(openai_client.get_completion_stream(messages)))
+        assert len(pieces) > 3
+        assert "".join(pieces) == stub.reply
+    
+    def test_finished_stream_is_cached(self, stub):
+        messages = [{"role": "user", "content": "is my refill ready"}]
+        asyncio.run(collect(openai_client.get_completion_stream(messages)))
+        again = asyncio.run(collect(openai_client.get_completion_stream(messages)))
+        assert again == [stub.reply]
+        assert len(stub.prompts) == 1
+        assert asyncio.run(openai_client.get_completion(messages)) == stub.reply
+    
+    def test_matches_non_streaming(self, stub):
+        messages = [{"role": "user", "content": "anything"}]
+        full = asyncio.run(openai_client.get_completion(messages, cache=False))
+        streamed = asyncio.run(collect(openai_client.get_completion_stream(messages, cache=False)))
+        assert "".join(streamed) == full
+
+
+class TestChatStreamEndpoint:
+    def events(self, response):
+        out = []
+        for block in response.text.strip().split("\n\n"):
+            lines = dict(line.split(": ", 1) for line in block.split("\n"))
+            out.append((lines.get("event", "message"), json.loads(lines["data"])))
+        return out
+    
+    def test_streams_reidentified_answer(self, stub, monkeypatch):
+        from main import app
+        
+        async def find_patient(phone):
+            return {"fields": {"Name": "Jane Doe"}}
+        
+        monkeypatch.setattr("handlers.chat.async_airtable.find_patient_by_phone", find_patient)
+        with TestClient(app) as client:
+            response = client.post("/api/chat/stream", json={
+                "message": "Is my prescription refill ready? This is Jane Doe",
+                "patient_phone": "5551234567",
+            })
+        
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = self.events(response)
+        assert events[0] == ("meta", {"session_id": events[0][1]["session_id"], "intent": "refill_request", "needs_human": False})
+        assert events[-1][0] == "done"
+        text = "".join(data["text"] for name, data in events if name == "message")
+        assert text == "Hi Jane Doe, your refill is ready."
+        # the model only ever saw the token
+        assert "Jane Doe" not in json.dumps(stub.prompts)
+    
+    def test_quick_reply_is_one_event(self, stub):
+        from main import app
+        
+        with TestClient(app) as client:
+            response = client.post("/api/chat/stream", json={"message": "what are your hours?"})
+        
+        events = self.events(response)
+        assert [name for name, _ in events] == ["meta", "message", "done"]
+        assert events[0][1]["intent"] == "quick_reply"
+        assert not stub.prompts
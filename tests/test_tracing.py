@@ -0,0 +1,154 @@
+"""
+tests/test_tracing.py - span timing, the per-route middleware and /api/metrics
+"""
+
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import tracing
+from config import settings
+from integrations.ghl import ghl
+from main import app
+from tracing import BUCKETS, WINDOW, Histogram, metrics, span, traced
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+class TestHistogram:
+    def test_buckets_are_upper_bounds(self):
+        hist = Histogram()
+        hist.observe(BUCKETS[0])  # le is inclusive
+        hist.observe(BUCKETS[0] * 1.5)
+        hist.observe(BUCKETS[-1] * 2)
+        assert hist.counts[0] == 1 and hist.counts[1] == 1 and hist.counts[-1] == 1
+        assert hist.count == 3
+    
+    def test_quantiles_use_recent_window(self):
+        hist = Histogram()
+        for _ in range(WINDOW):
+            hist.observe(10.0)
+        for i in range(WINDOW):
+            hist.observe(i / WINDOW)
+        q = hist.quantiles()
+        # the old 10s samples have rolled out, totals still count them
+        assert q[0.5] == pytest.approx(0.5, abs=0.01)
+        assert q[0.99] == pytest.approx(0.99, abs=0.01)
+        assert hist.count == 2 * WINDOW
+    
+    def test_empty(self):
+        assert Histogram().quantiles() == {0.5: 0.0, 0.95: 0.0, 0.99: 0.0}
+
+
+class TestSpans:
+    def test_sync_and_async_functions(self):
+        @traced("sync_work")
+        def work(x):
+            time.sleep(0.01)
+            return x * 2
+        
+        @traced("async_work")
+        async def awork(x):
+            await asyncio.sleep(0.01)
+            return x + 1
+        
+        assert work(2) == 4 and work.__name__ == "work"
+        assert asyncio.run(awork(1)) == 2
+        assert metrics.spans["sync_work"].count == 1
+        assert metrics.spans["async_work"].sum >= 0.009
+    
+    def test_failures_are_timed_too(self):
+        @traced("boom")
+        def boom():
+            raise RuntimeError("nope")
+        
+        with pytest.raises(RuntimeError):
+            boom()
+        assert metrics.spans["boom"].count == 1
+    
+    def test_trace_sums_repeated_spans(self):
+        token = tracing._trace.set({})
+        try:
+            for _ in range(3):
+                with span("step"):
+                    pass
+            assert set(tracing.current_trace()) == {"step"}
+        finally:
+            tracing._trace.reset(token)
+        assert metrics.spans["step"].count == 3
+        assert tracing.current_trace() is None
+    
+    def test_disabled_leaves_function_alone(self, monkeypatch):
+        monkeypatch.setattr(settings, "TRACING_ENABLED", False)
+        
+        def work():
+            return 1
+        
+        assert traced("work")(work) is work
+    
+    def test_sync_client_spans_reach_the_request(self, monkeypatch):
+        # ghl's sync wrapper runs the async client on another thread
+        monkeypatch.setattr(settings, "MOCK_MODE", True)
+        trace = {}
+        token = tracing._trace.set(trace)
+        try:
+            ghl.search_contacts("someone@example.com")
+        finally:
+            tracing._trace.reset(token)
+        assert "ghl" in trace
+
+
+class TestMiddleware:
+    def test_labels_by_route_template(self):
+        client = TestClient(app)
+        client.get("/api/chat/history/abc")
+        client.get("/api/chat/history/def")
+        client.get("/no/such/page")
+        assert metrics.requests[("/api/chat/history/{session_id}", "GET")].count == 2
+        assert metrics.requests[("unmatched", "GET")].count == 1
+        assert metrics.statuses[("unmatched", "GET", 404)] == 1
+    
+    def test_request_spans_by_route(self, monkeypatch):
+        monkeypatch.setattr(settings, "MOCK_MODE", True)
+        r = TestClient(app).post("/api/email/triage", json={
+            "from_email": "jane@example.com", "subject": "refill",
+            "body": "Hi, this is Jane Doe, can I get a refill on RX1234567? call 555-123-4567",
+        })
+        assert r.status_code == 200
+        route = "/api/email/triage"
+        for name in ("deidentify", "audit", "ghl"):
+            assert metrics.route_spans[(route, name)].count == 1
+        assert metrics.statuses[(route, "POST", 200)] == 1
+        # spans happen inside the request, so they can't outlast it
+        assert metrics.route_spans[(route, "ghl")].sum <= metrics.requests[(route, "POST")].sum
+    
+    def test_metrics_endpoint(self):
+        client = TestClient(app)
+        client.get("/api/chat/history/abc")
+        r = client.get("/api/metrics")
+        assert r.status_code == 200
+        assert r.headers["content-type"].startswith("text/plain; version=0.0.4")
+        lines = r.text.splitlines()
+        labels = 'route="/api/chat/history/{session_id}",method="GET"'
+        assert "# TYPE pharmacy_request_seconds histogram" in lines
+        assert f'pharmacy_request_seconds_bucket{{{labels},le="+Inf"}} 1' in lines
+        assert f"pharmacy_request_seconds_count{{{labels}}} 1" in lines
+        assert any(l.startswith(f'pharmacy_request_seconds_quantiles{{{labels},quantile="0.99"}}') for l in lines)
+        assert f'pharmacy_requests_total{{{labels},status="200"}} 1' in lines
+        # every sample line is "name{labels} number"
+        for line in lines:
+            if line and not line.startswith("#"):
+                float(line.rsplit(" ", 1)[1])
+    
+    def test_summary_json(self):
+        client = TestClient(app)
+        client.get("/api/chat/history/abc")
+        body = client.get("/api/metrics/summary").json()
+        assert body["requests"]["GET /api/chat/history/{session_id}"]["count"] == 1
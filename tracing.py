@@ -0,0 +1,277 @@
+"""
+tracing.py - per-request timing of the hot paths
+phi scrubbing, airtable/ghl calls, llm completions and audit writes are
+wrapped in spans. the middleware gives every request its own trace (via a
+contextvar, so it follows the request into tasks and threadpool calls) and
+folds it into per-route histograms that /api/metrics exports
+
+cheap enough to leave on - a span is two perf_counter calls and a few
+dict updates, no allocation per sample beyond the float
+"""
+
+import asyncio
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import settings
+
+
+# upper bounds in seconds - spans are sub-ms (phi) up to tens of seconds (llm)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# recent samples kept per series for the p50/p95/p99 estimate
+WINDOW = 1024
+QUANTILES = (0.5, 0.95, 0.99)
+
+# span name -> seconds spent in it during the current request (None outside one)
+_trace: ContextVar[Optional[Dict[str, float]]] = ContextVar("trace", default=None)
+
+
+class Histogram:
+    """fixed buckets for prometheus plus a ring of recent samples for quantiles"""
+    
+    __slots__ = ("counts", "sum", "count", "recent", "_next")
+    
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.recent: List[float] = []
+        self._next = 0
+    
+    def observe(self, value: float):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+        if len(self.recent) < WINDOW:
+            self.recent.append(value)
+        else:
+            self.recent[self._next] = value
+            self._next = (self._next + 1) % WINDOW
+    
+    def quantiles(self) -> Dict[float, float]:
+        if not self.recent:
+            return {q: 0.0 for q in QUANTILES}
+        ordered = sorted(self.recent)
+        return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in QUANTILES}
+
+
+class Metrics:
+    """
+    every histogram this process has, keyed by label values
+    
+        requests: (route, method) -> request latency
+        statuses: (route, method, status) -> count
+        route_spans: (route, span) -> time in that span per request
+        spans: span -> latency of each call, in or out of a request
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        with self._lock:
+            self.requests: Dict[Tuple[str, str], Histogram] = {}
+            self.statuses: Dict[Tuple[str, str, int], int] = {}
+            self.route_spans: Dict[Tuple[str, str], Histogram] = {}
+            self.spans: Dict[str, Histogram] = {}
+    
+    def observe_span(self, name: str, seconds: float):
+        with self._lock:
+            hist = self.spans.get(name)
+            if hist is None:
+                hist = self.spans[name] = Histogram()
+            hist.observe(seconds)
+    
+    def observe_request(self, route: str, method: str, status: int, seconds: float,
+                        trace: Dict[str, float] = None):
+        with self._lock:
+            key = (route, method)
+            hist = self.requests.get(key)
+            if hist is None:
+                hist = self.requests[key] = Histogram()
+            hist.observe(seconds)
+            status_key = (route, method, status)
+            self.statuses[status_key] = self.statuses.get(status_key, 0) + 1
+            for name, spent in (trace or {}).items():
+                span_key = (route, name)
+                hist = self.route_spans.get(span_key)
+                if hist is None:
+                    hist = self.route_spans[span_key] = Histogram()
+                hist.observe(spent)
+    
+    def snapshot(self) -> Dict:
+        """p50/p95/p99 in ms per route and span - handy for tests and debug output"""
+        def ms(hist):
+            q = hist.quantiles()
+            return {"count": hist.count, "p50": q[0.5] * 1000, "p95": q[0.95] * 1000, "p99": q[0.99] * 1000}
+        
+        with self._lock:
+            return {
+                "requests": {f"{m} {r}": ms(h) for (r, m), h in self.requests.items()},
+                "route_spans": {f"{r} {s}": ms(h) for (r, s), h in self.route_spans.items()},
+                "spans": {s: ms(h) for s, h in self.spans.items()},
+            }
+    
+    def render(self, prefix: str = "pharmacy") -> str:
+        """prometheus text exposition format (0.0.4)"""
+        lines: List[str] = []
+        with self._lock:
+            _histogram(lines, f"{prefix}_request_seconds", "request latency by route",
+                       ("route", "method"), self.requests)
+            _histogram(lines, f"{prefix}_route_span_seconds", "time per request spent in each span, by route",
+                       ("route", "span"), self.route_spans)
+            _histogram(lines, f"{prefix}_span_seconds", "latency of each traced call",
+                       ("span",), {(k,): v for k, v in self.spans.items()})
+            lines.append(f"# HELP {prefix}_requests_total requests by route and status")
+            lines.append(f"# TYPE {prefix}_requests_total counter")
+            for (route, method, status), count in sorted(self.statuses.items()):
+                lines.append(f"{prefix}_requests_total{_labels(('route', 'method', 'status'), (route, method, status))} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names, values, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}"
+
+
+def _histogram(lines: List[str], name: str, help_text: str, label_names, series: Dict):
+    """one histogram family plus a <name>_quantiles summary from the recent window"""
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for key, hist in sorted(series.items()):
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ("+Inf",), hist.counts):
+            cumulative += count
+            le = 'le="%s"' % bound
+            lines.append(f"{name}_bucket{_labels(label_names, key, le)} {cumulative}")
+        lines.append(f"{name}_sum{_labels(label_names, key)} {hist.sum:.6f}")
+        lines.append(f"{name}_count{_labels(label_names, key)} {hist.count}")
+    
+    summary = f"{name}_quantiles"
+    lines.append(f"# HELP {summary} {help_text}, last {WINDOW} samples")
+    lines.append(f"# TYPE {summary} summary")
+    for key, hist in sorted(series.items()):
+        for q, value in hist.quantiles().items():
+            quantile = 'quantile="%s"' % q
+            lines.append(f"{summary}{_labels(label_names, key, quantile)} {value:.6f}")
+        lines.append(f"{summary}_sum{_labels(label_names, key)} {hist.sum:.6f}")
+        lines.append(f"{summary}_count{_labels(label_names, key)} {hist.count}")
+
+
+metrics = Metrics()
+
+
+def record(name: str, seconds: float):
+    """add a finished span to the process totals and the current request's trace"""
+    metrics.observe_span(name, seconds)
+    trace = _trace.get()
+    if trace is not None:
+        trace[name] = trace.get(name, 0.0) + seconds
+
+
+@contextmanager
+def span(name: str):
+    """time a block as a span"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def traced(name: str) -> Callable:
+    """
+    decorator - time every call to a function (sync or async) as a span
+    with TRACING_ENABLED off the function is returned untouched
+    """
+    def wrap(fn):
+        if not settings.TRACING_ENABLED:
+            return fn
+        
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def timed_async(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    record(name, time.perf_counter() - start)
+            return timed_async
+        
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+        return timed
+    return wrap
+
+
+def current_trace() -> Optional[Dict[str, float]]:
+    """span -> seconds for the request being handled, None outside one"""
+    return _trace.get()
+
+
+class TracingMiddleware:
+    """
+    pure asgi middleware (no BaseHTTPMiddleware, so streaming responses
+    aren't buffered and the contextvar reaches the endpoint)
+    
+    requests are labelled with the route template (/api/chat/session/{session_id}),
+    not the raw path, so the label count stays fixed. unmatched paths share one label
+    """
+    
+    def __init__(self, app):
+        self.app = app
+        self._routes: Optional[Dict] = None
+    
+    def route_label(self, scope) -> str:
+        # the router writes the matched endpoint into the (shared) scope
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if self._routes is None and "app" in scope:
+            routes = {}
+            for route in getattr(scope["app"], "routes", []):
+                target = getattr(route, "endpoint", None) or getattr(route, "app", None)
+                if target is not None:
+                    routes[target] = route.path
+            self._routes = routes
+        return (self._routes or {}).get(endpoint, "unmatched")
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        trace: Dict[str, float] = {}
+        token = _trace.set(trace)
+        status = 500  # if we never see a response start, the app blew up
+        
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+        
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            _trace.reset(token)
+            metrics.observe_request(self.route_label(scope), scope["method"], status, elapsed, trace)